@@ -1,35 +1,26 @@
-def analyze_gpu_output(data, channels=4):
-    print("\nRAW GPU MEMORY:")
-    print(data)
-
-    # --- view 1: split by channels (how GPU stores it physically) ---
-    lanes = [data[i::channels] for i in range(channels)]
-    print("\nBY MEMORY CHANNEL (GPU PHYSICAL LAYOUT):")
-    for i, lane in enumerate(lanes):
-        print(f"lane{i}: {lane}")
-
-    # --- view 2: reconstruct per-thread order (de-interleave) ---
-    reconstructed = []
-    for i in range(len(data) // channels):
-        for lane in range(channels):
-            idx = lane + i * channels
-            if idx < len(data):
-                reconstructed.append(data[idx])
-
-    print("\nDE-INTERLEAVED (per-thread order guess):")
-    print(reconstructed)
-
-    # --- view 3: try showing as 2×4 and 2×2 (for intuition) ---
-    print("\nAS 2×4 MATRIX (guess):")
-    for i in range(0, len(data), 4):
-        print(data[i:i+4])
-
-    print("\nAS 2×2 MATRIX (taking every 2nd element):")
-    guess_2x2 = reconstructed[0:4]
-    print([guess_2x2[0:2], guess_2x2[2:4]])
-
-
-# Example:
-data =  [2, 2, 2, 2, 2, 2, 2, 2]
-
-analyze_gpu_output(data)
+# analyzegpu.py
+# Command line front end for test/helpers/access.py: analyzes a data memory access trace recorded
+# by a test (Memory.record() + save_accesses), e.g. matmul_accesses.json from make test_matmul_real
+import argparse
+
+from test.helpers.access import BANKING, AccessAnalysis, load_accesses
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report strides, coalescing and bank conflicts of a recorded access trace")
+    parser.add_argument("trace", help="JSON file written by save_accesses")
+    parser.add_argument("--threads-per-block", type=int, default=4)
+    parser.add_argument("--segment", type=int, default=4, help="rows per coalescing segment")
+    parser.add_argument("--banks", type=int, default=4)
+    parser.add_argument("--scheme", choices=sorted(BANKING), default="interleaved", help="address to bank mapping")
+    args = parser.parse_args()
+
+    accesses, occupancy = load_accesses(args.trace)
+    analysis = AccessAnalysis(
+        accesses,
+        occupancy,
+        threads_per_block=args.threads_per_block,
+        segment=args.segment,
+        banks=args.banks,
+        bank_of=BANKING[args.scheme](args.banks),
+    )
+    print("\n".join(analysis.report()))
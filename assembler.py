@@ -1,74 +1,9 @@
 # assembler.py
-import re
+# Command line front end for test/helpers/assembler.py
+import sys
 
-REG = lambda r: int(r.replace("R", ""))
+from test.helpers.assembler import AssemblerError, assemble_program
 
-def assemble_line(op, args, labels, pc):
-    if op == "CONST":
-        d, imm = args
-        return 0b1001000000000000 | (REG(d) << 8) | int(imm.replace("#", ""))
-    
-    if op == "ADD":
-        d, s, t = args
-        return 0b0011000000000000 | (REG(d) << 8) | (REG(s) << 4) | REG(t)
-
-    if op == "MUL":
-        d, s, t = args
-        return 0b0101000000000000 | (REG(d) << 8) | (REG(s) << 4) | REG(t)
-
-    if op == "LDR":
-        d, s = args
-        return 0b0111000000000000 | (REG(d) << 8) | (REG(s) << 4)
-
-    if op == "STR":
-        d, s = args
-        return 0b1000000000000000 | (REG(d) << 4) | REG(s)
-
-    if op == "CMP":
-        s, t = args
-        return 0b0010000000000000 | (REG(s) << 4) | REG(t)
-
-    if op == "BRn":
-        label = args[0]
-        return 0b0001100000000000 | labels[label]
-
-    if op == "RET":
-        return 0b1111000000000000
-
-    raise ValueError(f"Unknown op {op}")
-
-
-def assemble(program_text):
-    lines = [l.split(";")[0].strip() for l in program_text.splitlines()]
-    lines = [l for l in lines if l]
-
-    labels = {}
-    pc = 0
-
-    # First pass: collect labels
-    for line in lines:
-        if line.endswith(":"):
-            labels[line[:-1]] = pc
-        else:
-            pc += 1
-
-    # Second pass: encode
-    pc = 0
-    machine = []
-
-    for line in lines:
-        if line.endswith(":"):
-            continue
-
-        parts = re.split(r"[,\s]+", line)
-        op = parts[0]
-        args = parts[1:]
-
-        word = assemble_line(op, args, labels, pc)
-        machine.append(word)
-        pc += 1
-
-    return machine
 asm = """
 CONST R1, #0
 CONST R2, #8
@@ -93,9 +28,16 @@ STR R3, R6
 RET
 """
 
-print(assemble(asm))
-code = assemble(asm)
+if __name__ == "__main__":
+    # python assembler.py [kernel.asm] (assembles the dot product example above by default)
+    source = open(sys.argv[1]).read() if len(sys.argv) > 1 else asm
+
+    try:
+        program = assemble_program(source)
+    except AssemblerError as error:
+        sys.exit(f"error: {error}")
 
-print("BINARY:")
-for w in code:
-    print(format(w, "016b"))
\ No newline at end of file
+    print(program.code)
+    print("BINARY:")
+    for pc, w in enumerate(program):
+        print(format(w, "016b"), "  ;", program.source_line(pc))
@@ -6,6 +6,8 @@
 // > In this minimal implementation, the ALU supports the 4 basic arithmetic operations
 // > Each thread in each core has it's own ALU
 // > ADD, SUB, MUL, DIV instructions are all executed here
+// > SEL also passes through here: it picks rs if the thread's NZP register matches the instruction's
+//   condition and rt otherwise, so the result is written back like any other arithmetic result
 module alu (
     input wire clk,
     input wire reset,
@@ -15,6 +17,8 @@ module alu (
 
     input reg [1:0] decoded_alu_arithmetic_mux,
     input reg decoded_alu_output_mux,
+    input reg decoded_alu_select,
+    input wire nzp_match, // This thread's NZP register matches the decoded condition
 
     input reg [7:0] rs,
     input reg [7:0] rt,
@@ -34,7 +38,9 @@ module alu (
         end else if (enable) begin
             // Calculate alu_out when core_state = EXECUTE
             if (core_state == 3'b101) begin 
-                if (decoded_alu_output_mux == 1) begin 
+                if (decoded_alu_select == 1) begin 
+                    alu_out_reg <= nzp_match ? rs : rt;
+                end else if (decoded_alu_output_mux == 1) begin 
                     // Set values to compare with NZP register in alu_out[2:0]
                     alu_out_reg <= {5'b0, (rs - rt > 0), (rs - rt == 0), (rs - rt < 0)};
                 end else begin 
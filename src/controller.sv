@@ -5,12 +5,25 @@
 // > Receives memory requests from all cores
 // > Throttles requests based on limited external memory bandwidth
 // > Waits for responses from external memory and distributes them back to cores
+// > With BANKED set, each channel is one bank of an address-interleaved memory: channel i only takes
+//   requests whose address is i modulo NUM_CHANNELS, so requests to a busy bank wait (a bank conflict)
+//   even while other channels are idle
+// > With MAX_OUTSTANDING above 1, channels are pipelined: a channel issues a new request (a one-cycle
+//   valid pulse tagged with the consumer it came from) every cycle while fewer than MAX_OUTSTANDING of
+//   its requests are in flight. Memory answers with a one-cycle ready pulse carrying the request's tag,
+//   in any order, and the response goes straight to that consumer. Each consumer has at most one request
+//   outstanding, so the consumer index is a unique tag
+// > A pipelined channel reports READ_WAITING/WRITE_WAITING for the latest request it issued, with that
+//   request's consumer, for as long as any of its requests are in flight, and IDLE once none are
 module controller #(
     parameter ADDR_BITS = 8,
     parameter DATA_BITS = 16,
     parameter NUM_CONSUMERS = 4, // The number of consumers accessing memory through this controller
     parameter NUM_CHANNELS = 1,  // The number of concurrent channels available to send requests to global memory
-    parameter WRITE_ENABLE = 1   // Whether this memory controller can write to memory (program memory is read-only)
+    parameter WRITE_ENABLE = 1,  // Whether this memory controller can write to memory (program memory is read-only)
+    parameter BANKED = 0,        // Whether each channel serves one address-interleaved bank (see above)
+    parameter MAX_OUTSTANDING = 1, // Requests each channel can have in flight (1 = one request at a time, see above)
+    localparam TAG_BITS = $clog2(NUM_CONSUMERS)
 ) (
     input wire clk,
     input wire reset,
@@ -33,7 +46,13 @@ module controller #(
     output reg [NUM_CHANNELS-1:0] mem_write_valid,
     output reg [ADDR_BITS-1:0] mem_write_address [NUM_CHANNELS-1:0],
     output reg [DATA_BITS-1:0] mem_write_data [NUM_CHANNELS-1:0],
-    input reg [NUM_CHANNELS-1:0] mem_write_ready
+    input reg [NUM_CHANNELS-1:0] mem_write_ready,
+
+    // Request and response tags (pipelined channels only)
+    output reg [TAG_BITS-1:0] mem_read_tag [NUM_CHANNELS-1:0],
+    input reg [TAG_BITS-1:0] mem_read_response_tag [NUM_CHANNELS-1:0],
+    output reg [TAG_BITS-1:0] mem_write_tag [NUM_CHANNELS-1:0],
+    input reg [TAG_BITS-1:0] mem_write_response_tag [NUM_CHANNELS-1:0]
 );
     localparam IDLE = 3'b000, 
         READ_WAITING = 3'b010, 
@@ -46,6 +65,15 @@ module controller #(
     reg [$clog2(NUM_CONSUMERS)-1:0] current_consumer [NUM_CHANNELS-1:0]; // Which consumer is each channel currently serving
     reg [NUM_CONSUMERS-1:0] channel_serving_consumer; // Which channels are being served? Prevents many workers from picking up the same request.
 
+    // Bank conflicts: requests left waiting for their bank, summed over cycles (banked only)
+    reg [31:0] perf_bank_conflicts;
+    integer waiting;
+
+    // Requests each pipelined channel has in flight
+    reg [$clog2(MAX_OUTSTANDING):0] outstanding [NUM_CHANNELS-1:0];
+    integer in_flight;
+    reg [2:0] issued; // State of the request a pipelined channel issues this cycle (IDLE if none)
+
     always @(posedge clk) begin
         if (reset) begin 
             mem_read_valid <= 0;
@@ -61,72 +89,151 @@ module controller #(
 
             current_consumer <= 0;
             controller_state <= 0;
+            mem_read_tag <= 0;
+            mem_write_tag <= 0;
+            outstanding <= 0;
 
             channel_serving_consumer = 0;
+            perf_bank_conflicts <= 0;
         end else begin 
-            // For each channel, we handle processing concurrently
-            for (int i = 0; i < NUM_CHANNELS; i = i + 1) begin 
-                case (controller_state[i])
-                    IDLE: begin
-                        // While this channel is idle, cycle through consumers looking for one with a pending request
-                        for (int j = 0; j < NUM_CONSUMERS; j = j + 1) begin 
-                            if (consumer_read_valid[j] && !channel_serving_consumer[j]) begin 
-                                channel_serving_consumer[j] = 1;
-                                current_consumer[i] <= j;
+            if (MAX_OUTSTANDING > 1) begin
+                for (int i = 0; i < NUM_CHANNELS; i = i + 1) begin
+                    // Responses carry the tag of the consumer they belong to, and can come back in any order
+                    if (mem_read_ready[i]) begin
+                        consumer_read_ready[mem_read_response_tag[i]] <= 1;
+                        consumer_read_data[mem_read_response_tag[i]] <= mem_read_data[i];
+                    end
+                    if (mem_write_ready[i]) begin
+                        consumer_write_ready[mem_write_response_tag[i]] <= 1;
+                    end
+                    in_flight = outstanding[i] - mem_read_ready[i] - mem_write_ready[i];
 
+                    // Issue at most one new request per cycle while there's room in flight
+                    mem_read_valid[i] <= 0;
+                    mem_write_valid[i] <= 0;
+                    issued = IDLE;
+                    if (in_flight < MAX_OUTSTANDING) begin
+                        for (int j = 0; j < NUM_CONSUMERS; j = j + 1) begin
+                            if (consumer_read_valid[j] && !channel_serving_consumer[j] && (!BANKED || consumer_read_address[j] % NUM_CHANNELS == i)) begin
+                                channel_serving_consumer[j] = 1;
                                 mem_read_valid[i] <= 1;
                                 mem_read_address[i] <= consumer_read_address[j];
-                                controller_state[i] <= READ_WAITING;
-
-                                // Once we find a pending request, pick it up with this channel and stop looking for requests
+                                mem_read_tag[i] <= j;
+                                current_consumer[i] <= j;
+                                issued = READ_WAITING;
+                                in_flight = in_flight + 1;
                                 break;
-                            end else if (consumer_write_valid[j] && !channel_serving_consumer[j]) begin 
+                            end else if (consumer_write_valid[j] && !channel_serving_consumer[j] && (!BANKED || consumer_write_address[j] % NUM_CHANNELS == i)) begin
                                 channel_serving_consumer[j] = 1;
-                                current_consumer[i] <= j;
-
                                 mem_write_valid[i] <= 1;
                                 mem_write_address[i] <= consumer_write_address[j];
                                 mem_write_data[i] <= consumer_write_data[j];
-                                controller_state[i] <= WRITE_WAITING;
-
-                                // Once we find a pending request, pick it up with this channel and stop looking for requests
+                                mem_write_tag[i] <= j;
+                                current_consumer[i] <= j;
+                                issued = WRITE_WAITING;
+                                in_flight = in_flight + 1;
                                 break;
                             end
                         end
                     end
-                    READ_WAITING: begin
-                        // Wait for response from memory for pending read request
-                        if (mem_read_ready[i]) begin 
-                            mem_read_valid[i] <= 0;
-                            consumer_read_ready[current_consumer[i]] <= 1;
-                            consumer_read_data[current_consumer[i]] <= mem_read_data[i];
-                            controller_state[i] <= READ_RELAYING;
-                        end
+                    outstanding[i] <= in_flight;
+
+                    // The channel is busy while anything is in flight: controller_state and current_consumer
+                    // follow the latest request issued, and the channel is IDLE once every response is back
+                    if (issued != IDLE) begin
+                        controller_state[i] <= issued;
+                    end else if (in_flight == 0) begin
+                        controller_state[i] <= IDLE;
                     end
-                    WRITE_WAITING: begin 
-                        // Wait for response from memory for pending write request
-                        if (mem_write_ready[i]) begin 
-                            mem_write_valid[i] <= 0;
-                            consumer_write_ready[current_consumer[i]] <= 1;
-                            controller_state[i] <= WRITE_RELAYING;
-                        end
+                end
+
+                // Once a consumer has its response and drops valid, it can be served again
+                for (int j = 0; j < NUM_CONSUMERS; j = j + 1) begin
+                    if (consumer_read_ready[j] && !consumer_read_valid[j]) begin
+                        channel_serving_consumer[j] = 0;
+                        consumer_read_ready[j] <= 0;
                     end
-                    // Wait until consumer acknowledges it received response, then reset
-                    READ_RELAYING: begin
-                        if (!consumer_read_valid[current_consumer[i]]) begin 
-                            channel_serving_consumer[current_consumer[i]] = 0;
-                            consumer_read_ready[current_consumer[i]] <= 0;
-                            controller_state[i] <= IDLE;
-                        end
+                    if (consumer_write_ready[j] && !consumer_write_valid[j]) begin
+                        channel_serving_consumer[j] = 0;
+                        consumer_write_ready[j] <= 0;
                     end
-                    WRITE_RELAYING: begin 
-                        if (!consumer_write_valid[current_consumer[i]]) begin 
-                            channel_serving_consumer[current_consumer[i]] = 0;
-                            consumer_write_ready[current_consumer[i]] <= 0;
-                            controller_state[i] <= IDLE;
+                end
+            end else begin
+                // For each channel, we handle processing concurrently
+                for (int i = 0; i < NUM_CHANNELS; i = i + 1) begin 
+                    case (controller_state[i])
+                        IDLE: begin
+                            // While this channel is idle, cycle through consumers looking for one with a pending request
+                            for (int j = 0; j < NUM_CONSUMERS; j = j + 1) begin 
+                                if (consumer_read_valid[j] && !channel_serving_consumer[j] && (!BANKED || consumer_read_address[j] % NUM_CHANNELS == i)) begin 
+                                    channel_serving_consumer[j] = 1;
+                                    current_consumer[i] <= j;
+
+                                    mem_read_valid[i] <= 1;
+                                    mem_read_address[i] <= consumer_read_address[j];
+                                    controller_state[i] <= READ_WAITING;
+
+                                    // Once we find a pending request, pick it up with this channel and stop looking for requests
+                                    break;
+                                end else if (consumer_write_valid[j] && !channel_serving_consumer[j] && (!BANKED || consumer_write_address[j] % NUM_CHANNELS == i)) begin 
+                                    channel_serving_consumer[j] = 1;
+                                    current_consumer[i] <= j;
+
+                                    mem_write_valid[i] <= 1;
+                                    mem_write_address[i] <= consumer_write_address[j];
+                                    mem_write_data[i] <= consumer_write_data[j];
+                                    controller_state[i] <= WRITE_WAITING;
+
+                                    // Once we find a pending request, pick it up with this channel and stop looking for requests
+                                    break;
+                                end
+                            end
+                        end
+                        READ_WAITING: begin
+                            // Wait for response from memory for pending read request
+                            if (mem_read_ready[i]) begin 
+                                mem_read_valid[i] <= 0;
+                                consumer_read_ready[current_consumer[i]] <= 1;
+                                consumer_read_data[current_consumer[i]] <= mem_read_data[i];
+                                controller_state[i] <= READ_RELAYING;
+                            end
                         end
+                        WRITE_WAITING: begin 
+                            // Wait for response from memory for pending write request
+                            if (mem_write_ready[i]) begin 
+                                mem_write_valid[i] <= 0;
+                                consumer_write_ready[current_consumer[i]] <= 1;
+                                controller_state[i] <= WRITE_RELAYING;
+                            end
+                        end
+                        // Wait until consumer acknowledges it received response, then reset
+                        READ_RELAYING: begin
+                            if (!consumer_read_valid[current_consumer[i]]) begin 
+                                channel_serving_consumer[current_consumer[i]] = 0;
+                                consumer_read_ready[current_consumer[i]] <= 0;
+                                controller_state[i] <= IDLE;
+                            end
+                        end
+                        WRITE_RELAYING: begin 
+                            if (!consumer_write_valid[current_consumer[i]]) begin 
+                                channel_serving_consumer[current_consumer[i]] = 0;
+                                consumer_write_ready[current_consumer[i]] <= 0;
+                                controller_state[i] <= IDLE;
+                            end
+                        end
+                    endcase
+                end
+            end
+
+            if (BANKED) begin
+                // Whatever is still unclaimed after every channel had its pick is waiting on a busy bank
+                waiting = 0;
+                for (int j = 0; j < NUM_CONSUMERS; j = j + 1) begin
+                    if ((consumer_read_valid[j] || consumer_write_valid[j]) && !channel_serving_consumer[j]) begin
+                        waiting = waiting + 1;
                     end
-                endcase
+                end
+                perf_bank_conflicts <= perf_bank_conflicts + waiting;
             end
         end
     end
@@ -3,25 +3,36 @@
 
 // COMPUTE CORE
 // > Handles processing 1 block at a time
+// > The next block is staged by the dispatcher and latched here when the scheduler picks it up
 // > The core also has it's own scheduler to manage control flow
 // > Each core contains 1 fetcher & decoder, and register files, ALUs, LSUs, PC for each thread
+// > Thread units only run for threads in the scheduler's active mask, so divergent threads sit out
+//   the instructions of the branch they didn't take
 module core #(
     parameter DATA_MEM_ADDR_BITS = 8,
     parameter DATA_MEM_DATA_BITS = 8,
     parameter PROGRAM_MEM_ADDR_BITS = 8,
     parameter PROGRAM_MEM_DATA_BITS = 16,
-    parameter THREADS_PER_BLOCK = 4
+    parameter THREADS_PER_BLOCK = 4,
+    parameter PREFETCH_DEPTH = 0
 ) (
     input wire clk,
     input wire reset,
 
     // Kernel Execution
-    input wire start,
+    input wire start, // A block is staged and ready to be picked up
+    output wire take,
     output wire done,
 
-    // Block Metadata
-    input wire [7:0] block_id,
-    input wire [$clog2(THREADS_PER_BLOCK):0] thread_count,
+    // Staged Block Metadata
+    input wire [7:0] staged_block_id,
+    input wire [7:0] staged_block_id_y,
+    input wire [$clog2(THREADS_PER_BLOCK):0] staged_thread_count,
+
+    // Kernel Metadata
+    input wire [7:0] grid_dim_x,
+    input wire [PROGRAM_MEM_ADDR_BITS-1:0] program_base,
+    input wire [31:0] params,
 
     // Program Memory
     output reg program_mem_read_valid,
@@ -44,6 +55,25 @@ module core #(
     reg [2:0] fetcher_state;
     reg [15:0] instruction;
 
+    // Block Metadata (for the block currently being executed)
+    reg [7:0] block_id;
+    reg [7:0] block_id_y;
+    reg [$clog2(THREADS_PER_BLOCK):0] thread_count;
+
+    // Thread Masks
+    wire [THREADS_PER_BLOCK-1:0] thread_enable; // Threads that are part of the current block
+    wire [THREADS_PER_BLOCK-1:0] active_mask;   // Threads executing the current instruction
+
+    // Performance Counters
+    wire [31:0] perf_active_cycles;
+    wire [31:0] perf_handoff_cycles;
+    wire [15:0] perf_handoffs;
+    wire [15:0] perf_blocks_retired;
+    wire [31:0] perf_divergent_cycles;
+    wire [15:0] perf_divergences;
+    wire [31:0] perf_prefetch_hits;
+    wire [31:0] perf_prefetch_flushes;
+
     // Intermediate Signals
     reg [7:0] current_pc;
     wire [7:0] next_pc[THREADS_PER_BLOCK-1:0];
@@ -69,12 +99,27 @@ module core #(
     reg [1:0] decoded_alu_arithmetic_mux;   // Select arithmetic operation
     reg decoded_alu_output_mux;             // Select operation in ALU
     reg decoded_pc_mux;                     // Select source of next PC
+    reg decoded_alu_select;                 // Select rs or rt on the NZP condition (SEL)
     reg decoded_ret;
 
+    // Latch the staged block on the same edge the scheduler moves from IDLE/DONE into FETCH
+    always @(posedge clk) begin
+        if (reset) begin
+            block_id <= 0;
+            block_id_y <= 0;
+            thread_count <= 0;
+        end else if (start && (core_state == 3'b000 || core_state == 3'b111)) begin
+            block_id <= staged_block_id;
+            block_id_y <= staged_block_id_y;
+            thread_count <= staged_thread_count;
+        end
+    end
+
     // Fetcher
     fetcher #(
         .PROGRAM_MEM_ADDR_BITS(PROGRAM_MEM_ADDR_BITS),
-        .PROGRAM_MEM_DATA_BITS(PROGRAM_MEM_DATA_BITS)
+        .PROGRAM_MEM_DATA_BITS(PROGRAM_MEM_DATA_BITS),
+        .PREFETCH_DEPTH(PREFETCH_DEPTH)
     ) fetcher_instance (
         .clk(clk),
         .reset(reset),
@@ -85,7 +130,9 @@ module core #(
         .mem_read_ready(program_mem_read_ready),
         .mem_read_data(program_mem_read_data),
         .fetcher_state(fetcher_state),
-        .instruction(instruction) 
+        .instruction(instruction),
+        .perf_prefetch_hits(perf_prefetch_hits),
+        .perf_prefetch_flushes(perf_prefetch_flushes)
     );
 
     // Decoder
@@ -107,6 +154,7 @@ module core #(
         .decoded_alu_arithmetic_mux(decoded_alu_arithmetic_mux),
         .decoded_alu_output_mux(decoded_alu_output_mux),
         .decoded_pc_mux(decoded_pc_mux),
+        .decoded_alu_select(decoded_alu_select),
         .decoded_ret(decoded_ret)
     );
 
@@ -117,6 +165,7 @@ module core #(
         .clk(clk),
         .reset(reset),
         .start(start),
+        .program_base(program_base),
         .fetcher_state(fetcher_state),
         .core_state(core_state),
         .decoded_mem_read_enable(decoded_mem_read_enable),
@@ -125,21 +174,35 @@ module core #(
         .lsu_state(lsu_state),
         .current_pc(current_pc),
         .next_pc(next_pc),
-        .done(done)
+        .thread_enable(thread_enable),
+        .active_mask(active_mask),
+        .take(take),
+        .done(done),
+        .perf_active_cycles(perf_active_cycles),
+        .perf_handoff_cycles(perf_handoff_cycles),
+        .perf_handoffs(perf_handoffs),
+        .perf_blocks_retired(perf_blocks_retired),
+        .perf_divergent_cycles(perf_divergent_cycles),
+        .perf_divergences(perf_divergences)
     );
 
     // Dedicated ALU, LSU, registers, & PC unit for each thread this core has capacity for
     genvar i;
     generate
         for (i = 0; i < THREADS_PER_BLOCK; i = i + 1) begin : threads
+            wire nzp_match;
+            assign thread_enable[i] = i < thread_count;
+
             // ALU
             alu alu_instance (
                 .clk(clk),
                 .reset(reset),
-                .enable(i < thread_count),
+                .enable(thread_enable[i] && active_mask[i]),
                 .core_state(core_state),
                 .decoded_alu_arithmetic_mux(decoded_alu_arithmetic_mux),
                 .decoded_alu_output_mux(decoded_alu_output_mux),
+                .decoded_alu_select(decoded_alu_select),
+                .nzp_match(nzp_match),
                 .rs(rs[i]),
                 .rt(rt[i]),
                 .alu_out(alu_out[i])
@@ -149,7 +212,7 @@ module core #(
             lsu lsu_instance (
                 .clk(clk),
                 .reset(reset),
-                .enable(i < thread_count),
+                .enable(thread_enable[i] && active_mask[i]),
                 .core_state(core_state),
                 .decoded_mem_read_enable(decoded_mem_read_enable),
                 .decoded_mem_write_enable(decoded_mem_write_enable),
@@ -175,8 +238,11 @@ module core #(
             ) register_instance (
                 .clk(clk),
                 .reset(reset),
-                .enable(i < thread_count),
+                .enable(thread_enable[i] && active_mask[i]),
                 .block_id(block_id),
+                .block_id_y(block_id_y),
+                .grid_dim_x(grid_dim_x),
+                .params(params),
                 .core_state(core_state),
                 .decoded_reg_write_enable(decoded_reg_write_enable),
                 .decoded_reg_input_mux(decoded_reg_input_mux),
@@ -197,7 +263,8 @@ module core #(
             ) pc_instance (
                 .clk(clk),
                 .reset(reset),
-                .enable(i < thread_count),
+                .enable(thread_enable[i] && active_mask[i]),
+                .program_base(program_base),
                 .core_state(core_state),
                 .decoded_nzp(decoded_nzp),
                 .decoded_immediate(decoded_immediate),
@@ -205,7 +272,8 @@ module core #(
                 .decoded_pc_mux(decoded_pc_mux),
                 .alu_out(alu_out[i]),
                 .current_pc(current_pc),
-                .next_pc(next_pc[i])
+                .next_pc(next_pc[i]),
+                .nzp_match(nzp_match)
             );
         end
     endgenerate
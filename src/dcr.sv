@@ -3,26 +3,103 @@
 
 // DEVICE CONTROL REGISTER
 // > Used to configure high-level settings
-// > In this minimal example, the DCR is used to configure the number of threads to run for the kernel
-module dcr (
+// > The DCR is a small bank of byte-wide registers selected by device_control_address:
+//   0 - thread_count[7:0]   (total number of threads to launch for the kernel)
+//   1 - thread_count[15:8]
+//   2 - grid_dim_x          (blocks per grid row, 0 = 256 so 1D launches need not set it)
+//   3 - program_base        (program memory address of the kernel's first instruction)
+//   4 - param0 ... 7 - param3 (kernel parameters, read in the kernel with S2R)
+//   8 - first_block_x       (grid position of the first block to run, normally 0; a nonzero first
+//   9 - first_block_y        block resumes a kernel part way through, e.g. from a checkpoint)
+// > Each rising edge of start pushes the current register contents as a kernel descriptor onto a
+//   command queue, so the host can enqueue kernels back-to-back while earlier ones are still running
+// > The descriptor at the head of the queue is the kernel being executed until the dispatcher pops it
+module dcr #(
+    parameter QUEUE_DEPTH = 4 // Number of kernel descriptors that can be queued (power of 2)
+) (
     input wire clk,
     input wire reset,
 
     input wire device_control_write_enable,
+    input wire [3:0] device_control_address,
     input wire [7:0] device_control_data,
-    output wire [7:0] thread_count,
+
+    // Kernel Launch
+    input wire start,
+    output wire queue_full,
+
+    // Kernel Descriptor (head of the queue)
+    output wire queue_valid,
+    input wire queue_pop,
+    output wire [15:0] thread_count,
+    output wire [7:0] grid_dim_x,
+    output wire [7:0] program_base,
+    output wire [31:0] params,
+    output wire [7:0] first_block_x,
+    output wire [7:0] first_block_y,
 );
-    // Store device control data in dedicated register
-    reg [7:0] device_conrol_register;
-    assign thread_count = device_conrol_register[7:0];
+    localparam NUM_REGISTERS = 10;
+
+    // Store device control data in dedicated registers
+    reg [7:0] device_conrol_register [NUM_REGISTERS-1:0];
+
+    // Kernel descriptors are stored as {first_block_y, first_block_x, params, program_base, grid_dim_x, thread_count}
+    reg [79:0] queue [QUEUE_DEPTH-1:0];
+    reg [$clog2(QUEUE_DEPTH)-1:0] queue_head;
+    reg [$clog2(QUEUE_DEPTH)-1:0] queue_tail;
+    reg [$clog2(QUEUE_DEPTH):0] queue_count;
+    reg start_delayed; // EDA: Used to detect the rising edge of start without a second clock
+
+    wire push;
+    wire pop;
+    assign push = start && !start_delayed && !queue_full;
+    assign pop = queue_pop && queue_valid;
+
+    assign queue_full = (queue_count == QUEUE_DEPTH);
+    assign queue_valid = (queue_count != 0);
+    assign thread_count = queue[queue_head][15:0];
+    assign grid_dim_x = queue[queue_head][23:16];
+    assign program_base = queue[queue_head][31:24];
+    assign params = queue[queue_head][63:32];
+    assign first_block_x = queue[queue_head][71:64];
+    assign first_block_y = queue[queue_head][79:72];
 
     always @(posedge clk) begin
         if (reset) begin
-            device_conrol_register <= 8'b0;
+            for (int i = 0; i < NUM_REGISTERS; i++) begin
+                device_conrol_register[i] <= 8'b0;
+            end
+            queue_head <= 0;
+            queue_tail <= 0;
+            queue_count <= 0;
+            start_delayed <= 0;
         end else begin
-            if (device_control_write_enable) begin 
-                device_conrol_register <= device_control_data;
+            if (device_control_write_enable && device_control_address < NUM_REGISTERS) begin
+                device_conrol_register[device_control_address] <= device_control_data;
+            end
+
+            start_delayed <= start;
+
+            if (push) begin
+                queue[queue_tail] <= {
+                    device_conrol_register[9], device_conrol_register[8],
+                    device_conrol_register[7], device_conrol_register[6],
+                    device_conrol_register[5], device_conrol_register[4],
+                    device_conrol_register[3], device_conrol_register[2],
+                    device_conrol_register[1], device_conrol_register[0]
+                };
+                queue_tail <= queue_tail + 1;
+            end
+
+            if (pop) begin
+                queue_head <= queue_head + 1;
+            end
+
+            if (push && !pop) begin
+                queue_count <= queue_count + 1;
+            end else if (pop && !push) begin
+                queue_count <= queue_count - 1;
             end
         end
     end
-endmodule
\ No newline at end of file
+endmodule
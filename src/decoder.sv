@@ -27,6 +27,7 @@ module decoder (
     output reg [1:0] decoded_alu_arithmetic_mux,   // Select arithmetic operation
     output reg decoded_alu_output_mux,             // Select operation in ALU
     output reg decoded_pc_mux,                     // Select source of next PC
+    output reg decoded_alu_select,                 // Select between rs and rt on the NZP condition (SEL)
 
     // Return (finished executing thread)
     output reg decoded_ret
@@ -41,6 +42,10 @@ module decoder (
         LDR = 4'b0111,
         STR = 4'b1000,
         CONST = 4'b1001,
+        S2R = 4'b1010,
+        SELn = 4'b1011,
+        SELz = 4'b1100,
+        SELp = 4'b1101,
         RET = 4'b1111;
 
     always @(posedge clk) begin 
@@ -58,6 +63,7 @@ module decoder (
             decoded_alu_arithmetic_mux <= 0;
             decoded_alu_output_mux <= 0;
             decoded_pc_mux <= 0;
+            decoded_alu_select <= 0;
             decoded_ret <= 0;
         end else begin 
             // Decode when core_state = DECODE
@@ -78,6 +84,7 @@ module decoder (
                 decoded_alu_arithmetic_mux <= 0;
                 decoded_alu_output_mux <= 0;
                 decoded_pc_mux <= 0;
+                decoded_alu_select <= 0;
                 decoded_ret <= 0;
 
                 // Set the control signals for each instruction
@@ -124,6 +131,21 @@ module decoder (
                         decoded_reg_write_enable <= 1;
                         decoded_reg_input_mux <= 2'b10;
                     end
+                    S2R: begin 
+                        decoded_reg_write_enable <= 1;
+                        decoded_reg_input_mux <= 2'b11;
+                    end
+                    SELn, SELz, SELp: begin 
+                        // Rd holds bits [11:8], so the condition comes from the opcode instead
+                        decoded_reg_write_enable <= 1;
+                        decoded_reg_input_mux <= 2'b00;
+                        decoded_alu_select <= 1;
+                        case (instruction[15:12])
+                            SELn: decoded_nzp <= 3'b100;
+                            SELz: decoded_nzp <= 3'b010;
+                            default: decoded_nzp <= 3'b001;
+                        endcase
+                    end
                     RET: begin 
                         decoded_ret <= 1;
                     end
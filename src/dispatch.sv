@@ -5,88 +5,140 @@
 // > The GPU has one dispatch unit at the top level
 // > Manages processing of threads and marks kernel execution as done
 // > Sends off batches of threads in blocks to be executed by available compute cores
+// > Each core always has its next block staged, so it can pick it up right after finishing the current one
+// > Blocks are numbered row by row on a 2D grid that is grid_dim_x blocks wide
+// > Kernels are taken from the DCR command queue one at a time: once every block of the kernel at the
+//   head of the queue has finished, it is popped and done is raised until the next kernel starts
+// > A kernel starts at its descriptor's first block rather than block 0 when the host resumes it part
+//   way through; the blocks before it count as already done
 module dispatch #(
     parameter NUM_CORES = 2,
     parameter THREADS_PER_BLOCK = 4
 ) (
     input wire clk,
     input wire reset,
-    input wire start,
+
+    // Kernel Queue
+    input wire queue_valid,
+    output wire queue_pop,
 
     // Kernel Metadata
-    input wire [7:0] thread_count,
+    input wire [15:0] thread_count,
+    input wire [7:0] grid_dim_x, // Blocks per grid row (0 = 256)
+    input wire [7:0] first_block_x, // Grid position of the first block to dispatch
+    input wire [7:0] first_block_y,
 
     // Core States
-    input reg [NUM_CORES-1:0] core_done,
+    input reg [NUM_CORES-1:0] core_take, // Core picked up its staged block
+    input reg [NUM_CORES-1:0] core_done, // Core retired a block
     output reg [NUM_CORES-1:0] core_start,
     output reg [NUM_CORES-1:0] core_reset,
     output reg [7:0] core_block_id [NUM_CORES-1:0],
+    output reg [7:0] core_block_id_y [NUM_CORES-1:0],
     output reg [$clog2(THREADS_PER_BLOCK):0] core_thread_count [NUM_CORES-1:0],
 
     // Kernel Execution
     output reg done
 );
     // Calculate the total number of blocks based on total threads & threads per block
-    wire [7:0] total_blocks;
-    assign total_blocks = (thread_count + THREADS_PER_BLOCK - 1) / THREADS_PER_BLOCK;
+    wire [15:0] total_blocks;
+    assign total_blocks = ({1'b0, thread_count} + THREADS_PER_BLOCK - 1) / THREADS_PER_BLOCK;
 
     // Keep track of how many blocks have been processed
-    reg [7:0] blocks_dispatched; // How many blocks have been sent to cores?
-    reg [7:0] blocks_done; // How many blocks have finished processing?
-    reg start_execution; // EDA: Unimportant hack used because of EDA tooling
+    reg [15:0] blocks_dispatched; // How many blocks have been sent to cores?
+    reg [15:0] blocks_done; // How many blocks have finished processing?
+    reg [7:0] next_block_x; // 2D index of the next block to dispatch (walks the grid row by row)
+    reg [7:0] next_block_y;
+    reg started; // The kernel at the head of the queue has been set up to start at its first block
+
+    // Number of blocks before the first one (row by row, grid_dim_x blocks per row)
+    wire [15:0] first_block;
+    assign first_block = (grid_dim_x == 0)
+        ? {first_block_y, first_block_x}
+        : {8'b0, first_block_y} * {8'b0, grid_dim_x} + {8'b0, first_block_x};
+
+    // The kernel at the head of the queue is complete once all of its blocks have finished processing
+    wire kernel_complete;
+    assign kernel_complete = queue_valid && (blocks_done == total_blocks);
+    assign queue_pop = kernel_complete;
 
     always @(posedge clk) begin
         if (reset) begin
             done <= 0;
+            started <= 0;
             blocks_dispatched = 0;
             blocks_done = 0;
-            start_execution <= 0;
+            next_block_x = 0;
+            next_block_y = 0;
 
             for (int i = 0; i < NUM_CORES; i++) begin
                 core_start[i] <= 0;
                 core_reset[i] <= 1;
                 core_block_id[i] <= 0;
+                core_block_id_y[i] <= 0;
                 core_thread_count[i] <= THREADS_PER_BLOCK;
             end
-        end else if (start) begin    
-            // EDA: Indirect way to get @(posedge start) without driving from 2 different clocks
-            if (!start_execution) begin 
-                start_execution <= 1;
-                for (int i = 0; i < NUM_CORES; i++) begin
-                    core_reset[i] <= 1;
-                end
+        end else begin
+            // Cores are only reset along with the GPU, never between blocks or kernels
+            for (int i = 0; i < NUM_CORES; i++) begin
+                core_reset[i] <= 0;
             end
 
-            // If the last block has finished processing, mark this kernel as done executing
-            if (blocks_done == total_blocks) begin 
+            if (kernel_complete) begin
+                // The last block has finished processing, so mark this kernel as done executing
+                // and start over with the next descriptor in the queue
                 done <= 1;
-            end
+                started <= 0;
+                blocks_dispatched = 0;
+                blocks_done = 0;
+                next_block_x = 0;
+                next_block_y = 0;
+            end else if (queue_valid) begin
+                done <= 0;
 
-            for (int i = 0; i < NUM_CORES; i++) begin
-                if (core_reset[i]) begin 
-                    core_reset[i] <= 0;
-
-                    // If this core was just reset, check if there are more blocks to be dispatched
-                    if (blocks_dispatched < total_blocks) begin 
-                        core_start[i] <= 1;
-                        core_block_id[i] <= blocks_dispatched;
-                        core_thread_count[i] <= (blocks_dispatched == total_blocks - 1) 
-                            ? thread_count - (blocks_dispatched * THREADS_PER_BLOCK)
-                            : THREADS_PER_BLOCK;
-
-                        blocks_dispatched = blocks_dispatched + 1;
+                if (!started) begin
+                    // First cycle of this kernel: skip the blocks before its first block
+                    blocks_dispatched = first_block;
+                    blocks_done = first_block;
+                    next_block_x = first_block_x;
+                    next_block_y = first_block_y;
+                    started <= 1;
+                end
+
+                for (int i = 0; i < NUM_CORES; i++) begin
+                    if (core_done[i]) begin
+                        // A core just retired a block (it moves on to its staged block by itself)
+                        blocks_done = blocks_done + 1;
                     end
                 end
-            end
 
-            for (int i = 0; i < NUM_CORES; i++) begin
-                if (core_start[i] && core_done[i]) begin
-                    // If a core just finished executing it's current block, reset it
-                    core_reset[i] <= 1;
-                    core_start[i] <= 0;
-                    blocks_done = blocks_done + 1;
+                for (int i = 0; i < NUM_CORES; i++) begin
+                    if (!core_reset[i] && (core_take[i] || !core_start[i])) begin
+                        // The staged block was picked up (or nothing is staged yet), so stage the next one
+                        // while the core works on the current block
+                        if (blocks_dispatched < total_blocks) begin
+                            core_start[i] <= 1;
+                            core_block_id[i] <= next_block_x;
+                            core_block_id_y[i] <= next_block_y;
+                            core_thread_count[i] <= (blocks_dispatched == total_blocks - 1)
+                                ? thread_count - (blocks_dispatched * THREADS_PER_BLOCK)
+                                : THREADS_PER_BLOCK;
+
+                            blocks_dispatched = blocks_dispatched + 1;
+
+                            // Advance along the row, wrapping to the next row after grid_dim_x blocks
+                            if (next_block_x == grid_dim_x - 8'd1) begin
+                                next_block_x = 0;
+                                next_block_y = next_block_y + 1;
+                            end else begin
+                                next_block_x = next_block_x + 1;
+                            end
+                        end else begin
+                            core_start[i] <= 0;
+                        end
+                    end
                 end
             end
         end
     end
-endmodule
\ No newline at end of file
+endmodule
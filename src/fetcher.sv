@@ -4,13 +4,25 @@
 // INSTRUCTION FETCHER
 // > Retrieves the instruction at the current PC from global data memory
 // > Each core has it's own fetcher
+// > With PREFETCH_DEPTH above 0, the fetcher keeps a next-line prefetch buffer: while the core decodes
+//   and executes an instruction, it keeps requesting PC+1..PC+PREFETCH_DEPTH one at a time, so
+//   straight-line code finds its next instruction already fetched
+// > The buffer holds a window of consecutive instructions starting at buffer_pc. A fetch whose PC is in
+//   the window is a hit and completes without going to memory. A fetch of any PC other than the window
+//   or the one right after it (a taken BRnzp, the other side of a divergent branch, a new block) flushes
+//   the window and refetches from that PC
+// > A request already in flight can't be cancelled, so after a flush its response is dropped unless it
+//   happens to be the instruction the new window starts with
+// > The program memory controller always serves the lowest-numbered waiting core first, so a prefetch
+//   waits one cycle after each response before going out, giving other cores' fetches the free channel
 module fetcher #(
     parameter PROGRAM_MEM_ADDR_BITS = 8,
-    parameter PROGRAM_MEM_DATA_BITS = 16
+    parameter PROGRAM_MEM_DATA_BITS = 16,
+    parameter PREFETCH_DEPTH = 0 // Instructions fetched ahead of the current PC (0 = fetch on demand only)
 ) (
     input wire clk,
     input wire reset,
-    
+
     // Execution State
     input reg [2:0] core_state,
     input reg [7:0] current_pc,
@@ -24,18 +36,36 @@ module fetcher #(
     // Fetcher Output
     output reg [2:0] fetcher_state,
     output reg [PROGRAM_MEM_DATA_BITS-1:0] instruction,
+
+    // Performance Counters
+    output reg [31:0] perf_prefetch_hits,   // Fetches served from the prefetch buffer
+    output reg [31:0] perf_prefetch_flushes // Windows thrown away for a non-sequential PC
 );
-    localparam IDLE = 3'b000, 
-        FETCHING = 3'b001, 
+    localparam IDLE = 3'b000,
+        FETCHING = 3'b001,
         FETCHED = 3'b010;
-    
+
+    // Prefetch window (only used when PREFETCH_DEPTH > 0), updated with blocking assignments so a
+    // response and a fetch in the same cycle see each other
+    reg [PROGRAM_MEM_DATA_BITS-1:0] buffer [PREFETCH_DEPTH:0];
+    reg [7:0] buffer_pc;    // PC of buffer[0]
+    reg [7:0] buffer_count; // Instructions in the window
+    reg [7:0] offset;
+    reg demand;  // The core is waiting on the instruction the next request would fetch
+    reg backoff; // A response arrived last cycle, so only a demand fetch may go out now
+
     always @(posedge clk) begin
         if (reset) begin
             fetcher_state <= IDLE;
             mem_read_valid <= 0;
             mem_read_address <= 0;
             instruction <= {PROGRAM_MEM_DATA_BITS{1'b0}};
-        end else begin
+            buffer_pc = 0;
+            buffer_count = 0;
+            backoff <= 0;
+            perf_prefetch_hits <= 0;
+            perf_prefetch_flushes <= 0;
+        end else if (PREFETCH_DEPTH == 0) begin
             case (fetcher_state)
                 IDLE: begin
                     // Start fetching when core_state = FETCH
@@ -55,11 +85,78 @@ module fetcher #(
                 end
                 FETCHED: begin
                     // Reset when core_state = DECODE
-                    if (core_state == 3'b010) begin 
+                    if (core_state == 3'b010) begin
                         fetcher_state <= IDLE;
                     end
                 end
             endcase
+        end else begin
+            // A response extends the window if it's the next instruction the window needs
+            demand = 0;
+            backoff <= mem_read_valid && mem_read_ready;
+            if (mem_read_valid && mem_read_ready) begin
+                mem_read_valid <= 0;
+                if (mem_read_address == buffer_pc + buffer_count && buffer_count < PREFETCH_DEPTH) begin
+                    buffer[buffer_count] = mem_read_data;
+                    buffer_count = buffer_count + 1;
+                end
+            end
+
+            case (fetcher_state)
+                IDLE: begin
+                    if (core_state == 3'b001) begin
+                        offset = current_pc - buffer_pc;
+                        if (offset < buffer_count) begin
+                            // Hit: hand the instruction straight over and drop everything up to it
+                            perf_prefetch_hits <= perf_prefetch_hits + 1;
+                            instruction <= buffer[offset];
+                            fetcher_state <= FETCHED;
+                            for (int i = 0; i < PREFETCH_DEPTH; i = i + 1) begin
+                                if (i + offset + 1 < PREFETCH_DEPTH) begin
+                                    buffer[i] = buffer[i + offset + 1];
+                                end
+                            end
+                            buffer_pc = current_pc + 1;
+                            buffer_count = buffer_count - offset - 1;
+                        end else begin
+                            // Anything but the instruction right after the window is a flush
+                            if (offset != buffer_count && (buffer_count != 0 || mem_read_valid)) begin
+                                perf_prefetch_flushes <= perf_prefetch_flushes + 1;
+                            end
+                            buffer_pc = current_pc;
+                            buffer_count = 0;
+                            demand = 1;
+                            fetcher_state <= FETCHING;
+                        end
+                    end
+                end
+                FETCHING: begin
+                    // Wait for the window to start with the current PC
+                    if (buffer_count != 0) begin
+                        instruction <= buffer[0];
+                        fetcher_state <= FETCHED;
+                        for (int i = 0; i < PREFETCH_DEPTH; i = i + 1) begin
+                            buffer[i] = buffer[i + 1];
+                        end
+                        buffer_pc = buffer_pc + 1;
+                        buffer_count = buffer_count - 1;
+                    end else begin
+                        demand = 1;
+                    end
+                end
+                FETCHED: begin
+                    if (core_state == 3'b010) begin
+                        fetcher_state <= IDLE;
+                    end
+                end
+            endcase
+
+            // Keep one request in flight for the next instruction the window is missing, while a block runs
+            if (!mem_read_valid && buffer_count < PREFETCH_DEPTH && core_state != 3'b000 && core_state != 3'b111
+                && (demand || !backoff)) begin
+                mem_read_valid <= 1;
+                mem_read_address <= buffer_pc + buffer_count;
+            end
         end
     end
 endmodule
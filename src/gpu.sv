@@ -5,17 +5,23 @@
 // > Built to use an external async memory with multi-channel read/write
 // > Assumes that the program is loaded into program memory, data into data memory, and threads into
 //   the device control register before the start signal is triggered
+// > Each start pulse enqueues a kernel, and done is raised every time a kernel finishes, so kernels
+//   can be run back-to-back without resetting the GPU
 // > Has memory controllers to interface between external memory and its multiple cores
 // > Configurable number of cores and thread capacity per core
 module gpu #(
     parameter DATA_MEM_ADDR_BITS = 8,        // Number of bits in data memory address (256 rows)
     parameter DATA_MEM_DATA_BITS = 8,        // Number of bits in data memory value (8 bit data)
     parameter DATA_MEM_NUM_CHANNELS = 4,     // Number of concurrent channels for sending requests to data memory
+    parameter DATA_MEM_BANKED = 0,           // Whether each data memory channel is one address-interleaved bank
+    parameter DATA_MEM_MAX_OUTSTANDING = 1,  // Requests each data memory channel can have in flight (>1 = pipelined, tagged)
     parameter PROGRAM_MEM_ADDR_BITS = 8,     // Number of bits in program memory address (256 rows)
     parameter PROGRAM_MEM_DATA_BITS = 16,    // Number of bits in program memory value (16 bit instruction)
     parameter PROGRAM_MEM_NUM_CHANNELS = 1,  // Number of concurrent channels for sending requests to program memory
+    parameter PREFETCH_DEPTH = 0,            // Instructions each fetcher prefetches ahead of the current PC (0 = off)
     parameter NUM_CORES = 2,                 // Number of cores to include in this GPU
-    parameter THREADS_PER_BLOCK = 4          // Number of threads to handle per block (determines the compute resources of each core)
+    parameter THREADS_PER_BLOCK = 4,         // Number of threads to handle per block (determines the compute resources of each core)
+    parameter QUEUE_DEPTH = 4                // Number of kernels that can be waiting in the command queue (power of 2)
 ) (
     input wire clk,
     input wire reset,
@@ -23,9 +29,11 @@ module gpu #(
     // Kernel Execution
     input wire start,
     output wire done,
+    output wire queue_full,
 
     // Device Control Register
     input wire device_control_write_enable,
+    input wire [3:0] device_control_address,
     input wire [7:0] device_control_data,
 
     // Program Memory
@@ -42,16 +50,31 @@ module gpu #(
     output wire [DATA_MEM_NUM_CHANNELS-1:0] data_mem_write_valid,
     output wire [DATA_MEM_ADDR_BITS-1:0] data_mem_write_address [DATA_MEM_NUM_CHANNELS-1:0],
     output wire [DATA_MEM_DATA_BITS-1:0] data_mem_write_data [DATA_MEM_NUM_CHANNELS-1:0],
-    input wire [DATA_MEM_NUM_CHANNELS-1:0] data_mem_write_ready
+    input wire [DATA_MEM_NUM_CHANNELS-1:0] data_mem_write_ready,
+
+    // Data Memory request/response tags (only used when DATA_MEM_MAX_OUTSTANDING > 1, see controller.sv)
+    output wire [$clog2(NUM_CORES * THREADS_PER_BLOCK)-1:0] data_mem_read_tag [DATA_MEM_NUM_CHANNELS-1:0],
+    input wire [$clog2(NUM_CORES * THREADS_PER_BLOCK)-1:0] data_mem_read_response_tag [DATA_MEM_NUM_CHANNELS-1:0],
+    output wire [$clog2(NUM_CORES * THREADS_PER_BLOCK)-1:0] data_mem_write_tag [DATA_MEM_NUM_CHANNELS-1:0],
+    input wire [$clog2(NUM_CORES * THREADS_PER_BLOCK)-1:0] data_mem_write_response_tag [DATA_MEM_NUM_CHANNELS-1:0]
 );
-    // Control
-    wire [7:0] thread_count;
+    // Control (descriptor of the kernel being executed)
+    wire queue_valid;
+    wire queue_pop;
+    wire [15:0] thread_count;
+    wire [7:0] grid_dim_x;
+    wire [7:0] program_base;
+    wire [31:0] params;
+    wire [7:0] first_block_x;
+    wire [7:0] first_block_y;
 
     // Compute Core State
     reg [NUM_CORES-1:0] core_start;
     reg [NUM_CORES-1:0] core_reset;
+    reg [NUM_CORES-1:0] core_take;
     reg [NUM_CORES-1:0] core_done;
     reg [7:0] core_block_id [NUM_CORES-1:0];
+    reg [7:0] core_block_id_y [NUM_CORES-1:0];
     reg [$clog2(THREADS_PER_BLOCK):0] core_thread_count [NUM_CORES-1:0];
 
     // LSU <> Data Memory Controller Channels
@@ -73,13 +96,27 @@ module gpu #(
     reg [PROGRAM_MEM_DATA_BITS-1:0] fetcher_read_data [NUM_FETCHERS-1:0];
     
     // Device Control Register
-    dcr dcr_instance (
+    dcr #(
+        .QUEUE_DEPTH(QUEUE_DEPTH)
+    ) dcr_instance (
         .clk(clk),
         .reset(reset),
 
         .device_control_write_enable(device_control_write_enable),
+        .device_control_address(device_control_address),
         .device_control_data(device_control_data),
-        .thread_count(thread_count)
+
+        .start(start),
+        .queue_full(queue_full),
+
+        .queue_valid(queue_valid),
+        .queue_pop(queue_pop),
+        .thread_count(thread_count),
+        .grid_dim_x(grid_dim_x),
+        .program_base(program_base),
+        .params(params),
+        .first_block_x(first_block_x),
+        .first_block_y(first_block_y)
     );
 
     // Data Memory Controller
@@ -87,7 +124,9 @@ module gpu #(
         .ADDR_BITS(DATA_MEM_ADDR_BITS),
         .DATA_BITS(DATA_MEM_DATA_BITS),
         .NUM_CONSUMERS(NUM_LSUS),
-        .NUM_CHANNELS(DATA_MEM_NUM_CHANNELS)
+        .NUM_CHANNELS(DATA_MEM_NUM_CHANNELS),
+        .BANKED(DATA_MEM_BANKED),
+        .MAX_OUTSTANDING(DATA_MEM_MAX_OUTSTANDING)
     ) data_memory_controller (
         .clk(clk),
         .reset(reset),
@@ -108,7 +147,11 @@ module gpu #(
         .mem_write_valid(data_mem_write_valid),
         .mem_write_address(data_mem_write_address),
         .mem_write_data(data_mem_write_data),
-        .mem_write_ready(data_mem_write_ready)
+        .mem_write_ready(data_mem_write_ready),
+        .mem_read_tag(data_mem_read_tag),
+        .mem_read_response_tag(data_mem_read_response_tag),
+        .mem_write_tag(data_mem_write_tag),
+        .mem_write_response_tag(data_mem_write_response_tag)
     );
 
     // Program Memory Controller
@@ -140,12 +183,18 @@ module gpu #(
     ) dispatch_instance (
         .clk(clk),
         .reset(reset),
-        .start(start),
+        .queue_valid(queue_valid),
+        .queue_pop(queue_pop),
         .thread_count(thread_count),
+        .grid_dim_x(grid_dim_x),
+        .first_block_x(first_block_x),
+        .first_block_y(first_block_y),
+        .core_take(core_take),
         .core_done(core_done),
         .core_start(core_start),
         .core_reset(core_reset),
         .core_block_id(core_block_id),
+        .core_block_id_y(core_block_id_y),
         .core_thread_count(core_thread_count),
         .done(done)
     );
@@ -190,13 +239,19 @@ module gpu #(
                 .PROGRAM_MEM_ADDR_BITS(PROGRAM_MEM_ADDR_BITS),
                 .PROGRAM_MEM_DATA_BITS(PROGRAM_MEM_DATA_BITS),
                 .THREADS_PER_BLOCK(THREADS_PER_BLOCK),
+                .PREFETCH_DEPTH(PREFETCH_DEPTH)
             ) core_instance (
                 .clk(clk),
                 .reset(core_reset[i]),
                 .start(core_start[i]),
+                .take(core_take[i]),
                 .done(core_done[i]),
-                .block_id(core_block_id[i]),
-                .thread_count(core_thread_count[i]),
+                .staged_block_id(core_block_id[i]),
+                .staged_block_id_y(core_block_id_y[i]),
+                .staged_thread_count(core_thread_count[i]),
+                .grid_dim_x(grid_dim_x),
+                .program_base(program_base),
+                .params(params),
                 
                 .program_mem_read_valid(fetcher_read_valid[i]),
                 .program_mem_read_address(fetcher_read_address[i]),
@@ -0,0 +1,201 @@
+`default_nettype none
+`timescale 1ns/1ns
+
+// MULTI-DEVICE GPU
+// > Instantiates NUM_DEVICES complete gpus, each with its own device control register, command queue,
+//   dispatcher and memory controllers. The host launches on each device through its own start, done
+//   and queue_full bits, so devices run concurrently and finish independently
+// > The DCR address and data buses are shared: a write lands in every device whose write enable bit is set
+// > Program memory channels of all devices are exposed side by side (device d's channels follow
+//   device d-1's), so one program image can serve every device
+// > Data memory is either separate or shared:
+//   - Separate (SHARED_DATA_MEM = 0): every device's channels are exposed side by side and the device
+//     index is prepended to their addresses, so device d owns rows d << DATA_MEM_ADDR_BITS onwards of
+//     one external memory and devices never contend
+//   - Shared (SHARED_DATA_MEM = 1): every device's channels go through one more memory controller onto
+//     SHARED_DATA_MEM_NUM_CHANNELS external channels, so devices see the same rows and compete for them
+// > Devices keep blocking data memory channels (DATA_MEM_MAX_OUTSTANDING = 1), so their tag ports are
+//   left unconnected
+module multi_gpu #(
+    parameter NUM_DEVICES = 2,                  // Number of gpu instances
+    parameter SHARED_DATA_MEM = 0,              // Whether the devices share one data memory (see above)
+    parameter SHARED_DATA_MEM_NUM_CHANNELS = 4, // External data memory channels when shared
+    parameter DATA_MEM_ADDR_BITS = 8,           // Parameters of each gpu (see gpu.sv)
+    parameter DATA_MEM_DATA_BITS = 8,
+    parameter DATA_MEM_NUM_CHANNELS = 4,
+    parameter DATA_MEM_BANKED = 0,
+    parameter PROGRAM_MEM_ADDR_BITS = 8,
+    parameter PROGRAM_MEM_DATA_BITS = 16,
+    parameter PROGRAM_MEM_NUM_CHANNELS = 1,
+    parameter PREFETCH_DEPTH = 0,
+    parameter NUM_CORES = 2,
+    parameter THREADS_PER_BLOCK = 4,
+    parameter QUEUE_DEPTH = 4,
+
+    // External data memory interface, derived from the above
+    localparam DEVICE_DATA_CHANNELS = NUM_DEVICES * DATA_MEM_NUM_CHANNELS,
+    localparam EXTERNAL_DATA_MEM_ADDR_BITS = SHARED_DATA_MEM ? DATA_MEM_ADDR_BITS : DATA_MEM_ADDR_BITS + $clog2(NUM_DEVICES),
+    localparam EXTERNAL_DATA_MEM_NUM_CHANNELS = SHARED_DATA_MEM ? SHARED_DATA_MEM_NUM_CHANNELS : DEVICE_DATA_CHANNELS,
+    localparam PROGRAM_CHANNELS = NUM_DEVICES * PROGRAM_MEM_NUM_CHANNELS
+) (
+    input wire clk,
+    input wire reset,
+
+    // Kernel Execution (one bit per device)
+    input wire [NUM_DEVICES-1:0] start,
+    output wire [NUM_DEVICES-1:0] done,
+    output wire [NUM_DEVICES-1:0] queue_full,
+
+    // Device Control Registers
+    input wire [NUM_DEVICES-1:0] device_control_write_enable,
+    input wire [3:0] device_control_address,
+    input wire [7:0] device_control_data,
+
+    // Program Memory
+    output wire [PROGRAM_CHANNELS-1:0] program_mem_read_valid,
+    output wire [PROGRAM_MEM_ADDR_BITS-1:0] program_mem_read_address [PROGRAM_CHANNELS-1:0],
+    input wire [PROGRAM_CHANNELS-1:0] program_mem_read_ready,
+    input wire [PROGRAM_MEM_DATA_BITS-1:0] program_mem_read_data [PROGRAM_CHANNELS-1:0],
+
+    // Data Memory
+    output wire [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0] data_mem_read_valid,
+    output wire [EXTERNAL_DATA_MEM_ADDR_BITS-1:0] data_mem_read_address [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0],
+    input wire [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0] data_mem_read_ready,
+    input wire [DATA_MEM_DATA_BITS-1:0] data_mem_read_data [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0],
+    output wire [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0] data_mem_write_valid,
+    output wire [EXTERNAL_DATA_MEM_ADDR_BITS-1:0] data_mem_write_address [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0],
+    output wire [DATA_MEM_DATA_BITS-1:0] data_mem_write_data [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0],
+    input wire [EXTERNAL_DATA_MEM_NUM_CHANNELS-1:0] data_mem_write_ready
+);
+    // Data memory channels of every device, side by side
+    wire [DEVICE_DATA_CHANNELS-1:0] device_read_valid;
+    wire [DATA_MEM_ADDR_BITS-1:0] device_read_address [DEVICE_DATA_CHANNELS-1:0];
+    wire [DEVICE_DATA_CHANNELS-1:0] device_read_ready;
+    wire [DATA_MEM_DATA_BITS-1:0] device_read_data [DEVICE_DATA_CHANNELS-1:0];
+    wire [DEVICE_DATA_CHANNELS-1:0] device_write_valid;
+    wire [DATA_MEM_ADDR_BITS-1:0] device_write_address [DEVICE_DATA_CHANNELS-1:0];
+    wire [DATA_MEM_DATA_BITS-1:0] device_write_data [DEVICE_DATA_CHANNELS-1:0];
+    wire [DEVICE_DATA_CHANNELS-1:0] device_write_ready;
+
+    genvar d, c;
+    generate
+        for (d = 0; d < NUM_DEVICES; d = d + 1) begin : devices
+            // EDA: separate signals per device rather than slices of the top-level arrays (see gpu.sv)
+            wire [PROGRAM_MEM_NUM_CHANNELS-1:0] program_read_valid;
+            wire [PROGRAM_MEM_ADDR_BITS-1:0] program_read_address [PROGRAM_MEM_NUM_CHANNELS-1:0];
+            wire [PROGRAM_MEM_NUM_CHANNELS-1:0] program_read_ready;
+            wire [PROGRAM_MEM_DATA_BITS-1:0] program_read_data [PROGRAM_MEM_NUM_CHANNELS-1:0];
+            wire [DATA_MEM_NUM_CHANNELS-1:0] data_read_valid;
+            wire [DATA_MEM_ADDR_BITS-1:0] data_read_address [DATA_MEM_NUM_CHANNELS-1:0];
+            wire [DATA_MEM_NUM_CHANNELS-1:0] data_read_ready;
+            wire [DATA_MEM_DATA_BITS-1:0] data_read_data [DATA_MEM_NUM_CHANNELS-1:0];
+            wire [DATA_MEM_NUM_CHANNELS-1:0] data_write_valid;
+            wire [DATA_MEM_ADDR_BITS-1:0] data_write_address [DATA_MEM_NUM_CHANNELS-1:0];
+            wire [DATA_MEM_DATA_BITS-1:0] data_write_data [DATA_MEM_NUM_CHANNELS-1:0];
+            wire [DATA_MEM_NUM_CHANNELS-1:0] data_write_ready;
+
+            gpu #(
+                .DATA_MEM_ADDR_BITS(DATA_MEM_ADDR_BITS),
+                .DATA_MEM_DATA_BITS(DATA_MEM_DATA_BITS),
+                .DATA_MEM_NUM_CHANNELS(DATA_MEM_NUM_CHANNELS),
+                .DATA_MEM_BANKED(DATA_MEM_BANKED),
+                .PROGRAM_MEM_ADDR_BITS(PROGRAM_MEM_ADDR_BITS),
+                .PROGRAM_MEM_DATA_BITS(PROGRAM_MEM_DATA_BITS),
+                .PROGRAM_MEM_NUM_CHANNELS(PROGRAM_MEM_NUM_CHANNELS),
+                .PREFETCH_DEPTH(PREFETCH_DEPTH),
+                .NUM_CORES(NUM_CORES),
+                .THREADS_PER_BLOCK(THREADS_PER_BLOCK),
+                .QUEUE_DEPTH(QUEUE_DEPTH)
+            ) gpu_instance (
+                .clk(clk),
+                .reset(reset),
+
+                .start(start[d]),
+                .done(done[d]),
+                .queue_full(queue_full[d]),
+
+                .device_control_write_enable(device_control_write_enable[d]),
+                .device_control_address(device_control_address),
+                .device_control_data(device_control_data),
+
+                .program_mem_read_valid(program_read_valid),
+                .program_mem_read_address(program_read_address),
+                .program_mem_read_ready(program_read_ready),
+                .program_mem_read_data(program_read_data),
+
+                .data_mem_read_valid(data_read_valid),
+                .data_mem_read_address(data_read_address),
+                .data_mem_read_ready(data_read_ready),
+                .data_mem_read_data(data_read_data),
+                .data_mem_write_valid(data_write_valid),
+                .data_mem_write_address(data_write_address),
+                .data_mem_write_data(data_write_data),
+                .data_mem_write_ready(data_write_ready)
+            );
+
+            for (c = 0; c < PROGRAM_MEM_NUM_CHANNELS; c = c + 1) begin : program_channels
+                localparam channel = d * PROGRAM_MEM_NUM_CHANNELS + c;
+                assign program_mem_read_valid[channel] = program_read_valid[c];
+                assign program_mem_read_address[channel] = program_read_address[c];
+                assign program_read_ready[c] = program_mem_read_ready[channel];
+                assign program_read_data[c] = program_mem_read_data[channel];
+            end
+
+            for (c = 0; c < DATA_MEM_NUM_CHANNELS; c = c + 1) begin : data_channels
+                localparam channel = d * DATA_MEM_NUM_CHANNELS + c;
+                assign device_read_valid[channel] = data_read_valid[c];
+                assign device_read_address[channel] = data_read_address[c];
+                assign data_read_ready[c] = device_read_ready[channel];
+                assign data_read_data[c] = device_read_data[channel];
+                assign device_write_valid[channel] = data_write_valid[c];
+                assign device_write_address[channel] = data_write_address[c];
+                assign device_write_data[channel] = data_write_data[c];
+                assign data_write_ready[c] = device_write_ready[channel];
+            end
+        end
+
+        if (SHARED_DATA_MEM) begin : shared
+            // Every device channel is a consumer of one more controller in front of the shared memory
+            controller #(
+                .ADDR_BITS(DATA_MEM_ADDR_BITS),
+                .DATA_BITS(DATA_MEM_DATA_BITS),
+                .NUM_CONSUMERS(DEVICE_DATA_CHANNELS),
+                .NUM_CHANNELS(SHARED_DATA_MEM_NUM_CHANNELS)
+            ) shared_data_memory_controller (
+                .clk(clk),
+                .reset(reset),
+
+                .consumer_read_valid(device_read_valid),
+                .consumer_read_address(device_read_address),
+                .consumer_read_ready(device_read_ready),
+                .consumer_read_data(device_read_data),
+                .consumer_write_valid(device_write_valid),
+                .consumer_write_address(device_write_address),
+                .consumer_write_data(device_write_data),
+                .consumer_write_ready(device_write_ready),
+
+                .mem_read_valid(data_mem_read_valid),
+                .mem_read_address(data_mem_read_address),
+                .mem_read_ready(data_mem_read_ready),
+                .mem_read_data(data_mem_read_data),
+                .mem_write_valid(data_mem_write_valid),
+                .mem_write_address(data_mem_write_address),
+                .mem_write_data(data_mem_write_data),
+                .mem_write_ready(data_mem_write_ready)
+            );
+        end else begin : separate
+            // Pass every channel straight through, with its device index as the top address bits
+            for (c = 0; c < DEVICE_DATA_CHANNELS; c = c + 1) begin : channels
+                localparam device = c / DATA_MEM_NUM_CHANNELS;
+                assign data_mem_read_valid[c] = device_read_valid[c];
+                assign data_mem_read_address[c] = device * (1 << DATA_MEM_ADDR_BITS) + device_read_address[c];
+                assign device_read_ready[c] = data_mem_read_ready[c];
+                assign device_read_data[c] = data_mem_read_data[c];
+                assign data_mem_write_valid[c] = device_write_valid[c];
+                assign data_mem_write_address[c] = device * (1 << DATA_MEM_ADDR_BITS) + device_write_address[c];
+                assign data_mem_write_data[c] = device_write_data[c];
+                assign device_write_ready[c] = data_mem_write_ready[c];
+            end
+        end
+    endgenerate
+endmodule
@@ -4,6 +4,8 @@
 // REGISTER FILE
 // > Each thread within each core has it's own register file with 13 free registers and 3 read-only registers
 // > Read-only registers hold the familiar %blockIdx, %blockDim, and %threadIdx values critical to SIMD
+// > Launch values that don't fit in the register file (%blockIdy, %gridDimX, kernel parameters) are read
+//   with the S2R instruction
 module registers #(
     parameter THREADS_PER_BLOCK = 4,
     parameter THREAD_ID = 0,
@@ -15,6 +17,9 @@ module registers #(
 
     // Kernel Execution
     input reg [7:0] block_id,
+    input reg [7:0] block_id_y,
+    input reg [7:0] grid_dim_x,
+    input reg [31:0] params,
 
     // State
     input reg [2:0] core_state,
@@ -39,7 +44,19 @@ module registers #(
 );
     localparam ARITHMETIC = 2'b00,
         MEMORY = 2'b01,
-        CONSTANT = 2'b10;
+        CONSTANT = 2'b10,
+        SPECIAL = 2'b11;
+
+    // Special registers selected by the S2R immediate
+    localparam BLOCK_IDX = 4'd0,
+        BLOCK_IDY = 4'd1,
+        BLOCK_DIM = 4'd2,
+        THREAD_IDX = 4'd3,
+        GRID_DIM_X = 4'd4,
+        PARAM0 = 4'd5,
+        PARAM1 = 4'd6,
+        PARAM2 = 4'd7,
+        PARAM3 = 4'd8;
 
     // 16 registers per thread (13 free registers and 3 read-only registers)
     reg [7:0] registers[15:0];
@@ -67,34 +84,59 @@ module registers #(
             registers[13] <= 8'b0;              // %blockIdx
             registers[14] <= THREADS_PER_BLOCK; // %blockDim
             registers[15] <= THREAD_ID;         // %threadIdx
-        end else if (enable) begin 
-            // [Bad Solution] Shouldn't need to set this every cycle
-            registers[13] <= block_id; // Update the block_id when a new block is issued from dispatcher
-            
-            // Fill rs/rt when core_state = REQUEST
-            if (core_state == 3'b011) begin 
-                rs <= registers[decoded_rs_address];
-                rt <= registers[decoded_rt_address];
+        end else begin 
+            // Re-initialize free registers between blocks when core_state = IDLE or DONE,
+            // since cores move on to the next block without being reset
+            if (core_state == 3'b000 || core_state == 3'b111) begin 
+                for (int i = 0; i < 13; i++) begin
+                    registers[i] <= 8'b0;
+                end
             end
 
-            // Store rd when core_state = UPDATE
-            if (core_state == 3'b110) begin 
-                // Only allow writing to R0 - R12
-                if (decoded_reg_write_enable && decoded_rd_address < 13) begin
-                    case (decoded_reg_input_mux)
-                        ARITHMETIC: begin 
-                            // ADD, SUB, MUL, DIV
-                            registers[decoded_rd_address] <= alu_out;
-                        end
-                        MEMORY: begin 
-                            // LDR
-                            registers[decoded_rd_address] <= lsu_out;
-                        end
-                        CONSTANT: begin 
-                            // CONST
-                            registers[decoded_rd_address] <= decoded_immediate;
-                        end
-                    endcase
+            if (enable) begin 
+                // [Bad Solution] Shouldn't need to set this every cycle
+                registers[13] <= block_id; // Update the block_id when a new block is issued from dispatcher
+            
+                // Fill rs/rt when core_state = REQUEST
+                if (core_state == 3'b011) begin 
+                    rs <= registers[decoded_rs_address];
+                    rt <= registers[decoded_rt_address];
+                end
+
+                // Store rd when core_state = UPDATE
+                if (core_state == 3'b110) begin 
+                    // Only allow writing to R0 - R12
+                    if (decoded_reg_write_enable && decoded_rd_address < 13) begin
+                        case (decoded_reg_input_mux)
+                            ARITHMETIC: begin 
+                                // ADD, SUB, MUL, DIV
+                                registers[decoded_rd_address] <= alu_out;
+                            end
+                            MEMORY: begin 
+                                // LDR
+                                registers[decoded_rd_address] <= lsu_out;
+                            end
+                            CONSTANT: begin 
+                                // CONST
+                                registers[decoded_rd_address] <= decoded_immediate;
+                            end
+                            SPECIAL: begin 
+                                // S2R
+                                case (decoded_immediate[3:0])
+                                    BLOCK_IDX: registers[decoded_rd_address] <= block_id;
+                                    BLOCK_IDY: registers[decoded_rd_address] <= block_id_y;
+                                    BLOCK_DIM: registers[decoded_rd_address] <= THREADS_PER_BLOCK;
+                                    THREAD_IDX: registers[decoded_rd_address] <= THREAD_ID;
+                                    GRID_DIM_X: registers[decoded_rd_address] <= grid_dim_x;
+                                    PARAM0: registers[decoded_rd_address] <= params[7:0];
+                                    PARAM1: registers[decoded_rd_address] <= params[15:8];
+                                    PARAM2: registers[decoded_rd_address] <= params[23:16];
+                                    PARAM3: registers[decoded_rd_address] <= params[31:24];
+                                    default: registers[decoded_rd_address] <= 8'b0;
+                                endcase
+                            end
+                        endcase
+                    end
                 end
             end
         end
@@ -11,14 +11,21 @@
 // 6. UPDATE - Update register values (including NZP register) and program counter
 // > Each core has it's own scheduler where multiple threads can be processed with
 //   the same control flow at once.
-// > Technically, different instructions can branch to different PCs, requiring "branch divergence." In
-//   this minimal implementation, we assume no branch divergence (naive approach for simplicity)
+// > Threads can branch to different PCs ("branch divergence"). Each thread keeps its own next PC, and
+//   every instruction is issued at the lowest next PC among the threads still running, with an active
+//   mask of the threads waiting at that PC. Threads that aren't active are skipped until the others
+//   catch up, so the two sides of a branch run one after the other and the threads reconverge at the
+//   first PC they share (the end of an if/else, or the exit of a loop once every thread is done with it)
+// > A thread retires when it executes RET; the block is done once every enabled thread has retired
+// > The dispatcher stages the next block while this one runs, so after RET the core passes through
+//   DONE for a single cycle and goes straight to FETCH of the staged block without a reset
 module scheduler #(
     parameter THREADS_PER_BLOCK = 4,
 ) (
     input wire clk,
     input wire reset,
     input wire start,
+    input wire [7:0] program_base, // First instruction of the kernel
     
     // Control Signals
     input reg decoded_mem_read_enable,
@@ -33,9 +40,22 @@ module scheduler #(
     output reg [7:0] current_pc,
     input reg [7:0] next_pc [THREADS_PER_BLOCK-1:0],
 
+    // Threads of the current block (i < thread_count), and those executing the current instruction
+    input wire [THREADS_PER_BLOCK-1:0] thread_enable,
+    output reg [THREADS_PER_BLOCK-1:0] active_mask,
+
     // Execution State
     output reg [2:0] core_state,
-    output reg done
+    output reg take, // Pulses for one cycle when the staged block is picked up
+    output reg done, // Pulses for one cycle when a block retires
+
+    // Performance Counters
+    output reg [31:0] perf_active_cycles,  // Cycles spent executing blocks
+    output reg [31:0] perf_handoff_cycles, // Cycles spent in DONE with no staged block, before picking up the next one
+    output reg [15:0] perf_handoffs,       // Blocks picked up straight from DONE
+    output reg [15:0] perf_blocks_retired,
+    output reg [31:0] perf_divergent_cycles, // Active cycles spent on instructions only some running threads execute
+    output reg [15:0] perf_divergences       // Instructions after which the running threads split up
 );
     localparam IDLE = 3'b000, // Waiting to start
         FETCH = 3'b001,       // Fetch instructions from program memory
@@ -45,20 +65,48 @@ module scheduler #(
         EXECUTE = 3'b101,     // Execute ALU and PC calculations
         UPDATE = 3'b110,      // Update registers, NZP, and PC
         DONE = 3'b111;        // Done executing this block
+
+    // Threads that have executed RET in the current block
+    reg [THREADS_PER_BLOCK-1:0] retired;
+
+    // Cycles waited in DONE so far; only added to perf_handoff_cycles once the next block is picked up,
+    // so the wait after a core's last block is not counted
+    reg [31:0] handoff_wait;
     
  always @(posedge clk) begin 
     if (reset) begin
         current_pc <= 0;
         core_state <= IDLE;
+        take <= 0;
         done <= 0;
+        active_mask <= {THREADS_PER_BLOCK{1'b1}};
+        retired <= 0;
+        handoff_wait <= 0;
+        perf_active_cycles <= 0;
+        perf_handoff_cycles <= 0;
+        perf_handoffs <= 0;
+        perf_blocks_retired <= 0;
+        perf_divergent_cycles <= 0;
+        perf_divergences <= 0;
 
     end else begin 
+        take <= 0;
+        done <= 0;
+
+        if (core_state != IDLE && core_state != DONE) begin
+            perf_active_cycles <= perf_active_cycles + 1;
+            if ((active_mask & thread_enable) != (thread_enable & ~retired)) begin
+                perf_divergent_cycles <= perf_divergent_cycles + 1;
+            end
+        end
+
         case (core_state)
 
             IDLE: begin
-                done <= 0;                 // always clear done in IDLE
                 if (start) begin
-                    current_pc <= 0;
+                    take <= 1;
+                    current_pc <= program_base;
+                    retired <= 0;
                     core_state <= FETCH;
                 end
             end
@@ -98,19 +146,59 @@ module scheduler #(
             end
 
             UPDATE: begin 
-                if (decoded_ret) begin 
+                reg [THREADS_PER_BLOCK-1:0] running;
+                reg [THREADS_PER_BLOCK-1:0] next_mask;
+                reg [7:0] min_pc;
+
+                // Threads that were active for a RET retire now
+                running = thread_enable & ~retired;
+                if (decoded_ret) begin
+                    running = running & ~active_mask;
+                    retired <= retired | active_mask;
+                end
+
+                // Issue the next instruction at the lowest PC any running thread is waiting at
+                min_pc = 8'hFF;
+                for (int i = 0; i < THREADS_PER_BLOCK; i++) begin
+                    if (running[i] && next_pc[i] < min_pc) begin
+                        min_pc = next_pc[i];
+                    end
+                end
+                next_mask = 0;
+                for (int i = 0; i < THREADS_PER_BLOCK; i++) begin
+                    if (running[i] && next_pc[i] == min_pc) begin
+                        next_mask[i] = 1'b1;
+                    end
+                end
+
+                if (running == 0) begin 
                     done <= 1;
+                    perf_blocks_retired <= perf_blocks_retired + 1;
+                    active_mask <= {THREADS_PER_BLOCK{1'b1}};
                     core_state <= DONE;
                 end else begin 
-                    current_pc <= next_pc[THREADS_PER_BLOCK-1];
+                    if (next_mask != running && (active_mask & thread_enable & ~retired) == (thread_enable & ~retired)) begin
+                        perf_divergences <= perf_divergences + 1;
+                    end
+                    current_pc <= min_pc;
+                    active_mask <= next_mask;
                     core_state <= FETCH;
                 end
             end
 
             DONE: begin
-                // wait for a new start pulse
-                if (!start) begin
-                    core_state <= IDLE;
+                // Move straight on to the staged block if the dispatcher has one ready
+                if (start) begin
+                    perf_handoff_cycles <= perf_handoff_cycles + handoff_wait;
+                    perf_handoffs <= perf_handoffs + 1;
+                    handoff_wait <= 0;
+                    take <= 1;
+                    current_pc <= program_base;
+                    retired <= 0;
+                    core_state <= FETCH;
+                end else begin
+                    // Dispatch hasn't staged a block for this core (the tail of a kernel, or no kernel queued)
+                    handoff_wait <= handoff_wait + 1;
                 end
             end
 
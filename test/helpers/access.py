@@ -0,0 +1,201 @@
+import json
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from .logger import logger
+
+# Memory access recording and analysis
+# > Memory.record() makes Memory.run() log every request the moment it reaches memory (cycle,
+#   channel, address, read/write) along with the controller consumer it came from and that core's
+#   PC, plus per cycle how many requests were queued at the controller and how many channels sat idle
+# > AccessAnalysis groups the requests into warp requests (one request per thread of a block for a
+#   single LDR/STR execution) and reports, per instruction: the stride between neighbouring
+#   threads, how many requests could have been merged into aligned segments, and bank conflicts
+#   under a banking function (interleaved by default)
+
+
+class Access:
+    def __init__(
+        self,
+        cycle: int,
+        channel: int,
+        address: int,
+        write: bool,
+        consumer: Optional[int] = None,
+        pc: Optional[int] = None,
+    ):
+        self.cycle = cycle
+        self.channel = channel
+        self.address = address
+        self.write = write
+        self.consumer = consumer  # LSU index (core * threads_per_block + thread) for data memory
+        self.pc = pc
+
+    def to_json(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Access":
+        return cls(**data)
+
+    def __repr__(self):
+        kind = "write" if self.write else "read"
+        return f"Access(cycle={self.cycle}, {kind} {self.address} on channel {self.channel}, consumer={self.consumer})"
+
+
+def save_accesses(path: str, accesses: Sequence[Access], occupancy: Sequence[Tuple[int, int]] = ()):
+    with open(path, "w") as f:
+        json.dump({"accesses": [access.to_json() for access in accesses], "occupancy": list(occupancy)}, f)
+
+
+def load_accesses(path: str) -> Tuple[List[Access], List[Tuple[int, int]]]:
+    with open(path) as f:
+        data = json.load(f)
+    return [Access.from_json(access) for access in data["accesses"]], [tuple(sample) for sample in data["occupancy"]]
+
+
+# Banking functions: address -> bank
+def interleaved(banks: int) -> Callable[[int], int]:
+    return lambda address: address % banks
+
+
+def blocked(banks: int, rows: int = 256) -> Callable[[int], int]:
+    return lambda address: address // max(1, rows // banks)
+
+
+BANKING = {"interleaved": interleaved, "blocked": blocked}
+
+
+class WarpRequest:
+    def __init__(self, core: int, pc: Optional[int], write: bool):
+        self.core = core
+        self.pc = pc
+        self.write = write
+        self.addresses: Dict[int, int] = {}  # thread -> address
+        self.first_cycle: Optional[int] = None
+        self.last_cycle: Optional[int] = None
+
+    def add(self, thread: int, access: Access):
+        self.addresses[thread] = access.address
+        self.first_cycle = access.cycle if self.first_cycle is None else self.first_cycle
+        self.last_cycle = access.cycle
+
+    def strides(self) -> List[int]:
+        ordered = [self.addresses[thread] for thread in sorted(self.addresses)]
+        return [b - a for a, b in zip(ordered, ordered[1:])]
+
+    def segments(self, segment: int) -> int:
+        return len({address // segment for address in self.addresses.values()})
+
+    def bank_rounds(self, bank_of: Callable[[int], int]) -> int:
+        # Requests to the same bank are served one after another; repeats of an address are broadcast
+        banks = Counter(bank_of(address) for address in set(self.addresses.values()))
+        return max(banks.values()) if banks else 0
+
+
+class InstructionAccesses:
+    def __init__(self, pc: Optional[int], write: bool):
+        self.pc = pc
+        self.write = write
+        self.executions = 0
+        self.requests = 0
+        self.transactions = 0  # Aligned segments touched, i.e. requests after ideal coalescing
+        self.conflicts = 0  # Extra bank rounds beyond one per warp request
+        self.strides: Counter = Counter()
+        self.latency = 0  # Cycles from a warp request's first to last access reaching memory
+
+    @property
+    def stride(self) -> str:
+        if not self.strides:
+            return "-"
+        if len(self.strides) == 1:
+            return f"{next(iter(self.strides)):+d}"
+        return "irregular"
+
+
+class AccessAnalysis:
+    def __init__(
+        self,
+        accesses: Sequence[Access],
+        occupancy: Sequence[Tuple[int, int]] = (),
+        threads_per_block: int = 4,
+        segment: int = 4,
+        banks: int = 4,
+        bank_of: Optional[Callable[[int], int]] = None,
+    ):
+        self.accesses = list(accesses)
+        self.occupancy = list(occupancy)
+        self.threads_per_block = threads_per_block
+        self.segment = segment
+        self.banks = banks
+        self.bank_of = bank_of or interleaved(banks)
+
+    def warp_requests(self) -> List[WarpRequest]:
+        # Each LSU issues exactly one request per LDR/STR, so a warp request ends as soon as one of
+        # its threads shows up again
+        open_requests: Dict[Tuple[int, Optional[int], bool], WarpRequest] = {}
+        requests = []
+        for access in sorted(self.accesses, key=lambda access: access.cycle):
+            consumer = access.consumer if access.consumer is not None else access.channel
+            core, thread = divmod(consumer, self.threads_per_block)
+            key = (core, access.pc, access.write)
+            request = open_requests.get(key)
+            if request is None or thread in request.addresses:
+                request = WarpRequest(core, access.pc, access.write)
+                open_requests[key] = request
+                requests.append(request)
+            request.add(thread, access)
+        return requests
+
+    def instructions(self) -> List[InstructionAccesses]:
+        instructions: Dict[Tuple[Optional[int], bool], InstructionAccesses] = {}
+        for request in self.warp_requests():
+            key = (request.pc, request.write)
+            instruction = instructions.setdefault(key, InstructionAccesses(request.pc, request.write))
+            instruction.executions += 1
+            instruction.requests += len(request.addresses)
+            instruction.transactions += request.segments(self.segment)
+            instruction.conflicts += request.bank_rounds(self.bank_of) - 1
+            instruction.strides.update(request.strides())
+            instruction.latency += request.last_cycle - request.first_cycle
+        return sorted(instructions.values(), key=lambda i: (i.pc is None, i.pc or 0, i.write))
+
+    def queueing(self) -> Tuple[int, int, int]:
+        # Cycles with requests queued at the controller: (with every channel busy, with at least one
+        # channel idle, idle channel-cycles that could have taken a queued request)
+        saturated = waiting = idle = 0
+        for pending, idle_channels in self.occupancy:
+            if not pending:
+                continue
+            if idle_channels:
+                waiting += 1
+                idle += min(pending, idle_channels)
+            else:
+                saturated += 1
+        return saturated, waiting, idle
+
+    def report(self) -> List[str]:
+        lines = [
+            f"{len(self.accesses)} requests, segment {self.segment} rows, {self.banks} banks",
+            f"{'pc':>4} {'op':<4} {'runs':>5} {'reqs':>5} {'stride':>9} {'coalesced':>9} {'conflicts':>9} {'spread':>6}",
+        ]
+        for instruction in self.instructions():
+            pc = "?" if instruction.pc is None else instruction.pc
+            op = "STR" if instruction.write else "LDR"
+            merged = instruction.requests - instruction.transactions
+            spread = instruction.latency / instruction.executions if instruction.executions else 0.0
+            lines.append(
+                f"{pc:>4} {op:<4} {instruction.executions:>5} {instruction.requests:>5} {instruction.stride:>9} "
+                f"{merged:>9} {instruction.conflicts:>9} {spread:>6.1f}"
+            )
+        if self.occupancy:
+            saturated, waiting, idle = self.queueing()
+            lines.append(
+                f"Requests queued on {saturated + waiting} of {len(self.occupancy)} cycles: all channels busy on "
+                f"{saturated}, channels idle on {waiting} ({idle} idle channel-cycles)"
+            )
+        return lines
+
+    def log(self):
+        logger.info("\nMEMORY ACCESSES")
+        for line in self.report():
+            logger.info(line)
@@ -0,0 +1,410 @@
+import functools
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Bump whenever an encoding below (or what a cached Program records) changes, so cached binaries from
+# older versions are ignored
+ISA_VERSION = 4
+
+# Opcodes, matching the localparams in src/decoder.sv
+OPCODES = {
+    "NOP": 0b0000,
+    "BRnzp": 0b0001,
+    "CMP": 0b0010,
+    "ADD": 0b0011,
+    "SUB": 0b0100,
+    "MUL": 0b0101,
+    "DIV": 0b0110,
+    "LDR": 0b0111,
+    "STR": 0b1000,
+    "CONST": 0b1001,
+    "S2R": 0b1010,
+    "SELn": 0b1011,
+    "SELz": 0b1100,
+    "SELp": 0b1101,
+    "RET": 0b1111,
+}
+
+# S2R sources (see src/registers.sv)
+SPECIAL_REGISTERS = {
+    "%blockIdx": 0,
+    "%blockIdy": 1,
+    "%blockDim": 2,
+    "%threadIdx": 3,
+    "%gridDimX": 4,
+    "%param0": 5,
+    "%param1": 6,
+    "%param2": 7,
+    "%param3": 8,
+}
+
+# R13-R15 hold %blockIdx, %blockDim and %threadIdx and can be read but not written
+NUM_REGISTERS = 16
+NUM_WRITABLE_REGISTERS = 13
+IMMEDIATE_BITS = 8
+
+# Condition bits of BRnzp, in instruction order ([11:9] = n, z, p)
+NZP_BITS = {"n": 0b100, "z": 0b010, "p": 0b001}
+
+# SEL variants by condition: Rd = (NZP matches the condition) ? Rs : Rt
+SELECT_OPCODES = {"n": OPCODES["SELn"], "z": OPCODES["SELz"], "p": OPCODES["SELp"]}
+
+# Operand kinds per mnemonic: "d" written register, "r" read register, "i" immediate,
+# "s" special register (branches are handled separately)
+OPERANDS = {
+    "NOP": "",
+    "CMP": "rr",
+    "ADD": "drr",
+    "SUB": "drr",
+    "MUL": "drr",
+    "DIV": "drr",
+    "LDR": "dr",
+    "STR": "rr",
+    "CONST": "di",
+    "S2R": "ds",
+    "RET": "",
+}
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "build", "asm_cache")
+
+
+class AssemblerError(ValueError):
+    def __init__(self, message: str, line_number: Optional[int] = None, line: str = ""):
+        self.line_number = line_number
+        self.line = line
+        location = f"line {line_number}: " if line_number is not None else ""
+        source = f"\n    {line.strip()}" if line else ""
+        super().__init__(f"{location}{message}{source}")
+
+
+# One line of source: a label definition (text is None) or an instruction, with its 1-based line
+# > rewritten is set by the optimizer when text is no longer the instruction written on that line
+class Statement:
+    def __init__(
+        self,
+        line_number: int,
+        raw: str,
+        text: Optional[str] = None,
+        label: Optional[str] = None,
+        rewritten: bool = False,
+    ):
+        self.line_number = line_number
+        self.raw = raw
+        self.text = text
+        self.label = label
+        self.rewritten = rewritten
+
+    def __repr__(self):
+        return f"Statement({self.line_number}, {self.label + ':' if self.label else self.text!r})"
+
+
+# Assembled kernel
+# > code holds the 16-bit instruction words, labels maps each label to its address (relative to
+#   the program base), and lines maps each address back to its 1-based source line
+# > texts holds the instruction each address was assembled from. After optimization that can differ
+#   from its source line (a folded constant, a strength-reduced multiply, renamed registers); the
+#   addresses where it does are in rewritten. Instructions the optimizer removed have no address
+# > unoptimized_length is the instruction count before optimization, if the optimizer ran
+class Program:
+    def __init__(
+        self,
+        code: List[int],
+        labels: Dict[str, int],
+        lines: List[int],
+        source: str = "",
+        unoptimized_length: Optional[int] = None,
+        texts: Optional[List[str]] = None,
+        rewritten: Optional[List[int]] = None,
+    ):
+        self.code = code
+        self.labels = labels
+        self.lines = lines
+        self.source = source
+        self.unoptimized_length = unoptimized_length
+        self.texts = texts
+        self.rewritten = set(rewritten or ())
+
+    def __len__(self):
+        return len(self.code)
+
+    def __iter__(self):
+        return iter(self.code)
+
+    def source_line(self, pc: int) -> str:
+        return self.source.splitlines()[self.lines[pc] - 1].strip()
+
+    def instruction_text(self, pc: int) -> str:
+        # The instruction actually assembled at pc (without comments), even if the optimizer rewrote it
+        if self.texts is not None:
+            return self.texts[pc]
+        return _split_label(_strip(self.source_line(pc)))[1]
+
+    def to_json(self) -> dict:
+        return {
+            "code": self.code,
+            "labels": self.labels,
+            "lines": self.lines,
+            "unoptimized_length": self.unoptimized_length,
+            "texts": self.texts,
+            "rewritten": sorted(self.rewritten),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict, source: str = "") -> "Program":
+        return cls(
+            list(data["code"]),
+            dict(data["labels"]),
+            list(data["lines"]),
+            source,
+            data.get("unoptimized_length"),
+            data.get("texts"),
+            data.get("rewritten"),
+        )
+
+
+def branch_condition(mnemonic: str) -> Optional[int]:
+    # BRn, BRzp, BRnzp, ... -> nzp bits; plain BR is BRnzp (nzp = 111), which branches whenever any flag
+    # is set, i.e. after any CMP, but falls through before the block's first CMP (the flags reset to 000)
+    match = re.fullmatch(r"BR([nzp]*)", mnemonic)
+    if match is None:
+        return None
+    flags = match.group(1) or "nzp"
+    if len(set(flags)) != len(flags) or "".join(sorted(flags, key="nzp".index)) != flags:
+        return None
+    nzp = 0
+    for flag in flags:
+        nzp |= NZP_BITS[flag]
+    return nzp
+
+
+def select_opcode(mnemonic: str) -> Optional[int]:
+    # SELn, SELz, SELp -> opcode; the condition is a single flag since it's part of the opcode
+    match = re.fullmatch(r"SEL([nzp])", mnemonic)
+    return SELECT_OPCODES[match.group(1)] if match else None
+
+
+def _strip(line: str) -> str:
+    return line.split(";")[0].strip()
+
+
+def _split_label(line: str) -> Tuple[Optional[str], str]:
+    match = re.match(r"^([A-Za-z_.][\w.]*)\s*:(.*)$", line)
+    if match is None:
+        return None, line
+    return match.group(1), match.group(2).strip()
+
+
+def _parse_int(text: str) -> int:
+    text = text[1:] if text.startswith("#") else text
+    # Plain decimal (leading zeros allowed), or 0x/0b/0o prefixed
+    return int(text, 10) if re.fullmatch(r"-?\d+", text) else int(text, 0)
+
+
+def _register(text: str, writable: bool) -> int:
+    match = re.fullmatch(r"[Rr](\d+)", text)
+    if match is None:
+        raise ValueError(f"expected a register, got '{text}'")
+    index = int(match.group(1))
+    if index >= NUM_REGISTERS:
+        raise ValueError(f"register {text} doesn't exist (R0-R{NUM_REGISTERS - 1})")
+    if writable and index >= NUM_WRITABLE_REGISTERS:
+        raise ValueError(f"register {text} is read-only (only R0-R{NUM_WRITABLE_REGISTERS - 1} can be written)")
+    return index
+
+
+def _immediate(text: str) -> int:
+    try:
+        value = _parse_int(text)
+    except ValueError:
+        raise ValueError(f"expected an immediate, got '{text}'")
+    # Negative values are accepted and stored as two's complement
+    if not -(1 << (IMMEDIATE_BITS - 1)) <= value < (1 << IMMEDIATE_BITS):
+        raise ValueError(f"immediate {value} doesn't fit in {IMMEDIATE_BITS} bits")
+    return value & ((1 << IMMEDIATE_BITS) - 1)
+
+
+def _special(text: str) -> int:
+    if text in SPECIAL_REGISTERS:
+        return SPECIAL_REGISTERS[text]
+    raise ValueError(f"unknown special register '{text}' (expected one of {', '.join(SPECIAL_REGISTERS)})")
+
+
+def _target(text: str, labels: Dict[str, int]) -> int:
+    if text in labels:
+        return labels[text]
+    try:
+        target = _parse_int(text)
+    except ValueError:
+        raise ValueError(f"undefined label '{text}'")
+    if not 0 <= target < (1 << IMMEDIATE_BITS):
+        raise ValueError(f"branch target {target} doesn't fit in {IMMEDIATE_BITS} bits")
+    return target
+
+
+def encode(mnemonic: str, operands: List[str], labels: Dict[str, int]) -> int:
+    nzp = branch_condition(mnemonic)
+    if nzp is not None:
+        if len(operands) != 1:
+            raise ValueError(f"{mnemonic} takes 1 operand, got {len(operands)}")
+        return (OPCODES["BRnzp"] << 12) | (nzp << 9) | _target(operands[0], labels)
+
+    opcode = select_opcode(mnemonic)
+    if opcode is not None:
+        if len(operands) != 3:
+            raise ValueError(f"{mnemonic} takes 3 operands, got {len(operands)}")
+        rd = _register(operands[0], writable=True)
+        rs, rt = (_register(operand, writable=False) for operand in operands[1:])
+        return (opcode << 12) | (rd << 8) | (rs << 4) | rt
+
+    if mnemonic.upper() not in OPERANDS:
+        raise ValueError(f"unknown instruction '{mnemonic}'")
+    mnemonic = mnemonic.upper()
+    kinds = OPERANDS[mnemonic]
+    if len(operands) != len(kinds):
+        raise ValueError(f"{mnemonic} takes {len(kinds)} operands, got {len(operands)}")
+
+    fields = []
+    for kind, operand in zip(kinds, operands):
+        if kind in "dr":
+            fields.append(_register(operand, writable=kind == "d"))
+        elif kind == "i":
+            fields.append(_immediate(operand))
+        elif kind == "s":
+            fields.append(_special(operand))
+
+    word = OPCODES[mnemonic] << 12
+    if kinds == "drr":
+        word |= (fields[0] << 8) | (fields[1] << 4) | fields[2]
+    elif kinds == "rr":
+        word |= (fields[0] << 4) | fields[1]
+    elif kinds == "dr":
+        word |= (fields[0] << 8) | (fields[1] << 4)
+    elif kinds in ("di", "ds"):
+        word |= (fields[0] << 8) | fields[1]
+    return word
+
+
+def split_operands(text: str) -> List[str]:
+    return [part for part in re.split(r"[,\s]+", text) if part]
+
+
+def parse(source: str) -> List[Statement]:
+    statements = []
+    for line_number, raw in enumerate(source.splitlines(), start=1):
+        label, rest = _split_label(_strip(raw))
+        if label is not None:
+            statements.append(Statement(line_number, raw, label=label))
+        if rest:
+            statements.append(Statement(line_number, raw, text=rest))
+    return statements
+
+
+def _assemble(statements: List[Statement], source: str) -> Program:
+    labels: Dict[str, int] = {}
+    count = 0
+
+    # First pass: collect labels and instruction addresses
+    for statement in statements:
+        if statement.label is None:
+            count += 1
+        elif statement.label in labels:
+            raise AssemblerError(f"duplicate label '{statement.label}'", statement.line_number, statement.raw)
+        else:
+            labels[statement.label] = count
+
+    if count > (1 << IMMEDIATE_BITS):
+        raise AssemblerError(f"program has {count} instructions, more than program memory can address")
+
+    # Second pass: encode
+    code = []
+    lines = []
+    texts = []
+    rewritten = []
+    for statement in statements:
+        if statement.label is not None:
+            continue
+        parts = split_operands(statement.text)
+        try:
+            code.append(encode(parts[0], parts[1:], labels))
+        except ValueError as error:
+            raise AssemblerError(str(error), statement.line_number, statement.raw) from None
+        if statement.rewritten:
+            rewritten.append(len(lines))
+        lines.append(statement.line_number)
+        texts.append(statement.text.strip())
+
+    return Program(code, labels, lines, source, texts=texts, rewritten=rewritten)
+
+
+def _build(source: str, optimize: bool) -> Program:
+    statements = parse(source)
+    if not optimize:
+        return _assemble(statements, source)
+
+    from .optimizer import optimize_statements
+
+    # Assemble the original first so errors point at the source as written
+    unoptimized = _assemble(statements, source)
+    program = _assemble(optimize_statements(statements), source)
+    program.unoptimized_length = len(unoptimized)
+    return program
+
+
+@functools.lru_cache(maxsize=None)
+def optimizer_hash() -> str:
+    # Hash of the optimizer passes' source, so optimized binaries cached before any change to them are ignored
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "optimizer.py"), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_key(source: str, optimize: bool = False) -> str:
+    options = f"optimize {optimizer_hash()}" if optimize else ""
+    return hashlib.sha256(f"isa-v{ISA_VERSION}\n{options}\n{source}".encode()).hexdigest()
+
+
+def assemble_program(
+    source: str,
+    cache: bool = True,
+    cache_dir: Optional[str] = None,
+    optimize: bool = False,
+    name: str = "kernel",
+) -> Program:
+    # Assemble source into a Program, reusing a cached binary keyed by source hash, ISA version and
+    # options (including the optimizer's source hash when optimizing). The cache lives in build/asm_cache
+    # unless TINY_GPU_ASM_CACHE points somewhere else.
+    # With optimize=True the optimizer passes run first and the instruction counts are printed
+    program = _cached_build(source, cache, cache_dir, optimize)
+    if optimize:
+        print(f"{name}: {program.unoptimized_length} -> {len(program)} instructions after optimization")
+    return program
+
+
+def _cached_build(source: str, cache: bool, cache_dir: Optional[str], optimize: bool) -> Program:
+    if not cache:
+        return _build(source, optimize)
+
+    cache_dir = cache_dir or os.environ.get("TINY_GPU_ASM_CACHE", DEFAULT_CACHE_DIR)
+    path = os.path.join(cache_dir, cache_key(source, optimize) + ".json")
+    try:
+        with open(path) as f:
+            return Program.from_json(json.load(f), source)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    program = _build(source, optimize)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            json.dump(program.to_json(), f)
+        os.replace(temp, path)
+    except OSError:
+        pass
+    return program
+
+
+def assemble(source: str, cache: bool = True, optimize: bool = False, name: str = "kernel") -> List[int]:
+    return list(assemble_program(source, cache, optimize=optimize, name=name).code)
@@ -0,0 +1,54 @@
+import argparse
+import sys
+from typing import Dict, List, Mapping, Optional
+
+# Per-test builds
+# > Most tests run against gpu.sv with its default parameters; the ones below need another top level
+#   or parameter overrides. This table is the one place that says so: `make test_<name>` reads it
+#   through the command line below, and test/helpers/runner.py (`make sim_<name>`) imports it
+# > Overrides given on top (PARAMS="NAME=VALUE ..." or runner -P) win over the table's
+
+DEFAULT_TOPLEVEL = "gpu"
+
+TESTS: Dict[str, Dict] = {
+    "multi_gpu": {"toplevel": "multi_gpu"},
+    "banked": {"parameters": {"DATA_MEM_BANKED": 1}},
+    "pipelined_memory": {"parameters": {"DATA_MEM_MAX_OUTSTANDING": 4, "DATA_MEM_NUM_CHANNELS": 1}},
+    "prefetch": {"parameters": {"PREFETCH_DEPTH": 2}},
+}
+
+
+def toplevel(test: str) -> str:
+    return TESTS.get(test, {}).get("toplevel", DEFAULT_TOPLEVEL)
+
+
+def parameters(test: str, overrides: Optional[Mapping[str, int]] = None) -> Dict[str, int]:
+    # The test's parameter overrides, with the given ones applied on top
+    merged = dict(TESTS.get(test, {}).get("parameters", {}))
+    merged.update(overrides or {})
+    return merged
+
+
+def parse_parameter(text: str):
+    # NAME=VALUE (VALUE in any base int() takes with base 0) -> (NAME, VALUE); an argparse type
+    name, _, value = text.partition("=")
+    if not value:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE, got {text!r}")
+    return name.upper(), int(value, 0)
+
+
+def main(argv: Optional[List[str]] = None):
+    # `python -m test.helpers.builds toplevel <test>` prints the test's top level, and
+    # `python -m test.helpers.builds params <test> [NAME=VALUE ...]` its parameters as NAME=VALUE words
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2 or argv[0] not in ("toplevel", "params"):
+        sys.exit("usage: python -m test.helpers.builds {toplevel,params} <test> [NAME=VALUE ...]")
+    command, test, overrides = argv[0], argv[1], argv[2:]
+    if command == "toplevel":
+        print(toplevel(test))
+    else:
+        print(" ".join(f"{name}={value}" for name, value in parameters(test, dict(map(parse_parameter, overrides))).items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from typing import List, Optional, Sequence, Tuple, Union
+from .assembler import Program
+from .logger import logger
+from .model import GpuModel
+
+# Differential checking against the functional model
+# > The kernel is run on test/helpers/model.py up front, which records the final value every block
+#   stores to each address and the PC of the store that wrote it
+# > Call sample(dut, data_memory) once per cycle from the test loop. It only reads the dispatcher's
+#   core_done vector, and whenever a core retires a block it compares just the addresses that block
+#   wrote in the model against the Memory helper, so checking adds almost nothing per cycle and can
+#   stay on for long runs
+# > The first mismatch raises an AssertionError naming the block, address, expected and actual
+#   values and the store instruction responsible; finish() also checks that every block retired
+# > Blocks are checked when they retire, so kernels whose blocks overwrite each other's output
+#   while both are running can report false mismatches
+# > For a kernel resumed from a checkpoint, pass the checkpoint's memory as data and its first_block:
+#   only the blocks from first_block on are modelled and expected to retire
+
+
+class Mismatch:
+    def __init__(self, block: Tuple[int, int], address: int, expected: int, actual: int, pc: int, source: str):
+        self.block = block
+        self.address = address
+        self.expected = expected
+        self.actual = actual
+        self.pc = pc
+        self.source = source
+
+    def __str__(self):
+        location = f"pc {self.pc}" + (f" ({self.source})" if self.source else "")
+        return (
+            f"Block {self.block} wrote {self.actual} to address {self.address}, "
+            f"the model expected {self.expected} from the store at {location}"
+        )
+
+
+class DifferentialChecker:
+    def __init__(
+        self,
+        program: Union[Program, Sequence[int]],
+        data: Sequence[int],
+        threads: int,
+        threads_per_block: int = 4,
+        grid_dim_x: int = 0,
+        program_base: int = 0,
+        params: Sequence[int] = (),
+        fail_fast: bool = True,
+        first_block: int = 0,
+    ):
+        self.program = program if isinstance(program, Program) else None
+        code = program.code if isinstance(program, Program) else program
+        model = GpuModel(code, data, threads_per_block, program_base, grid_dim_x, params)
+        self.traces = {(trace.block_x, trace.block_y): trace for trace in model.run(threads, first_block)}
+        self.program_base = program_base
+        self.fail_fast = fail_fast
+        self.retired: List[Tuple[int, int]] = []
+        self.mismatches: List[Mismatch] = []
+        self.cycle = 0
+
+    def sample(self, dut, memory):
+        self.cycle += 1
+        core_done = dut.dispatch_instance.core_done.value
+        if not core_done.is_resolvable or not int(core_done):
+            return
+        retiring = int(core_done)
+        for core in dut.cores:
+            if retiring >> int(core.i.value) & 1:
+                instance = core.core_instance
+                self.check_block((int(instance.block_id.value), int(instance.block_id_y.value)), memory)
+
+    def check_block(self, block: Tuple[int, int], memory) -> Optional[Mismatch]:
+        self.retired.append(block)
+        trace = self.traces.get(block)
+        if trace is None:
+            return self._fail(Mismatch(block, -1, -1, -1, -1, "block isn't part of the kernel"))
+
+        for address, expected in sorted(trace.writes.items()):
+            actual = int(memory.memory[address])
+            if actual != expected:
+                pc = trace.writers[address]
+                source = self.program.instruction_text(pc) if self.program else ""
+                return self._fail(Mismatch(block, address, expected, actual, pc + self.program_base, source))
+        return None
+
+    def _fail(self, mismatch: Mismatch) -> Mismatch:
+        self.mismatches.append(mismatch)
+        logger.info(f"MISMATCH at cycle {self.cycle}: {mismatch}")
+        if self.fail_fast:
+            raise AssertionError(str(mismatch))
+        return mismatch
+
+    def finish(self):
+        # Call after done: every block must have retired, and none may have mismatched
+        missing = sorted(set(self.traces) - set(self.retired))
+        logger.info(
+            f"Differential check: {len(self.retired)} of {len(self.traces)} blocks retired, "
+            f"{len(self.mismatches)} mismatches"
+        )
+        if self.mismatches:
+            raise AssertionError(f"{len(self.mismatches)} blocks mismatched, first: {self.mismatches[0]}")
+        if missing:
+            raise AssertionError(f"Blocks {missing} never retired")
@@ -0,0 +1,201 @@
+import json
+import os
+from typing import List, Optional, Sequence, Set, Union
+import numpy as np
+from .assembler import Program
+from .logger import logger
+from .memory import Memory
+from .setup import setup
+
+# Block-boundary checkpoints for long kernels
+# > Call sample(dut, data_memory) once per cycle from the test loop. Like the differential checker it
+#   only reads the dispatcher's core_done vector, and tracks how many blocks from the start of the
+#   grid have all retired. Every time that count passes a multiple of `every`, the data memory is
+#   snapshotted next to a JSON manifest holding the launch parameters and the block to resume from
+# > resume() loads a checkpoint into fresh memories and launches the same kernel with its first_block
+#   set, so the dispatcher skips every block before it (see src/dispatch.sv)
+# > Blocks that were still running, or had retired out of order, when the snapshot was taken are run
+#   again on resume. That's only safe for kernels whose blocks don't read what they write (matadd,
+#   grayscale, matmul), which is what block-boundary checkpoints assume
+# > Program memory isn't snapshotted: kernels don't write it, so the manifest just keeps the kernel's
+#   code, and resume() loads it back at program_base
+
+MANIFEST_VERSION = 1
+
+
+class Checkpoint:
+    def __init__(
+        self,
+        path: str,
+        block: int,
+        cycle: int,
+        threads: int,
+        grid_dim_x: int,
+        program_base: int,
+        params: Sequence[int],
+        program: Sequence[int],
+        memory: str,
+    ):
+        self.path = path
+        self.block = block  # first block that hadn't retired, i.e. where to resume
+        self.cycle = cycle
+        self.threads = threads
+        self.grid_dim_x = grid_dim_x
+        self.program_base = program_base
+        self.params = list(params)
+        self.program = list(program)
+        self.memory = memory  # path of the data memory snapshot
+
+    def __repr__(self):
+        return f"Checkpoint(block={self.block}, cycle={self.cycle}, path={self.path!r})"
+
+    def to_json(self) -> dict:
+        return {
+            "version": MANIFEST_VERSION,
+            "block": self.block,
+            "cycle": self.cycle,
+            "threads": self.threads,
+            "grid_dim_x": self.grid_dim_x,
+            "program_base": self.program_base,
+            "params": self.params,
+            "program": self.program,
+            "memory": os.path.basename(self.memory),
+        }
+
+    def restore(self, memory: Memory):
+        # Loads the snapshot into memory; paged memories get their dumped pages back
+        if memory.paged:
+            memory.memory.restore(self.memory)
+        else:
+            memory.load(np.load(self.memory))
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {manifest.get('version')}")
+    return Checkpoint(
+        path,
+        manifest["block"],
+        manifest["cycle"],
+        manifest["threads"],
+        manifest["grid_dim_x"],
+        manifest["program_base"],
+        manifest["params"],
+        manifest["program"],
+        os.path.join(os.path.dirname(path), manifest["memory"]),
+    )
+
+
+def list_checkpoints(directory: str) -> List[Checkpoint]:
+    # Checkpoints in a directory, in block order
+    if not os.path.isdir(directory):
+        return []
+    checkpoints = [
+        load_checkpoint(os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.startswith("block_") and name.endswith(".json")
+    ]
+    return sorted(checkpoints, key=lambda checkpoint: checkpoint.block)
+
+
+def latest_checkpoint(directory: str) -> Optional[Checkpoint]:
+    checkpoints = list_checkpoints(directory)
+    return checkpoints[-1] if checkpoints else None
+
+
+class Checkpointer:
+    def __init__(
+        self,
+        directory: str,
+        every: int,
+        program: Union[Program, Sequence[int]],
+        threads: int,
+        threads_per_block: int = 4,
+        grid_dim_x: int = 0,
+        program_base: int = 0,
+        params: Sequence[int] = (),
+        first_block: int = 0,
+    ):
+        if every < 1:
+            raise ValueError(f"Checkpoint interval must be at least 1 block, got {every}")
+        self.directory = directory
+        self.every = every
+        self.program = list(program.code if isinstance(program, Program) else program)
+        self.threads = threads
+        self.grid_dim_x = grid_dim_x
+        self.program_base = program_base
+        self.params = list(params)
+        self.blocks = (threads + threads_per_block - 1) // threads_per_block
+        self.completed = first_block  # every block before this one has retired
+        self.retired: Set[int] = set()
+        self.next_checkpoint = (first_block // every + 1) * every
+        self.checkpoints: List[Checkpoint] = []
+        self.cycle = 0
+
+    def sample(self, dut, memory: Memory):
+        self.cycle += 1
+        core_done = dut.dispatch_instance.core_done.value
+        if not core_done.is_resolvable or not int(core_done):
+            return
+        retiring = int(core_done)
+        width = self.grid_dim_x or 256
+        for core in dut.cores:
+            if retiring >> int(core.i.value) & 1:
+                instance = core.core_instance
+                self.retired.add(int(instance.block_id_y.value) * width + int(instance.block_id.value))
+
+        while self.completed in self.retired:
+            self.retired.remove(self.completed)
+            self.completed += 1
+        # No checkpoint once the whole grid has retired: there'd be nothing left to resume
+        if self.completed >= self.next_checkpoint and self.completed < self.blocks:
+            self.save(memory)
+            self.next_checkpoint = (self.completed // self.every + 1) * self.every
+
+    def save(self, memory: Memory) -> Checkpoint:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"block_{self.completed:05d}"
+        snapshot = os.path.join(self.directory, name + (".npz" if memory.paged else ".npy"))
+        memory.snapshot(snapshot)
+        checkpoint = Checkpoint(
+            os.path.join(self.directory, name + ".json"),
+            self.completed,
+            self.cycle,
+            self.threads,
+            self.grid_dim_x,
+            self.program_base,
+            self.params,
+            self.program,
+            snapshot,
+        )
+        with open(checkpoint.path, "w") as f:
+            json.dump(checkpoint.to_json(), f)
+        self.checkpoints.append(checkpoint)
+        logger.info(f"Checkpoint at cycle {self.cycle}: blocks 0-{self.completed - 1} retired, saved {checkpoint.path}")
+        return checkpoint
+
+
+async def resume(dut, program_memory: Memory, data_memory: Memory, checkpoint: Union[Checkpoint, str]) -> Checkpoint:
+    # Resets the GPU, loads the checkpoint and launches the rest of its kernel; the caller then runs
+    # its usual loop until done
+    if isinstance(checkpoint, str):
+        checkpoint = load_checkpoint(checkpoint)
+    checkpoint.restore(data_memory)
+    # setup() loads its program at row 0, so the kernel goes in at its own base first
+    program_memory.load(checkpoint.program, offset=checkpoint.program_base)
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=[],
+        data_memory=data_memory,
+        data=[],
+        threads=checkpoint.threads,
+        grid_dim_x=checkpoint.grid_dim_x,
+        program_base=checkpoint.program_base,
+        params=checkpoint.params,
+        first_block=checkpoint.block,
+    )
+    logger.info(f"Resumed from {checkpoint.path} at block {checkpoint.block}")
+    return checkpoint
@@ -0,0 +1,81 @@
+from typing import List, Optional, Sequence
+from cocotb.triggers import RisingEdge
+from .memory import Memory
+from .setup import descriptor_writes
+from .logger import logger
+
+class KernelRecord:
+    def __init__(self, index: int, threads: int, program_base: int, params: Sequence[int], enqueued_at: int):
+        self.index = index
+        self.threads = threads
+        self.program_base = program_base
+        self.params = list(params)
+        self.enqueued_at = enqueued_at
+        self.done_at: Optional[int] = None
+
+    def __repr__(self):
+        return f"KernelRecord(index={self.index}, threads={self.threads}, enqueued_at={self.enqueued_at}, done_at={self.done_at})"
+
+# Host side of the DCR command queue
+# > Enqueues kernel descriptors while keeping the memories serviced every cycle, so kernels can be
+#   pushed while earlier ones are still running
+# > Counts rising edges of done to attribute a completion cycle to each kernel, in enqueue order
+class CommandQueue:
+    def __init__(self, dut, program_memory: Memory, data_memory: Memory):
+        self.dut = dut
+        self.program_memory = program_memory
+        self.data_memory = data_memory
+        self.cycles = 0
+        self.kernels: List[KernelRecord] = []
+        self.completed = 0
+        self._last_done = int(dut.done.value)
+
+    async def tick(self):
+        self.data_memory.run()
+        self.program_memory.run()
+        await RisingEdge(self.dut.clk)
+        self.cycles += 1
+
+        done = int(self.dut.done.value)
+        if done and not self._last_done and self.completed < len(self.kernels):
+            kernel = self.kernels[self.completed]
+            kernel.done_at = self.cycles
+            self.completed += 1
+            logger.info(f"Kernel {kernel.index} done at cycle {self.cycles}")
+        self._last_done = done
+
+    async def enqueue(
+        self,
+        threads: int,
+        program_base: int = 0,
+        grid_dim_x: int = 0,
+        params: Sequence[int] = (),
+        first_block: int = 0,
+    ):
+        while int(self.dut.queue_full.value):
+            await self.tick()
+
+        for address, value in descriptor_writes(threads, grid_dim_x, program_base, params, first_block):
+            self.dut.device_control_write_enable.value = 1
+            self.dut.device_control_address.value = address
+            self.dut.device_control_data.value = value
+            await self.tick()
+        self.dut.device_control_write_enable.value = 0
+
+        # Pulse start to push the descriptor
+        self.dut.start.value = 1
+        await self.tick()
+        self.dut.start.value = 0
+
+        kernel = KernelRecord(len(self.kernels), threads, program_base, params, self.cycles)
+        self.kernels.append(kernel)
+        return kernel
+
+    async def wait(self, kernel: Optional[KernelRecord] = None, timeout: int = 100000):
+        # Wait for the given kernel (or every enqueued kernel) to finish
+        target = len(self.kernels) if kernel is None else kernel.index + 1
+        start = self.cycles
+        while self.completed < target:
+            await self.tick()
+            if self.cycles - start > timeout:
+                raise RuntimeError(f"Timeout waiting for kernel {target - 1}")
@@ -0,0 +1,636 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from .assembler import OPCODES, Program
+from .logger import logger
+from .model import OP_LDR, OP_STR, BlockTrace, GpuModel
+
+# Cycle-cost estimator
+# > Runs the kernel on the functional model (test/helpers/model.py) to get each block's instruction
+#   stream, then replays those streams cycle by cycle through a model of the control path: the
+#   dispatcher handing out staged blocks, each core's scheduler/fetcher/LSU state machines, the
+#   register stage between the LSUs and the data memory controller in gpu.sv, and both memory
+#   controllers arbitrating their channels
+# > Data values don't affect timing (the controllers and LSUs only look at valid/ready), so only
+#   the instruction stream and which threads execute each instruction matter
+# > The memory is modelled as the cocotb Memory helper behaves: ready rises `memory_latency` cycles
+#   after valid is first seen and stays up while valid is held. With data_mem_max_outstanding above 1
+#   the data channels are pipelined (see src/controller.sv): every valid pulse is a request, answered
+#   with a one-cycle ready pulse carrying its tag `memory_latency` cycles later
+# > With prefetch_depth above 0 the fetchers keep the prefetch window of src/fetcher.sv, so fetches
+#   that hit it skip the program memory round trip
+# > Predicted cycles count edges the same way the test loops do, from the launch until done is seen
+
+# Scheduler states (src/scheduler.sv)
+IDLE, FETCH, DECODE, REQUEST, WAIT, EXECUTE, UPDATE, DONE = range(8)
+
+# Fetcher states (src/fetcher.sv)
+FETCHER_IDLE, FETCHING, FETCHED = range(3)
+
+# LSU states (src/lsu.sv)
+LSU_IDLE, LSU_REQUESTING, LSU_WAITING, LSU_DONE = range(4)
+
+# Controller channel states (src/controller.sv)
+CHANNEL_IDLE, READ_WAITING, WRITE_WAITING, READ_RELAYING, WRITE_RELAYING = 0, 2, 3, 4, 5
+
+# Edges outside the blocks themselves, counted the way the test loops count them (from the first
+# edge after start is raised to the edge after which done reads 1)
+# > Launch: the DCR pushes the descriptor onto the command queue; the dispatcher stages the first
+#   blocks on the next edge, which is simulated
+# > Completion: after the edge that counts the last done pulse, the dispatcher raises done, and
+#   the test sees it one edge later
+# > Calibrated against the cycle counts of the original matadd and grayscale tests
+LAUNCH_EDGES = 1
+COMPLETION_EDGES = 2
+
+# Largest relative error |predicted - measured| / measured the calibrated tests accept. The model
+# replays the RTL's state machines, so on the default build it should land within a few cycles; the
+# slack covers edge cases it doesn't track (e.g. the exact cycle a staged block is picked up)
+ESTIMATE_TOLERANCE = 0.10
+
+MNEMONICS = {opcode: mnemonic for mnemonic, opcode in OPCODES.items()}
+
+
+class HardwareConfig:
+    def __init__(
+        self,
+        num_cores: int = 2,
+        threads_per_block: int = 4,
+        data_mem_num_channels: int = 4,
+        program_mem_num_channels: int = 1,
+        memory_latency: int = 1,
+        data_mem_banked: bool = False,
+        data_mem_max_outstanding: int = 1,
+        prefetch_depth: int = 0,
+    ):
+        if memory_latency < 1:
+            raise ValueError(f"Memory latency must be at least 1 cycle, got {memory_latency}")
+        if data_mem_max_outstanding < 1:
+            raise ValueError(f"Channels need room for at least 1 request in flight, got {data_mem_max_outstanding}")
+        self.num_cores = num_cores
+        self.threads_per_block = threads_per_block
+        self.data_mem_num_channels = data_mem_num_channels
+        self.program_mem_num_channels = program_mem_num_channels
+        self.memory_latency = memory_latency
+        self.data_mem_banked = data_mem_banked  # each data channel is one address-interleaved bank
+        self.data_mem_max_outstanding = data_mem_max_outstanding  # requests in flight per data channel
+        self.prefetch_depth = prefetch_depth  # instructions each fetcher prefetches ahead
+
+    def __repr__(self):
+        return (
+            f"HardwareConfig(num_cores={self.num_cores}, threads_per_block={self.threads_per_block}, "
+            f"data_mem_num_channels={self.data_mem_num_channels}, "
+            f"program_mem_num_channels={self.program_mem_num_channels}, memory_latency={self.memory_latency}, "
+            f"data_mem_banked={self.data_mem_banked}, data_mem_max_outstanding={self.data_mem_max_outstanding}, "
+            f"prefetch_depth={self.prefetch_depth})"
+        )
+
+
+def config_from_dut(dut, memory_latency: int = 1) -> HardwareConfig:
+    # The config of the gpu the simulator elaborated, read from its parameters (the memory latency is
+    # up to the test's Memory models, so it's passed in)
+    return HardwareConfig(
+        num_cores=int(dut.NUM_CORES.value),
+        threads_per_block=int(dut.THREADS_PER_BLOCK.value),
+        data_mem_num_channels=int(dut.DATA_MEM_NUM_CHANNELS.value),
+        program_mem_num_channels=int(dut.PROGRAM_MEM_NUM_CHANNELS.value),
+        memory_latency=memory_latency,
+        data_mem_banked=bool(int(dut.DATA_MEM_BANKED.value)),
+        data_mem_max_outstanding=int(dut.DATA_MEM_MAX_OUTSTANDING.value),
+        prefetch_depth=int(dut.PREFETCH_DEPTH.value),
+    )
+
+
+# Cycles spent on one instruction (by PC), summed over every core and block that executed it
+# > fetch: FETCH cycles, including waiting for the program memory channel
+# > wait: WAIT cycles, i.e. LSU requests queueing for and crossing the data memory controller
+# > issue: the fixed DECODE, REQUEST, EXECUTE and UPDATE cycles
+class InstructionCost:
+    def __init__(self, pc: int, opcode: int):
+        self.pc = pc
+        self.opcode = opcode
+        self.executions = 0
+        self.fetch = 0
+        self.wait = 0
+        self.issue = 0
+
+    @property
+    def total(self) -> int:
+        return self.fetch + self.wait + self.issue
+
+    @property
+    def per_execution(self) -> float:
+        return self.total / self.executions if self.executions else 0.0
+
+
+class CostReport:
+    def __init__(
+        self,
+        cycles: int,
+        config: HardwareConfig,
+        instructions: Dict[int, InstructionCost],
+        blocks: int,
+        bank_conflicts: int = 0,
+        prefetch_hits: int = 0,
+        prefetch_flushes: int = 0,
+    ):
+        self.cycles = cycles
+        self.config = config
+        self.instructions = instructions
+        self.blocks = blocks
+        self.bank_conflicts = bank_conflicts  # what the banked controller's perf_bank_conflicts adds up to
+        self.prefetch_hits = prefetch_hits  # what the fetchers' perf_prefetch_hits add up to
+        self.prefetch_flushes = prefetch_flushes
+
+    @property
+    def core_cycles(self) -> int:
+        # Cycles the cores spent executing blocks (what perf_active_cycles adds up to)
+        return sum(cost.total for cost in self.instructions.values())
+
+    def breakdown(self, program: Optional[Program] = None) -> List[str]:
+        lines = [f"{'pc':>4}  {'instruction':<28} {'runs':>5} {'fetch':>6} {'wait':>6} {'issue':>6} {'avg':>6}"]
+        for pc in sorted(self.instructions):
+            cost = self.instructions[pc]
+            if program is not None:
+                text = program.instruction_text(pc)
+            else:
+                text = MNEMONICS.get(cost.opcode, f"{cost.opcode:04b}")
+            lines.append(
+                f"{pc:>4}  {text[:28]:<28} {cost.executions:>5} {cost.fetch:>6} {cost.wait:>6} "
+                f"{cost.issue:>6} {cost.per_execution:>6.1f}"
+            )
+        lines.append(f"Predicted {self.cycles} cycles ({self.core_cycles} core cycles over {self.blocks} blocks)")
+        if self.config.data_mem_banked:
+            lines.append(f"Predicted {self.bank_conflicts} bank conflicts")
+        if self.config.prefetch_depth:
+            lines.append(f"Predicted {self.prefetch_hits} prefetch hits, {self.prefetch_flushes} flushes")
+        return lines
+
+
+class _Memory:
+    def __init__(self, channels: int, latency: int, pipelined: bool = False):
+        self.latency = latency
+        self.pipelined = pipelined
+        self.held = [0] * channels
+        self.ready = [0] * channels
+        self.tag = [0] * channels  # Response tags (pipelined only)
+        self.in_flight: List[List[Tuple[int, int]]] = [[] for _ in range(channels)]  # (cycles left, tag)
+
+    def next(self, valid: List[int], tag: List[int]):
+        if not self.pipelined:
+            held = [h + 1 if v else 0 for h, v in zip(self.held, valid)]
+            return held, [int(h >= self.latency) for h in held], self.tag, self.in_flight
+
+        # Every valid pulse is a new request; with a fixed latency they come back in the order they went out
+        in_flight = [[(left - 1, t) for left, t in requests] for requests in self.in_flight]
+        ready = [0] * len(valid)
+        response_tag = [0] * len(valid)
+        for i, requests in enumerate(in_flight):
+            if valid[i]:
+                requests.append((self.latency - 1, tag[i]))
+            if requests and requests[0][0] <= 0:
+                ready[i] = 1
+                response_tag[i] = requests.pop(0)[1]
+        return self.held, ready, response_tag, in_flight
+
+    def commit(self, state):
+        self.held, self.ready, self.tag, self.in_flight = state
+
+
+class _Controller:
+    def __init__(self, consumers: int, channels: int, banked: bool = False, max_outstanding: int = 1):
+        self.banked = banked
+        self.max_outstanding = max_outstanding
+        self.bank_conflicts = 0
+        self.state = [CHANNEL_IDLE] * channels
+        self.consumer = [0] * channels  # Also the request tag on pipelined channels
+        self.outstanding = [0] * channels
+        self.serving = [0] * consumers
+        self.mem_read_valid = [0] * channels
+        self.mem_write_valid = [0] * channels
+        self.read_ready = [0] * consumers
+        self.write_ready = [0] * consumers
+
+    def next(
+        self,
+        read_valid: List[int],
+        write_valid: List[int],
+        mem_read_ready: List[int],
+        mem_write_ready: List[int],
+        address: Optional[List[int]] = None,
+        read_tag: Optional[List[int]] = None,
+        write_tag: Optional[List[int]] = None,
+    ):
+        # address: each consumer's request address, only needed when banked
+        # read_tag/write_tag: each channel's response tag, only needed when pipelined
+        channels = len(self.state)
+        state = list(self.state)
+        consumer = list(self.consumer)
+        outstanding = list(self.outstanding)
+        serving = list(self.serving)  # Updated with blocking assignments, like channel_serving_consumer
+        mem_read_valid = list(self.mem_read_valid)
+        mem_write_valid = list(self.mem_write_valid)
+        read_ready = list(self.read_ready)
+        write_ready = list(self.write_ready)
+
+        if self.max_outstanding > 1:
+            for i in range(channels):
+                if mem_read_ready[i]:
+                    read_ready[read_tag[i]] = 1
+                if mem_write_ready[i]:
+                    write_ready[write_tag[i]] = 1
+                in_flight = self.outstanding[i] - mem_read_ready[i] - mem_write_ready[i]
+
+                mem_read_valid[i] = 0
+                mem_write_valid[i] = 0
+                issued = CHANNEL_IDLE
+                if in_flight < self.max_outstanding:
+                    for j in range(len(serving)):
+                        if self.banked and address[j] % channels != i:
+                            continue
+                        if read_valid[j] and not serving[j]:
+                            serving[j] = 1
+                            consumer[i] = j
+                            mem_read_valid[i] = 1
+                            issued = READ_WAITING
+                            in_flight += 1
+                            break
+                        elif write_valid[j] and not serving[j]:
+                            serving[j] = 1
+                            consumer[i] = j
+                            mem_write_valid[i] = 1
+                            issued = WRITE_WAITING
+                            in_flight += 1
+                            break
+                outstanding[i] = in_flight
+                # Busy with the latest request issued while anything is in flight, like the RTL
+                if issued != CHANNEL_IDLE:
+                    state[i] = issued
+                elif in_flight == 0:
+                    state[i] = CHANNEL_IDLE
+
+            for j in range(len(serving)):
+                if self.read_ready[j] and not read_valid[j]:
+                    serving[j] = 0
+                    read_ready[j] = 0
+                if self.write_ready[j] and not write_valid[j]:
+                    serving[j] = 0
+                    write_ready[j] = 0
+        else:
+            for i, channel_state in enumerate(self.state):
+                current = self.consumer[i]
+                if channel_state == CHANNEL_IDLE:
+                    for j in range(len(serving)):
+                        if self.banked and address[j] % channels != i:
+                            continue
+                        if read_valid[j] and not serving[j]:
+                            serving[j] = 1
+                            consumer[i] = j
+                            mem_read_valid[i] = 1
+                            state[i] = READ_WAITING
+                            break
+                        elif write_valid[j] and not serving[j]:
+                            serving[j] = 1
+                            consumer[i] = j
+                            mem_write_valid[i] = 1
+                            state[i] = WRITE_WAITING
+                            break
+                elif channel_state == READ_WAITING:
+                    if mem_read_ready[i]:
+                        mem_read_valid[i] = 0
+                        read_ready[current] = 1
+                        state[i] = READ_RELAYING
+                elif channel_state == WRITE_WAITING:
+                    if mem_write_ready[i]:
+                        mem_write_valid[i] = 0
+                        write_ready[current] = 1
+                        state[i] = WRITE_RELAYING
+                elif channel_state == READ_RELAYING:
+                    if not read_valid[current]:
+                        serving[current] = 0
+                        read_ready[current] = 0
+                        state[i] = CHANNEL_IDLE
+                elif channel_state == WRITE_RELAYING:
+                    if not write_valid[current]:
+                        serving[current] = 0
+                        write_ready[current] = 0
+                        state[i] = CHANNEL_IDLE
+
+        conflicts = self.bank_conflicts
+        if self.banked:
+            conflicts += sum(
+                1 for j in range(len(serving)) if (read_valid[j] or write_valid[j]) and not serving[j]
+            )
+        return state, consumer, outstanding, serving, mem_read_valid, mem_write_valid, read_ready, write_ready, conflicts
+
+    def commit(self, values):
+        (
+            self.state,
+            self.consumer,
+            self.outstanding,
+            self.serving,
+            self.mem_read_valid,
+            self.mem_write_valid,
+            self.read_ready,
+            self.write_ready,
+            self.bank_conflicts,
+        ) = values
+
+
+class _Core:
+    def __init__(self, threads_per_block: int):
+        self.state = IDLE
+        self.take = 0
+        self.done = 0
+        self.trace: Optional[BlockTrace] = None
+        self.step = 0
+        self.decoded = 0  # Opcode latched by the decoder
+
+        self.fetcher_state = FETCHER_IDLE
+        self.fetch_valid = 0
+        self.fetch_address = 0
+        self.buffer_pc = 0  # Prefetch window (see src/fetcher.sv)
+        self.buffer_count = 0
+        self.backoff = 0
+        self.prefetch_hits = 0
+        self.prefetch_flushes = 0
+
+        self.lsu_state = [LSU_IDLE] * threads_per_block
+        self.read_valid = [0] * threads_per_block
+        self.write_valid = [0] * threads_per_block
+        self.address = [0] * threads_per_block
+
+
+
+class _Simulation:
+    def __init__(self, config: HardwareConfig, traces: List[BlockTrace], max_cycles: int):
+        self.config = config
+        self.traces = traces
+        self.max_cycles = max_cycles
+        lsus = config.num_cores * config.threads_per_block
+
+        self.cores = [_Core(config.threads_per_block) for _ in range(config.num_cores)]
+        pipelined = config.data_mem_max_outstanding > 1
+        self.data_controller = _Controller(
+            lsus, config.data_mem_num_channels, config.data_mem_banked, config.data_mem_max_outstanding
+        )
+        self.program_controller = _Controller(config.num_cores, config.program_mem_num_channels)
+        self.data_read_memory = _Memory(config.data_mem_num_channels, config.memory_latency, pipelined)
+        self.data_write_memory = _Memory(config.data_mem_num_channels, config.memory_latency, pipelined)
+        self.program_memory = _Memory(config.program_mem_num_channels, config.memory_latency)
+
+        # Registered LSU <> data memory controller passthrough in gpu.sv
+        self.lsu_read_valid = [0] * lsus
+        self.lsu_write_valid = [0] * lsus
+        self.lsu_read_ready = [0] * lsus
+        self.lsu_write_ready = [0] * lsus
+        self.lsu_address = [0] * lsus
+
+        # Dispatcher
+        self.core_start = [0] * config.num_cores
+        self.core_block = [0] * config.num_cores
+        self.blocks_dispatched = 0
+        self.blocks_done = 0
+
+        self.instructions: Dict[int, InstructionCost] = {}
+
+    def _account(self, core: _Core):
+        if core.state in (IDLE, DONE):
+            return
+        step = core.trace.steps[core.step]
+        cost = self.instructions.setdefault(step.pc, InstructionCost(step.pc, step.opcode))
+        if core.state == FETCH:
+            cost.fetch += 1
+        elif core.state == WAIT:
+            cost.wait += 1
+        else:
+            cost.issue += 1
+            if core.state == UPDATE:
+                cost.executions += 1
+
+    def _lsus(self, core: _Core, base: int):
+        # Next LSU states, valids and addresses; only the threads in the current instruction's active mask run
+        lsu_state = list(core.lsu_state)
+        read_valid = list(core.read_valid)
+        write_valid = list(core.write_valid)
+        address = list(core.address)
+        if core.decoded not in (OP_LDR, OP_STR) or core.state in (IDLE, DONE):
+            return lsu_state, read_valid, write_valid, address
+
+        load = core.decoded == OP_LDR
+        valid = read_valid if load else write_valid
+        ready = self.lsu_read_ready if load else self.lsu_write_ready
+        step = core.trace.steps[core.step]
+        for k, j in enumerate(step.active):
+            if lsu_state[j] == LSU_IDLE and core.state == REQUEST:
+                lsu_state[j] = LSU_REQUESTING
+            elif lsu_state[j] == LSU_REQUESTING:
+                valid[j] = 1
+                address[j] = step.addresses[k]
+                lsu_state[j] = LSU_WAITING
+            elif lsu_state[j] == LSU_WAITING and ready[base + j]:
+                valid[j] = 0
+                lsu_state[j] = LSU_DONE
+            elif lsu_state[j] == LSU_DONE and core.state == UPDATE:
+                lsu_state[j] = LSU_IDLE
+        return lsu_state, read_valid, write_valid, address
+
+    def _fetcher(self, core: _Core, ready: int):
+        # Returns (state, valid, address, buffer_pc, buffer_count, backoff, prefetch_hits, prefetch_flushes)
+        unchanged = (
+            core.fetch_address, core.buffer_pc, core.buffer_count, core.backoff, core.prefetch_hits, core.prefetch_flushes
+        )
+        if not self.config.prefetch_depth:
+            if core.fetcher_state == FETCHER_IDLE and core.state == FETCH:
+                return (FETCHING, 1) + unchanged
+            if core.fetcher_state == FETCHING and ready:
+                return (FETCHED, 0) + unchanged
+            if core.fetcher_state == FETCHED and core.state == DECODE:
+                return (FETCHER_IDLE, core.fetch_valid) + unchanged
+            return (core.fetcher_state, core.fetch_valid) + unchanged
+
+        # Only PCs matter for timing, so the window is just its first PC and length
+        depth = self.config.prefetch_depth
+        state, valid, address, buffer_pc, count, backoff, hits, flushes = (core.fetcher_state, core.fetch_valid) + unchanged
+        demand = False
+        backoff = int(core.fetch_valid and ready)
+        if core.fetch_valid and ready:
+            valid = 0
+            if core.fetch_address == buffer_pc + count and count < depth:
+                count += 1
+
+        if core.fetcher_state == FETCHER_IDLE and core.state == FETCH:
+            pc = core.trace.steps[core.step].pc
+            offset = pc - buffer_pc
+            if 0 <= offset < count:
+                hits += 1
+                state = FETCHED
+                buffer_pc, count = pc + 1, count - offset - 1
+            else:
+                if offset != count and (count or core.fetch_valid):
+                    flushes += 1
+                buffer_pc, count = pc, 0
+                demand = True
+                state = FETCHING
+        elif core.fetcher_state == FETCHING:
+            if count:
+                state = FETCHED
+                buffer_pc, count = buffer_pc + 1, count - 1
+            else:
+                demand = True
+        elif core.fetcher_state == FETCHED and core.state == DECODE:
+            state = FETCHER_IDLE
+
+        # Prefetches give way for a cycle after each response (see src/fetcher.sv)
+        if not core.fetch_valid and count < depth and core.state not in (IDLE, DONE) and (demand or not core.backoff):
+            valid = 1
+            address = buffer_pc + count
+        return state, valid, address, buffer_pc, count, backoff, hits, flushes
+
+    def _scheduler(self, core: _Core, start: int, block: int):
+        # Returns (state, step, trace, decoded, take, done)
+        state, step, trace, decoded = core.state, core.step, core.trace, core.decoded
+        if state in (IDLE, DONE):
+            if start:
+                return FETCH, 0, self.traces[block], decoded, 1, 0
+        elif state == FETCH:
+            if core.fetcher_state == FETCHED:
+                state = DECODE
+        elif state == DECODE:
+            # The decoder latches the instruction on the same edge
+            return REQUEST, step, trace, trace.steps[step].opcode, 0, 0
+        elif state == REQUEST:
+            state = WAIT
+        elif state == WAIT:
+            if not any(lsu in (LSU_REQUESTING, LSU_WAITING) for lsu in core.lsu_state):
+                state = EXECUTE
+        elif state == EXECUTE:
+            state = UPDATE
+        elif state == UPDATE:
+            # After a divergent RET the remaining threads carry on, so only the last step ends the block
+            if step + 1 == len(trace.steps):
+                return DONE, step, trace, decoded, 0, 1
+            return FETCH, step + 1, trace, decoded, 0, 0
+        return state, step, trace, decoded, 0, 0
+
+    def _dispatch(self):
+        # Counts retired blocks, then stages a block on every core that took its staged one
+        core_start = list(self.core_start)
+        core_block = list(self.core_block)
+        for core in self.cores:
+            self.blocks_done += core.done
+        for i, core in enumerate(self.cores):
+            if core.take or not self.core_start[i]:
+                if self.blocks_dispatched < len(self.traces):
+                    core_start[i] = 1
+                    core_block[i] = self.blocks_dispatched
+                    self.blocks_dispatched += 1
+                else:
+                    core_start[i] = 0
+        return core_start, core_block
+
+    def edge(self):
+        # Everything below reads the values from before the edge, then all registers update at once
+        threads = self.config.threads_per_block
+        data_read_memory = self.data_read_memory.next(self.data_controller.mem_read_valid, self.data_controller.consumer)
+        data_write_memory = self.data_write_memory.next(self.data_controller.mem_write_valid, self.data_controller.consumer)
+        program_memory = self.program_memory.next(self.program_controller.mem_read_valid, self.program_controller.consumer)
+        data_controller = self.data_controller.next(
+            self.lsu_read_valid,
+            self.lsu_write_valid,
+            self.data_read_memory.ready,
+            self.data_write_memory.ready,
+            self.lsu_address,
+            self.data_read_memory.tag,
+            self.data_write_memory.tag,
+        )
+        program_controller = self.program_controller.next(
+            [core.fetch_valid for core in self.cores],
+            [0] * len(self.cores),
+            self.program_memory.ready,
+            [0] * self.config.program_mem_num_channels,
+        )
+        dispatch = self._dispatch()
+
+        cores = []
+        for i, core in enumerate(self.cores):
+            cores.append((
+                self._lsus(core, i * threads),
+                self._fetcher(core, self.program_controller.read_ready[i]),
+                self._scheduler(core, self.core_start[i], self.core_block[i]),
+            ))
+
+        self.lsu_read_valid = [valid for core in self.cores for valid in core.read_valid]
+        self.lsu_write_valid = [valid for core in self.cores for valid in core.write_valid]
+        self.lsu_address = [address for core in self.cores for address in core.address]
+        self.lsu_read_ready = list(self.data_controller.read_ready)
+        self.lsu_write_ready = list(self.data_controller.write_ready)
+
+        self.data_read_memory.commit(data_read_memory)
+        self.data_write_memory.commit(data_write_memory)
+        self.program_memory.commit(program_memory)
+        self.data_controller.commit(data_controller)
+        self.program_controller.commit(program_controller)
+        self.core_start, self.core_block = dispatch
+        for core, (lsus, fetcher, scheduler) in zip(self.cores, cores):
+            core.lsu_state, core.read_valid, core.write_valid, core.address = lsus
+            (
+                core.fetcher_state,
+                core.fetch_valid,
+                core.fetch_address,
+                core.buffer_pc,
+                core.buffer_count,
+                core.backoff,
+                core.prefetch_hits,
+                core.prefetch_flushes,
+            ) = fetcher
+            core.state, core.step, core.trace, core.decoded, core.take, core.done = scheduler
+
+    def run(self) -> int:
+        # Returns the number of edges from the first edge after launch to the one done is seen on
+        edges = LAUNCH_EDGES
+        while self.blocks_done < len(self.traces):
+            if edges > self.max_cycles:
+                raise RuntimeError(f"Kernel didn't finish within {self.max_cycles} cycles")
+            for core in self.cores:
+                self._account(core)
+            self.edge()
+            edges += 1
+        return edges + COMPLETION_EDGES
+
+
+def estimate(
+    program: Union[Program, Sequence[int]],
+    threads: int,
+    config: Optional[HardwareConfig] = None,
+    data: Sequence[int] = (),
+    grid_dim_x: int = 0,
+    program_base: int = 0,
+    params: Sequence[int] = (),
+    max_cycles: int = 1000000,
+) -> CostReport:
+    # Predict how many cycles a launch takes, with a per-instruction breakdown
+    config = config or HardwareConfig()
+    code = list(program.code if isinstance(program, Program) else program)
+    model = GpuModel(code, data, config.threads_per_block, program_base, grid_dim_x, params)
+    traces = model.run(threads)
+
+    simulation = _Simulation(config, traces, max_cycles)
+    cycles = simulation.run()
+    return CostReport(
+        cycles,
+        config,
+        simulation.instructions,
+        len(traces),
+        simulation.data_controller.bank_conflicts,
+        sum(core.prefetch_hits for core in simulation.cores),
+        sum(core.prefetch_flushes for core in simulation.cores),
+    )
+
+
+def log_estimate(report: CostReport, measured: int, program: Optional[Program] = None) -> float:
+    # Logs the breakdown and the prediction against the measured cycles; returns the relative error
+    logger.info("\nCOST ESTIMATE")
+    for line in report.breakdown(program):
+        logger.info(line)
+    error = (report.cycles - measured) / measured if measured else 0.0
+    logger.info(f"Predicted {report.cycles} cycles, measured {measured} ({error:+.1%})")
+    return error
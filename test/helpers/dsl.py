@@ -0,0 +1,329 @@
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from .assembler import IMMEDIATE_BITS, NUM_WRITABLE_REGISTERS, Program, assemble_program
+
+# Python-embedded kernel DSL
+# > A kernel is a Python function taking a KernelBuilder; running it traces every operation into
+#   instructions on virtual registers, which a linear-scan allocator then maps onto R0-R12
+# > Arithmetic on values (+, -, *, //) emits ADD/SUB/MUL/DIV and plain ints become CONSTs;
+#   k.load(address) and k.store(address, value) emit LDR/STR
+# > Values are immutable. State that changes inside a loop needs k.var() and augmented
+#   assignment (acc += x) or acc.set(x), which update the variable's register in place
+# > `for i in k.range(n)` emits a loop with a static trip count of n (1-255)
+# > k.select(a, b, x, y) is x where a == b and y elsewhere, without branching (CMP + SELz)
+#
+#   @kernel
+#   def matadd(k):
+#       i = k.block_idx * k.block_dim + k.thread_idx
+#       k.store(i + 16, k.load(i) + k.load(i + 8))
+
+# Physical registers of the read-only builtins
+BLOCK_IDX = 13
+BLOCK_DIM = 14
+THREAD_IDX = 15
+
+# S2R sources (see test/helpers/assembler.py)
+SPECIALS = {"block_idy": "%blockIdy", "grid_dim_x": "%gridDimX"}
+NUM_PARAMS = 4
+
+
+class KernelError(Exception):
+    pass
+
+
+class VirtualRegister:
+    def __init__(self, index: int):
+        self.index = index
+
+    def __repr__(self):
+        return f"v{self.index}"
+
+
+Register = Union[VirtualRegister, int]
+
+
+class Value:
+    def __init__(self, builder: "KernelBuilder", register: Register):
+        self.builder = builder
+        self.register = register
+
+    def _binary(self, op: str, other, reverse: bool = False) -> "Value":
+        other = self.builder.value(other)
+        a, b = (other, self) if reverse else (self, other)
+        return self.builder.emit(op, a, b)
+
+    def __add__(self, other):
+        return self._binary("ADD", other)
+
+    def __radd__(self, other):
+        return self._binary("ADD", other, reverse=True)
+
+    def __sub__(self, other):
+        return self._binary("SUB", other)
+
+    def __rsub__(self, other):
+        return self._binary("SUB", other, reverse=True)
+
+    def __mul__(self, other):
+        return self._binary("MUL", other)
+
+    def __rmul__(self, other):
+        return self._binary("MUL", other, reverse=True)
+
+    def __floordiv__(self, other):
+        return self._binary("DIV", other)
+
+    def __rfloordiv__(self, other):
+        return self._binary("DIV", other, reverse=True)
+
+    def __repr__(self):
+        return f"Value({self.register})"
+
+
+class Var(Value):
+    def _update(self, op: str, other) -> "Var":
+        self.builder.emit(op, self, self.builder.value(other), into=self)
+        return self
+
+    def __iadd__(self, other):
+        return self._update("ADD", other)
+
+    def __isub__(self, other):
+        return self._update("SUB", other)
+
+    def __imul__(self, other):
+        return self._update("MUL", other)
+
+    def __ifloordiv__(self, other):
+        return self._update("DIV", other)
+
+    def set(self, value):
+        # There's no move instruction, so copies are an ADD of zero
+        self.builder.emit("ADD", self.builder.value(value), self.builder.zero(), into=self)
+
+
+# One traced instruction: op, destination, sources, immediate/special/label operand
+Instruction = Tuple[str, Optional[Register], Tuple[Register, ...], Optional[Union[int, str]]]
+
+
+class KernelBuilder:
+    def __init__(self, name: str):
+        self.name = name
+        self.instructions: List[Instruction] = []
+        self.loops: List[Tuple[int, int]] = []
+        self._open_loops: List[int] = []
+        self._registers = 0
+        self._labels = 0
+        self._zero: Optional[Value] = None
+
+    # Builtins
+    @property
+    def block_idx(self) -> Value:
+        return Value(self, BLOCK_IDX)
+
+    @property
+    def block_dim(self) -> Value:
+        return Value(self, BLOCK_DIM)
+
+    @property
+    def thread_idx(self) -> Value:
+        return Value(self, THREAD_IDX)
+
+    @property
+    def block_idy(self) -> Value:
+        return self._special(SPECIALS["block_idy"])
+
+    @property
+    def grid_dim_x(self) -> Value:
+        return self._special(SPECIALS["grid_dim_x"])
+
+    def param(self, index: int) -> Value:
+        if not 0 <= index < NUM_PARAMS:
+            raise KernelError(f"Kernel parameters are %param0-%param{NUM_PARAMS - 1}, got {index}")
+        return self._special(f"%param{index}")
+
+    def _special(self, name: str) -> Value:
+        value = Value(self, self._register())
+        self.instructions.append(("S2R", value.register, (), name))
+        return value
+
+    # Values
+    def _register(self) -> VirtualRegister:
+        self._registers += 1
+        return VirtualRegister(self._registers - 1)
+
+    def _check_constant(self, number: int):
+        if not isinstance(number, int) or not 0 <= number < (1 << IMMEDIATE_BITS):
+            raise KernelError(f"Constant {number!r} doesn't fit in {IMMEDIATE_BITS} bits")
+
+    def const(self, number: int) -> Value:
+        self._check_constant(number)
+        value = Value(self, self._register())
+        self.instructions.append(("CONST", value.register, (), number))
+        return value
+
+    def value(self, operand) -> Value:
+        if isinstance(operand, Value):
+            if operand.builder is not self:
+                raise KernelError("Value belongs to a different kernel")
+            return operand
+        if isinstance(operand, int):
+            return self.const(operand)
+        raise KernelError(f"Unsupported operand {operand!r}")
+
+    def zero(self) -> Value:
+        if self._zero is None:
+            self._zero = self.const(0)
+        return self._zero
+
+    def var(self, initial=0) -> Var:
+        var = Var(self, self._register())
+        if isinstance(initial, int):
+            self._check_constant(initial)
+            self.instructions.append(("CONST", var.register, (), initial))
+        else:
+            var.set(initial)
+        return var
+
+    def emit(self, op: str, a: Value, b: Value, into: Optional[Var] = None) -> Value:
+        result = into if into is not None else Value(self, self._register())
+        self.instructions.append((op, result.register, (a.register, b.register), None))
+        return result
+
+    def select(self, a, b, if_equal, otherwise) -> Value:
+        a, b = self.value(a), self.value(b)
+        if_equal, otherwise = self.value(if_equal), self.value(otherwise)
+        self.instructions.append(("CMP", None, (a.register, b.register), None))
+        return self.emit("SELz", if_equal, otherwise)
+
+    # Memory
+    def load(self, address) -> Value:
+        value = Value(self, self._register())
+        self.instructions.append(("LDR", value.register, (self.value(address).register,), None))
+        return value
+
+    def store(self, address, data):
+        address, data = self.value(address), self.value(data)
+        self.instructions.append(("STR", None, (address.register, data.register), None))
+
+    # Control flow
+    def range(self, count: int) -> Iterator[Value]:
+        if not isinstance(count, int) or not 1 <= count < (1 << IMMEDIATE_BITS):
+            raise KernelError(f"Loop trip count must be a constant from 1 to {(1 << IMMEDIATE_BITS) - 1}, got {count!r}")
+        counter = self.var(0)
+        limit = self.const(count)
+        one = self.const(1)
+
+        label = f"{self.name.upper()}_LOOP{self._labels}"
+        self._labels += 1
+        start = len(self.instructions)
+        self.instructions.append(("LABEL", None, (), label))
+        self._open_loops.append(start)
+
+        yield Value(self, counter.register)
+
+        counter += one
+        self.instructions.append(("CMP", None, (counter.register, limit.register), None))
+        # BRn loops while counter != limit (CMP sets n whenever the operands differ)
+        self.instructions.append(("BRn", None, (), label))
+        self._open_loops.pop()
+        self.loops.append((start, len(self.instructions) - 1))
+
+    def finish(self):
+        if self._open_loops:
+            raise KernelError(f"{self.name}: a loop body was left early (break/return inside k.range)")
+        self.instructions.append(("RET", None, (), None))
+
+
+def live_intervals(instructions: List[Instruction], loops: List[Tuple[int, int]]) -> Dict[int, List[int]]:
+    intervals: Dict[int, List[int]] = {}
+    for position, (_, destination, sources, _) in enumerate(instructions):
+        for register in sources + ((destination,) if destination is not None else ()):
+            if isinstance(register, VirtualRegister):
+                interval = intervals.setdefault(register.index, [position, position])
+                interval[1] = max(interval[1], position)
+
+    # A value that enters a loop and is read inside it must survive every iteration
+    changed = True
+    while changed:
+        changed = False
+        for start, end in loops:
+            for interval in intervals.values():
+                if interval[0] < start <= interval[1] < end:
+                    interval[1] = end
+                    changed = True
+    return intervals
+
+
+def allocate(instructions: List[Instruction], loops: List[Tuple[int, int]], name: str = "kernel") -> Dict[int, int]:
+    # Linear scan over live intervals; a register whose last read is an instruction can be that
+    # instruction's destination, since sources are read before the result is written
+    intervals = live_intervals(instructions, loops)
+    free = list(range(NUM_WRITABLE_REGISTERS))
+    active: List[Tuple[int, int]] = []
+    assignment: Dict[int, int] = {}
+
+    for index, (start, end) in sorted(intervals.items(), key=lambda item: (item[1][0], item[0])):
+        for expired in [a for a in active if a[0] <= start]:
+            active.remove(expired)
+            free.append(assignment[expired[1]])
+        if not free:
+            live = len(active) + 1
+            raise KernelError(
+                f"{name}: {live} values are live at instruction {start}, "
+                f"more than the {NUM_WRITABLE_REGISTERS} registers R0-R{NUM_WRITABLE_REGISTERS - 1}"
+            )
+        free.sort()
+        assignment[index] = free.pop(0)
+        active.append((end, index))
+    return assignment
+
+
+def render(instructions: List[Instruction], assignment: Dict[int, int]) -> List[str]:
+    def name(register: Register) -> str:
+        return f"R{assignment[register.index] if isinstance(register, VirtualRegister) else register}"
+
+    lines = []
+    for op, destination, sources, operand in instructions:
+        if op == "LABEL":
+            lines.append(f"{operand}:")
+        elif op == "RET":
+            lines.append(op)
+        elif op.startswith("BR"):
+            lines.append(f"{op} {operand}")
+        elif op == "CONST":
+            lines.append(f"CONST {name(destination)}, #{operand}")
+        elif op == "S2R":
+            lines.append(f"S2R {name(destination)}, {operand}")
+        else:
+            registers = ([destination] if destination is not None else []) + list(sources)
+            lines.append(f"{op} " + ", ".join(name(register) for register in registers))
+    return lines
+
+
+class Kernel:
+    def __init__(self, name: str, source: str, registers_used: int):
+        self.name = name
+        self.source = source
+        self.registers_used = registers_used
+
+    def assemble(self, optimize: bool = False, cache: bool = True) -> Program:
+        return assemble_program(self.source, cache=cache, optimize=optimize, name=self.name)
+
+    def __repr__(self):
+        return f"Kernel({self.name}, {len(self.source.splitlines())} lines, {self.registers_used} registers)"
+
+
+def compile_kernel(function: Callable[[KernelBuilder], None], name: Optional[str] = None) -> Kernel:
+    builder = KernelBuilder(name or function.__name__)
+    function(builder)
+    builder.finish()
+
+    assignment = allocate(builder.instructions, builder.loops, builder.name)
+    lines = [f"; {builder.name} (generated by test/helpers/dsl.py)"] + render(builder.instructions, assignment)
+    registers_used = len(set(assignment.values()))
+    return Kernel(builder.name, "\n".join(lines) + "\n", registers_used)
+
+
+def kernel(function: Callable[[KernelBuilder], None]) -> Kernel:
+    # Decorator: traces and compiles the kernel at definition time
+    return compile_kernel(function)
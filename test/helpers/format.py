@@ -1,6 +1,10 @@
+import os
 from typing import List, Optional
 from .logger import logger
 
+# Set (by make test_<name> WAVES=1) to the VCD file the simulator dumps; per-cycle probing is skipped
+WAVES = os.environ.get("TINY_GPU_WAVES")
+
 def format_register(register: int) -> str:
     if register < 13:
         return f"R{register}"
@@ -10,6 +14,20 @@ def format_register(register: int) -> str:
         return f"%blockDim"
     if register == 15:
         return f"%threadIdx"
+
+def format_special_register(special: int) -> str:
+    special_map = {
+        0: "%blockIdx",
+        1: "%blockIdy",
+        2: "%blockDim",
+        3: "%threadIdx",
+        4: "%gridDimX",
+        5: "%param0",
+        6: "%param1",
+        7: "%param2",
+        8: "%param3"
+    }
+    return special_map.get(special, f"%sr{special}")
     
 def format_instruction(instruction: str) -> str:
     opcode = instruction[0:4]
@@ -41,6 +59,14 @@ def format_instruction(instruction: str) -> str:
         return f"STR {rs}, {rt}"
     elif opcode == "1001":
         return f"CONST {rd}, {imm}"
+    elif opcode == "1010":
+        return f"S2R {rd}, {format_special_register(int(instruction[12:16], 2))}"
+    elif opcode == "1011":
+        return f"SELn {rd}, {rs}, {rt}"
+    elif opcode == "1100":
+        return f"SELz {rd}, {rs}, {rt}"
+    elif opcode == "1101":
+        return f"SELp {rd}, {rs}, {rt}"
     elif opcode == "1111":
         return "RET"
     return "UNKNOWN"
@@ -94,48 +120,93 @@ def format_registers(registers: List[str]) -> str:
     formatted_registers.reverse()
     return ', '.join(formatted_registers)
 
+# Text for one enabled thread in a cycle dump (shared by format_cycle and the offline waveform
+# formatter in test/helpers/waves.py). Values are bit strings; registers are listed R15 first
+def format_thread(
+    idx: int,
+    pc: str,
+    instruction: str,
+    core_state: str,
+    fetcher_state: str,
+    lsu_state: str,
+    registers: List[str],
+    rs: str,
+    rt: str,
+    reg_input_mux: str,
+    alu_out: str,
+    lsu_out: str,
+    constant: str,
+    active: str = "1",
+) -> List[str]:
+    # Threads outside the active mask are waiting at another PC after a divergent branch
+    lines = [
+        f"\n+-------- Thread {idx} --------+",
+        f"PC: {int(pc, 2)}" + ("" if active == "1" else " (inactive)"),
+        f"Instruction: {format_instruction(instruction)}",
+        f"Core State: {format_core_state(core_state)}",
+        f"Fetcher State: {format_fetcher_state(fetcher_state)}",
+        f"LSU State: {format_lsu_state(lsu_state)}",
+        f"Registers: {format_registers(registers)}",
+        f"RS = {int(rs, 2)}, RT = {int(rt, 2)}",
+    ]
+
+    mux = int(reg_input_mux, 2)
+    if mux == 0:
+        lines.append(f"ALU Out: {int(alu_out, 2)}")
+    if mux == 1:
+        lines.append(f"LSU Out: {int(lsu_out, 2)}")
+    if mux == 2:
+        lines.append(f"Constant: {int(constant, 2)}")
+    return lines
+
+def format_cycle_header(cycle_id: int) -> str:
+    return f"\n================================== Cycle {cycle_id} =================================="
+
+def format_core_header(core_id: int) -> str:
+    return f"\n+--------------------- Core {core_id} ---------------------+"
+
 def format_cycle(dut, cycle_id: int, thread_id: Optional[int] = None):
-    logger.debug(f"\n================================== Cycle {cycle_id} ==================================")
+    if WAVES:
+        # The simulator is dumping a waveform instead; format it offline with test/helpers/waves.py
+        return
+
+    logger.debug(format_cycle_header(cycle_id))
 
     for core in dut.cores:
         # Not exactly accurate, but good enough for now
         if int(str(dut.thread_count.value), 2) <= core.i.value * dut.THREADS_PER_BLOCK.value:
             continue
 
-        logger.debug(f"\n+--------------------- Core {core.i.value} ---------------------+")
+        logger.debug(format_core_header(core.i.value))
 
         instruction = str(core.core_instance.instruction.value)
+        active_mask = str(core.core_instance.active_mask.value)
         for thread in core.core_instance.threads:
             if int(thread.i.value) < int(str(core.core_instance.thread_count.value), 2): # if enabled
-                block_idx = core.core_instance.block_id.value
+                block_idx = int(core.core_instance.block_id.value)
+                block_idy = int(core.core_instance.block_id_y.value)
+                grid_dim_x = int(str(dut.grid_dim_x.value), 2) or 256
                 block_dim = int(core.core_instance.THREADS_PER_BLOCK)
-                thread_idx = thread.register_instance.THREAD_ID.value
-                idx = block_idx * block_dim + thread_idx
-
-                rs = int(str(thread.register_instance.rs.value), 2)
-                rt = int(str(thread.register_instance.rt.value), 2)
-
-                reg_input_mux = int(str(core.core_instance.decoded_reg_input_mux.value), 2)
-                alu_out = int(str(thread.alu_instance.alu_out.value), 2)
-                lsu_out = int(str(thread.lsu_instance.lsu_out.value), 2)
-                constant = int(str(core.core_instance.decoded_immediate.value), 2)
+                thread_idx = int(thread.register_instance.THREAD_ID.value)
+                idx = (block_idy * grid_dim_x + block_idx) * block_dim + thread_idx
 
                 if (thread_id is None or thread_id == idx):
-                    logger.debug(f"\n+-------- Thread {idx} --------+")
-
-                    logger.debug("PC:", int(str(core.core_instance.current_pc.value), 2))
-                    logger.debug("Instruction:", format_instruction(instruction))
-                    logger.debug("Core State:", format_core_state(str(core.core_instance.core_state.value)))
-                    logger.debug("Fetcher State:", format_fetcher_state(str(core.core_instance.fetcher_state.value)))
-                    logger.debug("LSU State:", format_lsu_state(str(thread.lsu_instance.lsu_state.value)))
-                    logger.debug("Registers:", format_registers([str(item.value) for item in thread.register_instance.registers]))
-                    logger.debug(f"RS = {rs}, RT = {rt}")
-
-                    if reg_input_mux == 0:
-                        logger.debug("ALU Out:", alu_out)
-                    if reg_input_mux == 1:
-                        logger.debug("LSU Out:", lsu_out)
-                    if reg_input_mux == 2:
-                        logger.debug("Constant:", constant)
-
-        logger.debug("Core Done:", str(core.core_instance.done.value))
\ No newline at end of file
+                    for line in format_thread(
+                        idx,
+                        str(core.core_instance.current_pc.value),
+                        instruction,
+                        str(core.core_instance.core_state.value),
+                        str(core.core_instance.fetcher_state.value),
+                        str(thread.lsu_instance.lsu_state.value),
+                        [str(item.value) for item in thread.register_instance.registers],
+                        str(thread.register_instance.rs.value),
+                        str(thread.register_instance.rt.value),
+                        str(core.core_instance.decoded_reg_input_mux.value),
+                        str(thread.alu_instance.alu_out.value),
+                        str(thread.lsu_instance.lsu_out.value),
+                        str(core.core_instance.decoded_immediate.value),
+                        active_mask[-1 - thread_idx],
+                    ):
+                        logger.debug(line)
+
+        logger.debug("Core Done:", str(core.core_instance.done.value))
@@ -0,0 +1,237 @@
+# Kernel sources shared by several test modules
+# > Each kernel lives here once, with its inputs and expected outputs where they're fixed, so tests
+#   (and test_session's regression run) import it from here rather than from another test module
+
+
+# ---------------- RAGGED LOOP KERNEL ----------------
+# out[i] = 1 + 2 + ... + n[i], where every thread reads its own trip count n[i]
+# Threads leave the loop at different iterations, so the block diverges at BRz and reconverges at DONE
+# The back edge is a BRnzp right after the loop's CMP, so it is always taken
+
+RAGGED_LOOP_ASM = """
+    MUL R0, R13, R14
+    ADD R0, R0, R15         ; i = blockIdx * blockDim + threadIdx
+    LDR R1, R0              ; n = lengths[i]
+    CONST R2, #0            ; sum
+    CONST R3, #0            ; j
+    CONST R4, #1
+
+LOOP:
+    CMP R3, R1
+    BRz DONE
+    ADD R3, R3, R4          ; j++
+    ADD R2, R2, R3          ; sum += j
+    BRnzp LOOP
+
+DONE:
+    CONST R5, #8
+    ADD R5, R5, R0
+    STR R5, R2              ; out[i] = sum
+    RET
+"""
+
+# 6 threads: the second block only has 2 of its 4 threads enabled
+RAGGED_LOOP_LENGTHS = [3, 0, 5, 1, 4, 2]
+RAGGED_LOOP_OUTPUT = 8
+RAGGED_LOOP_EXPECTED = [n * (n + 1) // 2 for n in RAGGED_LOOP_LENGTHS]
+
+
+# ---------------- BRANCH-FREE CLAMP KERNEL ----------------
+# out[i] = min(in[i], 100)
+# CMP only tells equal from not equal, so x <= 100 is tested as x / 101 == 0; SELz then picks x or
+# 100 per thread, so no thread ever branches away from the others
+
+CLAMP_ASM = """
+    MUL R0, R13, R14
+    ADD R0, R0, R15         ; i = blockIdx * blockDim + threadIdx
+    LDR R1, R0              ; x = in[i]
+
+    CONST R2, #101
+    DIV R3, R1, R2          ; 0 iff x <= 100
+    CONST R4, #0
+    CONST R5, #100
+    CMP R3, R4
+    SELz R6, R1, R5         ; x <= 100 ? x : 100
+
+    CONST R7, #8
+    ADD R7, R7, R0
+    STR R7, R6              ; out[i]
+    RET
+"""
+
+CLAMP_OUTPUT = 8
+
+
+# ---------------- SCALE KERNEL ----------------
+# out[i] = 3 * in[i] + 1 over 64 threads (16 blocks)
+
+SCALE_ASM = """
+    MUL R0, R13, R14
+    ADD R0, R0, R15         ; i = blockIdx * blockDim + threadIdx
+    LDR R1, R0              ; x = in[i]
+    CONST R2, #3
+    MUL R1, R1, R2
+    CONST R2, #1
+    ADD R1, R1, R2          ; 3x + 1
+    CONST R3, #64
+    ADD R3, R3, R0
+    STR R3, R1              ; out[i]
+    RET
+"""
+
+SCALE_THREADS = 64
+SCALE_DATA = [(7 * i + 5) % 80 for i in range(SCALE_THREADS)]
+SCALE_OUTPUT = 64
+SCALE_EXPECTED = [(3 * x + 1) & 0xFF for x in SCALE_DATA]
+
+
+# ---------------- VECTOR ADD KERNEL ----------------
+# out[i] = a[i] + b[i] over 16 threads
+
+VECTOR_ADD_ASM = """
+    MUL R0, R13, R14
+    ADD R0, R0, R15         ; i = blockIdx * blockDim + threadIdx
+    LDR R1, R0              ; a[i]
+    CONST R2, #16
+    ADD R2, R2, R0
+    LDR R2, R2              ; b[i]
+    ADD R1, R1, R2
+    CONST R3, #32
+    ADD R3, R3, R0
+    STR R3, R1              ; out[i]
+    RET
+"""
+
+VECTOR_ADD_THREADS = 16
+VECTOR_ADD_DATA = (
+    [(3 * i + 1) % 100 for i in range(VECTOR_ADD_THREADS)] + [(11 * i + 7) % 100 for i in range(VECTOR_ADD_THREADS)]
+)
+VECTOR_ADD_OUTPUT = 32
+VECTOR_ADD_EXPECTED = [VECTOR_ADD_DATA[i] + VECTOR_ADD_DATA[VECTOR_ADD_THREADS + i] for i in range(VECTOR_ADD_THREADS)]
+
+
+# ---------------- GRAYSCALE KERNEL ----------------
+# gray[i] = R/4 + G/2 + B/8, param0 = RGB base, param1 = gray base
+
+GRAYSCALE_ASM = """
+MUL R0, R13, R14
+ADD R0, R0, R15     ; i
+
+S2R R1, %param0
+S2R R2, %param1
+
+ADD R3, R0, R0
+ADD R3, R3, R0
+ADD R3, R3, R1      ; addrRGB = base + 3*i
+
+LDR R4, R3
+CONST R7, #1
+ADD R3, R3, R7
+LDR R5, R3
+ADD R3, R3, R7
+LDR R6, R3
+
+CONST R7, #4
+DIV R4, R4, R7
+CONST R7, #2
+DIV R5, R5, R7
+CONST R7, #8
+DIV R6, R6, R7
+
+ADD R4, R4, R5
+ADD R4, R4, R6
+
+ADD R7, R2, R0
+STR R7, R4
+
+RET
+"""
+
+
+# ---------------- MATRIX MULTIPLY KERNEL ----------------
+# C = A (2x4) x B (4x2), one thread per element of C, looping over the inner dimension
+
+MATMUL_ASM = """
+
+; ----------------------------------------
+; Compute global thread index
+; i = blockIdx * blockDim + threadIdx
+; ----------------------------------------
+MUL R0, R13, R14
+ADD R0, R0, R15
+
+; ----------------------------------------
+; Constants
+; ----------------------------------------
+CONST R1, #0      ; baseA
+CONST R2, #8      ; baseB
+CONST R3, #16     ; baseC
+
+CONST R4, #2      ; N (columns of C)
+CONST R5, #4      ; K (inner dimension)
+CONST R6, #1      ; increment
+
+; ----------------------------------------
+; row = i / N
+; col = i - row*N
+; ----------------------------------------
+DIV R7, R0, R4
+MUL R8, R7, R4
+SUB R8, R0, R8
+
+; ----------------------------------------
+; acc = 0, k = 0
+; ----------------------------------------
+CONST R9, #0      ; acc
+CONST R10, #0     ; k
+
+; ----------------------------------------
+; LOOP: for k in [0, K)
+; ----------------------------------------
+LOOP:
+    ; addrA = baseA + row*K + k
+    MUL R11, R7, R5
+    ADD R11, R11, R10
+    ADD R11, R11, R1
+    LDR R12, R11
+
+    ; addrB = baseB + k*N + col
+    MUL R11, R10, R4
+    ADD R11, R11, R8
+    ADD R11, R11, R2
+    LDR R11, R11
+
+    ; acc += A * B
+    MUL R12, R12, R11
+    ADD R9, R9, R12
+
+    ; k++
+    ADD R10, R10, R6
+    CMP R10, R5
+    BRn LOOP
+
+; ----------------------------------------
+; Store result: C[i] = acc
+; ----------------------------------------
+ADD R0, R0, R3
+STR R0, R9
+
+RET
+"""
+
+MATMUL_A = [
+    [10, 21, 31, 42],
+    [5, 69, 7, 81],
+]
+MATMUL_B = [
+    [1, 87],
+    [6, 1],
+    [15, 0],
+    [81, 19],
+]
+MATMUL_DATA = [x for row in MATMUL_A for x in row] + [x for row in MATMUL_B for x in row]
+MATMUL_THREADS = 4
+MATMUL_OUTPUT = 16
+MATMUL_EXPECTED = [
+    sum(a * b for a, b in zip(row, column)) & 0xFF for row in MATMUL_A for column in zip(*MATMUL_B)
+]
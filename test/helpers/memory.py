@@ -1,14 +1,170 @@
-from typing import List
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+import numpy as np
+from .access import Access
 from .logger import logger
+from .signals import read_value
 
+def memory_dtype(data_bits: int) -> np.dtype:
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if data_bits <= np.dtype(dtype).itemsize * 8:
+            return np.dtype(dtype)
+    raise ValueError(f"Unsupported memory data width: {data_bits} bits")
+
+# Memories larger than this are paged by default when no backing file is given
+PAGED_THRESHOLD = 1 << 16
+
+# Sparse backing store for large address spaces
+# > Rows live in fixed-size NumPy pages that are only allocated on first write; reads of untouched
+#   pages return zeros without allocating, so host memory follows what the kernel actually uses
+# > Indexes like a 1-D array (integers and contiguous slices); slices come back as copies
+# > Pages written since the last dump are tracked as dirty, so incremental dumps only write those
+class PagedStore:
+    def __init__(self, size: int, dtype: np.dtype, page_size: int = 4096):
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError(f"Page size must be a power of 2, got {page_size}")
+        self.size = size
+        self.dtype = np.dtype(dtype)
+        self.page_size = page_size
+        self.pages: Dict[int, np.ndarray] = {}
+        self.dirty: Set[int] = set()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def resident_bytes(self) -> int:
+        return len(self.pages) * self.page_size * self.dtype.itemsize
+
+    def _page(self, index: int) -> np.ndarray:
+        page = self.pages.get(index)
+        if page is None:
+            page = np.zeros(self.page_size, dtype=self.dtype)
+            self.pages[index] = page
+        self.dirty.add(index)
+        return page
+
+    def _range(self, key: slice) -> Tuple[int, int]:
+        start, stop, step = key.indices(self.size)
+        if step != 1:
+            raise IndexError("Paged memory only supports contiguous slices")
+        return start, max(start, stop)
+
+    def _chunks(self, start: int, stop: int) -> Iterator[Tuple[int, int, int, int]]:
+        # (page index, start within page, end within page, position in the requested range)
+        address = start
+        while address < stop:
+            index, lo = divmod(address, self.page_size)
+            hi = min(self.page_size, lo + stop - address)
+            yield index, lo, hi, address - start
+            address += hi - lo
+
+    def _check(self, address: int) -> int:
+        address = int(address)
+        if address < 0:
+            address += self.size
+        if not 0 <= address < self.size:
+            raise IndexError(f"Address {address} out of range for {self.size} rows")
+        return address
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = self._range(key)
+            out = np.zeros(stop - start, dtype=self.dtype)
+            for index, lo, hi, pos in self._chunks(start, stop):
+                page = self.pages.get(index)
+                if page is not None:
+                    out[pos:pos + hi - lo] = page[lo:hi]
+            return out
+
+        index, offset = divmod(self._check(key), self.page_size)
+        page = self.pages.get(index)
+        return self.dtype.type(0) if page is None else page[offset]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop = self._range(key)
+            values = np.broadcast_to(np.asarray(value), (stop - start,))
+            for index, lo, hi, pos in self._chunks(start, stop):
+                self._page(index)[lo:hi] = values[pos:pos + hi - lo]
+            return
+
+        index, offset = divmod(self._check(key), self.page_size)
+        self._page(index)[offset] = value
+
+    def clear(self):
+        # Zero the allocated pages in place (they stay allocated and are marked dirty)
+        for index, page in self.pages.items():
+            page[:] = 0
+            self.dirty.add(index)
+
+    def dump(self, path: str, incremental: bool = False):
+        # Write allocated pages (or only those dirtied since the last dump) to an .npz file
+        indices = sorted(self.dirty if incremental else self.pages)
+        data = np.stack([self.pages[i] for i in indices]) if indices else np.zeros((0, self.page_size), self.dtype)
+        np.savez(path, size=self.size, page_size=self.page_size, pages=np.array(indices, dtype=np.int64), data=data)
+        self.dirty.clear()
+
+    def restore(self, path: str):
+        # Apply pages from a dump on top of the current contents
+        with np.load(path) as dump:
+            if int(dump["page_size"]) != self.page_size:
+                raise ValueError(f"Dump page size {int(dump['page_size'])} doesn't match {self.page_size}")
+            for index, page in zip(dump["pages"].tolist(), dump["data"]):
+                self._page(index)[:] = page
+
+# Memory stand-in driven from cocotb
+# > The rows live in a NumPy array (or a memory-mapped file when path is given), so data can be
+#   loaded, viewed and dumped in bulk without going element by element through Python
+# > A path ending in .npy is opened as a NumPy image and reused if it already has the right size;
+#   any other path is treated as a raw little-endian file
+# > Without a path, memories above PAGED_THRESHOLD rows (or any memory with paged=True) use a
+#   sparse PagedStore instead of a dense array
+# > With banked=True the memory mirrors a DATA_MEM_BANKED build: channel i is bank i of an
+#   address-interleaved memory, serving one access per cycle. A request on the wrong bank raises,
+#   and bank_accesses counts the accesses each bank served
+# > latency is the cycles a request takes, either fixed or a function of the address. Blocking
+#   channels answer once valid has been held that long. With pipelined=True the memory mirrors a
+#   DATA_MEM_MAX_OUTSTANDING > 1 build: every valid pulse is a new tagged request, and each cycle a
+#   channel answers the earliest due one with its tag, so a fast request can overtake a slow one
+#   (reordered counts how often that happened)
 class Memory:
-    def __init__(self, dut, addr_bits, data_bits, channels, name):
+    def __init__(
+        self,
+        dut,
+        addr_bits,
+        data_bits,
+        channels,
+        name,
+        path: Optional[str] = None,
+        paged: Optional[bool] = None,
+        page_size: int = 4096,
+        banked: bool = False,
+        latency: Union[int, Callable[[int], int]] = 1,
+        pipelined: bool = False,
+    ):
         self.dut = dut
         self.addr_bits = addr_bits
         self.data_bits = data_bits
-        self.memory = [0] * (2**addr_bits)
+        self.dtype = memory_dtype(data_bits)
+        if paged is None:
+            paged = path is None and 2**addr_bits > PAGED_THRESHOLD
+        if paged and path is not None:
+            raise ValueError("A paged memory can't also be backed by a file")
+        self.memory = PagedStore(2**addr_bits, self.dtype, page_size) if paged else self._allocate(2**addr_bits, path)
+        self.path = path
         self.channels = channels
         self.name = name
+        self.banked = banked
+        self.bank_accesses = [0] * channels
+        self.latency = latency
+        self.pipelined = pipelined
+        self.reordered = 0  # pipelined responses that overtook an earlier request on their channel
+        self._tick = 0
+        self._waiting: Dict[Tuple[int, bool], int] = {}
+        self._in_flight: Dict[Tuple[int, bool], List[tuple]] = {
+            (i, write): [] for i in range(channels) for write in (False, True)
+        }
 
         self.mem_read_valid = getattr(dut, f"{name}_mem_read_valid")
         self.mem_read_address = getattr(dut, f"{name}_mem_read_address")
@@ -21,60 +177,241 @@ class Memory:
             self.mem_write_data = getattr(dut, f"{name}_mem_write_data")
             self.mem_write_ready = getattr(dut, f"{name}_mem_write_ready")
 
+        if pipelined:
+            self.mem_read_tag = getattr(dut, f"{name}_mem_read_tag")
+            self.mem_read_response_tag = getattr(dut, f"{name}_mem_read_response_tag")
+            self.mem_write_tag = getattr(dut, f"{name}_mem_write_tag")
+            self.mem_write_response_tag = getattr(dut, f"{name}_mem_write_response_tag")
+            self.tag_bits = len(str(self.mem_read_tag.value)) // channels
+
+        # Access recording (see record())
+        self.accesses: Optional[List[Access]] = None
+        self.occupancy: List[Tuple[int, int]] = []
+        self.threads_per_block = 4
+        self._cycle = 0
+        self._requesting: Dict[Tuple[int, bool], bool] = {}
+
+    def record(self, threads_per_block: int = 4):
+        # Start logging requests in run() (see test/helpers/access.py for the analysis)
+        self.accesses = []
+        self.occupancy = []
+        self.threads_per_block = threads_per_block
+        self._cycle = 0
+        self._requesting = {}
+
+    def _record(self, valid: List[int], address: List[int], write: bool):
+        controller = getattr(self.dut, f"{self.name}_memory_controller", None)
+        for i in range(self.channels):
+            # Bit strings are MSB first, so list entry i is channel channels-1-i
+            channel = self.channels - 1 - i
+            active = valid[i] == 1
+            # Pipelined channels pulse valid once per request, so back-to-back pulses are separate requests
+            if active and (self.pipelined or not self._requesting.get((channel, write))):
+                consumer = pc = None
+                if self.pipelined:
+                    consumer = self._split(self.mem_write_tag if write else self.mem_read_tag, self.tag_bits)[i]
+                elif controller is not None:
+                    consumers = len(str(controller.consumer_read_valid.value))
+                    consumer = read_value(controller.current_consumer, channel, max(1, (consumers - 1).bit_length()))
+                if consumer is not None and self.name != "program":
+                    core = self.dut.cores[consumer // self.threads_per_block]
+                    pc = read_value(core.core_instance.current_pc)
+                self.accesses.append(Access(self._cycle, channel, address[i], write, consumer, pc))
+            self._requesting[(channel, write)] = active
+
+    def _record_occupancy(self):
+        # Requests waiting for a channel, and channels with nothing to do
+        controller = getattr(self.dut, f"{self.name}_memory_controller", None)
+        if controller is None:
+            return
+        requests = read_value(controller.consumer_read_valid) or 0
+        if self.name != "program":
+            requests |= read_value(controller.consumer_write_valid) or 0
+        serving = read_value(controller.channel_serving_consumer) or 0
+        pending = bin(requests & ~serving).count("1")
+        if self.pipelined:
+            # A pipelined channel is idle once none of its requests are in flight
+            max_outstanding = int(getattr(self.dut, f"{self.name.upper()}_MEM_MAX_OUTSTANDING").value)
+            width = (max_outstanding - 1).bit_length() + 1
+            idle = sum(read_value(controller.outstanding, channel, width) == 0 for channel in range(self.channels))
+        else:
+            idle = sum(read_value(controller.controller_state, channel, 3) == 0 for channel in range(self.channels))
+        self.occupancy.append((pending, idle))
+
     def run(self):
-        mem_read_valid = [
-            int(str(self.mem_read_valid.value)[i:i+1], 2)
-            for i in range(0, len(str(self.mem_read_valid.value)), 1)
-        ]
-
-        mem_read_address = [
-            int(str(self.mem_read_address.value)[i:i+self.addr_bits], 2)
-            for i in range(0, len(str(self.mem_read_address.value)), self.addr_bits)
-        ]
-        mem_read_ready = [0] * self.channels
-        mem_read_data = [0] * self.channels
+        self._tick += 1
+        mem_read_valid = self._split(self.mem_read_valid, 1)
+        mem_read_address = self._split(self.mem_read_address, self.addr_bits)
+        if self.banked:
+            self._check_banks(mem_read_valid, mem_read_address)
 
+        if self.pipelined:
+            mem_read_tag = self._split(self.mem_read_tag, self.tag_bits)
+            self._queue(mem_read_valid, mem_read_address, mem_read_tag, None, write=False)
+            mem_read_ready, mem_read_data, mem_read_response_tag = self._respond(write=False)
+            self.mem_read_response_tag.value = self._join(mem_read_response_tag, self.tag_bits)
+        else:
+            mem_read_ready = [0] * self.channels
+            mem_read_data = [0] * self.channels
+            for i in range(self.channels):
+                if self._held(i, mem_read_valid[i], mem_read_address[i], write=False):
+                    mem_read_data[i] = self.memory[mem_read_address[i]]
+                    mem_read_ready[i] = 1
+
+        self.mem_read_data.value = self._join(mem_read_data, self.data_bits)
+        self.mem_read_ready.value = self._join(mem_read_ready, 1)
+        if self.accesses is not None:
+            self._record(mem_read_valid, mem_read_address, write=False)
+
+        if self.name != "program":
+            mem_write_valid = self._split(self.mem_write_valid, 1)
+            mem_write_address = self._split(self.mem_write_address, self.addr_bits)
+            mem_write_data = self._split(self.mem_write_data, self.data_bits)
+            if self.banked:
+                self._check_banks(mem_write_valid, mem_write_address)
+
+            if self.pipelined:
+                mem_write_tag = self._split(self.mem_write_tag, self.tag_bits)
+                self._queue(mem_write_valid, mem_write_address, mem_write_tag, mem_write_data, write=True)
+                mem_write_ready, _, mem_write_response_tag = self._respond(write=True)
+                self.mem_write_response_tag.value = self._join(mem_write_response_tag, self.tag_bits)
+            else:
+                mem_write_ready = [0] * self.channels
+                for i in range(self.channels):
+                    if self._held(i, mem_write_valid[i], mem_write_address[i], write=True):
+                        self.memory[mem_write_address[i]] = mem_write_data[i]
+                        mem_write_ready[i] = 1
+
+            self.mem_write_ready.value = self._join(mem_write_ready, 1)
+            if self.accesses is not None:
+                self._record(mem_write_valid, mem_write_address, write=True)
+
+        if self.accesses is not None:
+            self._record_occupancy()
+            self._cycle += 1
+
+    def _split(self, handle, width: int) -> List[int]:
+        # One value per channel, MSB first like the bit string (entry i is channel channels-1-i)
+        bits = str(handle.value)
+        return [int(bits[i:i+width], 2) for i in range(0, len(bits), width)]
+
+    def _join(self, values: List[int], width: int) -> int:
+        return int(''.join(format(int(v), '0' + str(width) + 'b') for v in values), 2)
+
+    def _delay(self, address: int) -> int:
+        return max(1, self.latency(address) if callable(self.latency) else self.latency)
+
+    def _held(self, i: int, valid: int, address: int, write: bool) -> bool:
+        # Blocking channels: the request is answered once valid has been held for the latency
+        held = self._waiting.get((i, write), 0) + 1 if valid == 1 else 0
+        self._waiting[(i, write)] = held
+        return held > 0 and held >= self._delay(address)
+
+    def _queue(self, valid: List[int], address: List[int], tag: List[int], data: Optional[List[int]], write: bool):
+        # Pipelined channels: every valid pulse is a new request, due latency cycles later
         for i in range(self.channels):
-            if mem_read_valid[i] == 1:
-                mem_read_data[i] = self.memory[mem_read_address[i]]
-                mem_read_ready[i] = 1
+            if valid[i] == 1:
+                due = self._tick + self._delay(address[i]) - 1
+                self._in_flight[(i, write)].append((due, tag[i], address[i], data[i] if write else None))
+
+    def _respond(self, write: bool) -> Tuple[List[int], List[int], List[int]]:
+        # Each channel answers its earliest due request, whatever order the requests went out in
+        ready, data, tag = [0] * self.channels, [0] * self.channels, [0] * self.channels
+        for i in range(self.channels):
+            queue = self._in_flight[(i, write)]
+            due = [request for request in queue if request[0] <= self._tick]
+            if not due:
+                continue
+            request = min(due, key=lambda request: request[0])
+            if queue.index(request) != 0:
+                self.reordered += 1
+            queue.remove(request)
+            _, tag[i], address, value = request
+            if write:
+                self.memory[address] = value
             else:
-                mem_read_ready[i] = 0
+                data[i] = self.memory[address]
+            ready[i] = 1
+        return ready, data, tag
 
-        self.mem_read_data.value = int(''.join(format(d, '0' + str(self.data_bits) + 'b') for d in mem_read_data), 2)
-        self.mem_read_ready.value = int(''.join(format(r, '01b') for r in mem_read_ready), 2)
+    def _check_banks(self, valid: List[int], address: List[int]):
+        # Bit strings are MSB first, so list entry i is channel (bank) channels-1-i
+        for i in range(self.channels):
+            if valid[i] == 1:
+                bank = self.channels - 1 - i
+                if address[i] % self.channels != bank:
+                    raise RuntimeError(f"{self.name} memory: address {address[i]} requested on bank {bank}")
+                self.bank_accesses[bank] += 1
 
-        if self.name != "program":
-            mem_write_valid = [
-                int(str(self.mem_write_valid.value)[i:i+1], 2)
-                for i in range(0, len(str(self.mem_write_valid.value)), 1)
-            ]
-            mem_write_address = [
-                int(str(self.mem_write_address.value)[i:i+self.addr_bits], 2)
-                for i in range(0, len(str(self.mem_write_address.value)), self.addr_bits)
-            ]
-            mem_write_data = [
-                int(str(self.mem_write_data.value)[i:i+self.data_bits], 2)
-                for i in range(0, len(str(self.mem_write_data.value)), self.data_bits)
-            ]
-            mem_write_ready = [0] * self.channels
+    @property
+    def paged(self) -> bool:
+        return isinstance(self.memory, PagedStore)
 
-            for i in range(self.channels):
-                if mem_write_valid[i] == 1:
-                    self.memory[mem_write_address[i]] = mem_write_data[i]
-                    mem_write_ready[i] = 1
-                else:
-                    mem_write_ready[i] = 0
+    def _allocate(self, size: int, path: Optional[str]) -> np.ndarray:
+        if path is None:
+            return np.zeros(size, dtype=self.dtype)
 
-            self.mem_write_ready.value = int(''.join(format(w, '01b') for w in mem_write_ready), 2)
+        if path.endswith(".npy"):
+            if os.path.exists(path):
+                image = np.load(path, mmap_mode="r+")
+                if image.shape == (size,) and image.dtype == self.dtype:
+                    return image
+                del image
+            return np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=(size,))
+
+        mode = "r+" if os.path.exists(path) and os.path.getsize(path) == size * self.dtype.itemsize else "w+"
+        return np.memmap(path, dtype=self.dtype, mode=mode, shape=(size,))
+
+    def clear(self, files: bool = False):
+        # Zero every row and drop requests still in flight, e.g. between the jobs of a session
+        # > A path-backed memory's rows are the file itself, so clearing it zeroes the file on disk.
+        #   That only happens with files=True; otherwise it raises and leaves the file untouched
+        if self.path is not None and not files:
+            raise ValueError(f"Clearing {self.name} memory would zero {self.path} on disk; pass files=True to do so")
+        if self.paged:
+            self.memory.clear()
+        else:
+            self.memory[:] = 0
+        self._waiting.clear()
+        for requests in self._in_flight.values():
+            requests.clear()
+        self.bank_accesses = [0] * self.channels
+        self.reordered = 0
 
     def write(self, address, data):
         if address < len(self.memory):
             self.memory[address] = data
 
-    def load(self, rows: List[int]):
-        for address, data in enumerate(rows):
-            self.write(address, data)
+    def load(self, rows: Union[Sequence[int], np.ndarray], offset: int = 0):
+        # Rows past the end of memory are dropped, like individual out-of-range writes
+        rows = np.asarray(rows).reshape(-1)[:max(0, len(self.memory) - offset)]
+        self.memory[offset:offset + len(rows)] = rows.astype(self.dtype)
+
+    def load_array(self, offset: int, array: np.ndarray):
+        array = np.asarray(array).reshape(-1)
+        if offset < 0 or offset + len(array) > len(self.memory):
+            raise IndexError(f"{self.name} memory: {len(array)} rows at offset {offset} don't fit in {len(self.memory)} rows")
+        self.memory[offset:offset + len(array)] = array
+
+    def view(self, offset: int, shape: Union[int, Sequence[int]], dtype=None) -> np.ndarray:
+        # View of the rows starting at offset (no copy, except for paged memories where it's a copy).
+        # With a dtype wider than a row, consecutive rows are reinterpreted little-endian, so a
+        # uint16 view of 8-bit memory pairs up rows
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        count = int(np.prod(shape)) * dtype.itemsize // self.dtype.itemsize
+        if offset < 0 or offset + count > len(self.memory):
+            raise IndexError(f"{self.name} memory: view of {count} rows at offset {offset} is out of range")
+        return self.memory[offset:offset + count].view(dtype).reshape(shape)
+
+    def snapshot(self, path: str, incremental: bool = False):
+        # Dump the whole memory in one call (.npy image, loadable with np.load or Memory(path=...)).
+        # Paged memories write an .npz of their touched pages instead (see PagedStore.dump)
+        if self.paged:
+            self.memory.dump(path, incremental)
+            return
+        if isinstance(self.memory, np.memmap):
+            self.memory.flush()
+        np.save(path, np.asarray(self.memory))
 
     def display(self, rows, decimal=True):
         logger.info("\n")
@@ -87,7 +424,7 @@ class Memory:
         logger.info(header + " " * (table_size - len(header) - 1) + "|")
 
         logger.info("+" + "-" * (table_size - 3) + "+")
-        for i, data in enumerate(self.memory):
+        for i, data in enumerate(self.memory[:rows].tolist()):
             if i < rows:
                 if decimal:
                     row = f"| {i:<4} | {data:<4}"
@@ -0,0 +1,217 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# Functional model of the tiny-gpu ISA
+# > Runs a kernel block by block on a NumPy copy of data memory, following the same rules as the RTL:
+#   8-bit registers with wrap-around, R0-R12 cleared at the start of every block, R13-R15 holding
+#   %blockIdx, %blockDim and %threadIdx, and branch targets relative to the program base
+# > CMP compares unsigned, exactly like src/alu.sv: the flag the assembler calls n (instruction bit
+#   11) is set whenever the operands differ, z when they're equal, and p is never set
+# > The threads of a block run in lockstep: each instruction reads all operands before any thread
+#   writes, and stores from one instruction land in thread order
+# > Divergence follows src/scheduler.sv: each thread has its own PC, every instruction is issued at
+#   the lowest PC of the threads that haven't returned, and only the threads at that PC execute it.
+#   A thread retires on RET and the block ends once all of them have
+# > Division by zero is undefined in the RTL (x); the model returns 0
+
+DATA_MASK = 0xFF
+
+OP_NOP = 0b0000
+OP_BRNZP = 0b0001
+OP_CMP = 0b0010
+OP_ADD = 0b0011
+OP_SUB = 0b0100
+OP_MUL = 0b0101
+OP_DIV = 0b0110
+OP_LDR = 0b0111
+OP_STR = 0b1000
+OP_CONST = 0b1001
+OP_S2R = 0b1010
+OP_SELN = 0b1011
+OP_SELZ = 0b1100
+OP_SELP = 0b1101
+OP_RET = 0b1111
+
+# Condition each SEL opcode checks the NZP flags against
+SELECT_CONDITIONS = {OP_SELN: 0b100, OP_SELZ: 0b010, OP_SELP: 0b001}
+
+# NZP flag bits, in the order of instruction[11:9]
+FLAG_NE = 0b100
+FLAG_EQ = 0b010
+
+
+# One executed instruction of a block: its PC (relative to the program base), opcode, the threads
+# that executed it, and the data memory addresses they touched (reads for LDR, writes for STR)
+class Step:
+    def __init__(
+        self,
+        pc: int,
+        opcode: int,
+        addresses: Optional[List[int]] = None,
+        active: Optional[List[int]] = None,
+        running: int = 0,
+    ):
+        self.pc = pc
+        self.opcode = opcode
+        self.addresses = addresses or []
+        self.active = active or []
+        self.running = running  # Threads that hadn't retired yet when the instruction was issued
+
+    @property
+    def divergent(self) -> bool:
+        # Some threads that are still running sat this instruction out
+        return len(self.active) < self.running
+
+    @property
+    def is_load(self) -> bool:
+        return self.opcode == OP_LDR
+
+    @property
+    def is_store(self) -> bool:
+        return self.opcode == OP_STR
+
+    @property
+    def is_memory(self) -> bool:
+        return self.opcode in (OP_LDR, OP_STR)
+
+    def __repr__(self):
+        return f"Step(pc={self.pc}, opcode={self.opcode:04b})"
+
+
+class BlockTrace:
+    def __init__(
+        self,
+        block_x: int,
+        block_y: int,
+        threads: int,
+        steps: List[Step],
+        writes: Dict[int, int],
+        writers: Optional[Dict[int, int]] = None,
+    ):
+        self.block_x = block_x
+        self.block_y = block_y
+        self.threads = threads
+        self.steps = steps
+        self.writes = writes  # Final value of every data memory address the block stored to
+        self.writers = writers or {}  # PC of the store that wrote each of those final values
+
+    @property
+    def divergent_steps(self) -> int:
+        return sum(step.divergent for step in self.steps)
+
+
+class GpuModel:
+    def __init__(
+        self,
+        program: Sequence[int],
+        data: Sequence[int],
+        threads_per_block: int = 4,
+        program_base: int = 0,
+        grid_dim_x: int = 0,
+        params: Sequence[int] = (),
+        memory_size: int = 256,
+        max_steps: int = 100000,
+    ):
+        self.program = list(program)
+        self.memory = np.zeros(max(memory_size, len(data)), dtype=np.int64)
+        self.memory[:len(data)] = np.asarray(data, dtype=np.int64) & DATA_MASK
+        self.threads_per_block = threads_per_block
+        self.program_base = program_base
+        self.grid_dim_x = grid_dim_x
+        self.params = (list(params) + [0] * 4)[:4]
+        self.max_steps = max_steps
+
+    def block_coordinates(self, block: int):
+        # Blocks walk the grid row by row, grid_dim_x blocks per row (0 = 256)
+        width = self.grid_dim_x or 256
+        return block % width, (block // width) & DATA_MASK
+
+    def run_block(self, block: int, threads: int) -> BlockTrace:
+        block_x, block_y = self.block_coordinates(block)
+        specials = [block_x, block_y, self.threads_per_block, 0, self.grid_dim_x] + self.params
+
+        registers = np.zeros((threads, 16), dtype=np.int64)
+        registers[:, 13] = block_x
+        registers[:, 14] = self.threads_per_block
+        registers[:, 15] = np.arange(threads)
+        nzp = np.zeros(threads, dtype=np.int64)
+
+        steps: List[Step] = []
+        writes: Dict[int, int] = {}
+        writers: Dict[int, int] = {}
+        pcs = np.zeros(threads, dtype=np.int64)
+        retired = np.zeros(threads, dtype=bool)
+        while not retired.all():
+            if len(steps) >= self.max_steps:
+                raise RuntimeError(f"Block {block} didn't finish within {self.max_steps} instructions")
+            pc = int(pcs[~retired].min())
+            if not 0 <= self.program_base + pc < len(self.program):
+                raise RuntimeError(f"Block {block} ran off the end of the program at pc {pc}")
+            active = np.flatnonzero(~retired & (pcs == pc))
+
+            instruction = self.program[self.program_base + pc]
+            opcode = instruction >> 12
+            rd = (instruction >> 8) & 0xF
+            rs = registers[active, (instruction >> 4) & 0xF]
+            rt = registers[active, instruction & 0xF]
+            immediate = instruction & 0xFF
+            step = Step(pc, opcode, active=active.tolist(), running=int((~retired).sum()))
+            steps.append(step)
+            next_pc = np.full(len(active), pc + 1)
+
+            if opcode == OP_RET:
+                retired[active] = True
+                continue
+            elif opcode == OP_BRNZP:
+                taken = (nzp[active] & ((instruction >> 9) & 0b111)) != 0
+                next_pc = np.where(taken, immediate, pc + 1)
+            elif opcode == OP_CMP:
+                nzp[active] = np.where(rs != rt, FLAG_NE, FLAG_EQ)
+            elif opcode in (OP_ADD, OP_SUB, OP_MUL, OP_DIV):
+                if opcode == OP_ADD:
+                    result = rs + rt
+                elif opcode == OP_SUB:
+                    result = rs - rt
+                elif opcode == OP_MUL:
+                    result = rs * rt
+                else:
+                    result = np.where(rt != 0, rs // np.maximum(rt, 1), 0)
+                self._write(registers, active, rd, result & DATA_MASK)
+            elif opcode in SELECT_CONDITIONS:
+                match = (nzp[active] & SELECT_CONDITIONS[opcode]) != 0
+                self._write(registers, active, rd, np.where(match, rs, rt))
+            elif opcode == OP_LDR:
+                step.addresses = rs.tolist()
+                self._write(registers, active, rd, self.memory[rs])
+            elif opcode == OP_STR:
+                step.addresses = rs.tolist()
+                for address, value in zip(rs.tolist(), rt.tolist()):
+                    self.memory[address] = value
+                    writes[address] = value
+                    writers[address] = pc
+            elif opcode == OP_CONST:
+                self._write(registers, active, rd, np.full(len(active), immediate))
+            elif opcode == OP_S2R:
+                values = [specials[immediate] if immediate < len(specials) else 0] * len(active)
+                if immediate == 3:
+                    values = active.tolist()
+                self._write(registers, active, rd, np.array(values) & DATA_MASK)
+
+            pcs[active] = next_pc
+
+        return BlockTrace(block_x, block_y, threads, steps, writes, writers)
+
+    @staticmethod
+    def _write(registers: np.ndarray, threads: np.ndarray, rd: int, values):
+        # R13-R15 are read-only
+        if rd < 13:
+            registers[threads, rd] = values
+
+    def run(self, threads: int, first_block: int = 0) -> List[BlockTrace]:
+        # Runs every block of the kernel from first_block on, in dispatch order
+        blocks = (threads + self.threads_per_block - 1) // self.threads_per_block
+        traces = []
+        for block in range(first_block, blocks):
+            count = min(self.threads_per_block, threads - block * self.threads_per_block)
+            traces.append(self.run_block(block, count))
+        return traces
@@ -0,0 +1,162 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from cocotb.triggers import RisingEdge
+from .logger import logger
+from .memory import Memory
+from .setup import descriptor_writes, reset
+from .signals import read_value
+
+# Host runtime for the multi-device top level (src/multi_gpu.sv)
+# > A launch's blocks are split into contiguous shards, one per device. Each device gets the full
+#   thread count up to the end of its shard and the shard's first block (DCR 8/9), so kernels see the
+#   same global block and thread indices as on one device and need no changes
+# > All devices are started on the same edge and run concurrently; the runtime services both memories
+#   every cycle and records when each device raises done
+# > Separate data memories: every device gets its own copy of the input at d << DATA_MEM_ADDR_BITS,
+#   and merge() combines the rows each device changed into one image (two devices changing the same
+#   row to different values is an error). Shared data memory: devices read and write the same rows
+#   through the shared controller, so there is nothing to merge
+# > In shared mode, contention is sampled at the shared controller: every cycle it counts device
+#   channel requests that no external channel is serving yet
+
+
+def shard(blocks: int, devices: int) -> List[Tuple[int, int]]:
+    # Splits blocks 0..blocks-1 into `devices` contiguous [first, end) ranges, as even as possible
+    base, extra = divmod(blocks, devices)
+    shards = []
+    first = 0
+    for device in range(devices):
+        end = first + base + (1 if device < extra else 0)
+        shards.append((first, end))
+        first = end
+    return shards
+
+
+class DeviceRun:
+    def __init__(self, device: int, first_block: int, end_block: int, threads: int):
+        self.device = device
+        self.first_block = first_block
+        self.end_block = end_block
+        self.threads = threads  # thread count launched on the device (up to the end of its shard)
+        self.done_at: Optional[int] = None
+
+    @property
+    def blocks(self) -> int:
+        return self.end_block - self.first_block
+
+    def __repr__(self):
+        return f"DeviceRun(device={self.device}, blocks={self.first_block}-{self.end_block - 1}, done_at={self.done_at})"
+
+
+class MultiDeviceRuntime:
+    def __init__(self, dut, program_memory: Memory, data_memory: Memory):
+        self.dut = dut
+        self.program_memory = program_memory
+        self.data_memory = data_memory
+        self.num_devices = int(dut.NUM_DEVICES.value)
+        self.shared = bool(int(dut.SHARED_DATA_MEM.value))
+        self.threads_per_block = int(dut.THREADS_PER_BLOCK.value)
+        self.device_rows = 2 ** int(dut.DATA_MEM_ADDR_BITS.value)
+        self.runs: List[DeviceRun] = []
+        self.initial: Optional[np.ndarray] = None
+        self.cycles = 0
+        self.contention = 0  # device channel requests left waiting, summed over cycles
+
+    def device_offset(self, device: int) -> int:
+        # Data memory row where the device's rows start
+        return 0 if self.shared else device * self.device_rows
+
+    async def launch(
+        self,
+        program: Sequence[int],
+        data: Sequence[int],
+        threads: int,
+        devices: Optional[int] = None,
+        grid_dim_x: int = 0,
+        params: Sequence[int] = (),
+    ) -> List[DeviceRun]:
+        # Resets every device, loads the memories and starts the launch sharded across the first
+        # `devices` devices (all of them by default)
+        devices = devices or self.num_devices
+        if not 0 < devices <= self.num_devices:
+            raise ValueError(f"Can't shard across {devices} devices, the top level has {self.num_devices}")
+        await reset(self.dut)
+
+        self.program_memory.load(program)
+        for device in range(1 if self.shared else devices):
+            self.data_memory.load(np.zeros(self.device_rows, dtype=self.data_memory.dtype), self.device_offset(device))
+            self.data_memory.load(data, self.device_offset(device))
+        self.initial = self.data_memory.view(0, self.device_rows).copy()
+
+        blocks = (threads + self.threads_per_block - 1) // self.threads_per_block
+        self.runs = []
+        for device, (first, end) in enumerate(shard(blocks, devices)):
+            if first == end:
+                continue
+            run = DeviceRun(device, first, end, min(threads, end * self.threads_per_block))
+            self.runs.append(run)
+            for address, value in descriptor_writes(run.threads, grid_dim_x, 0, params, first):
+                await self._write_dcr(1 << device, address, value)
+            logger.info(f"Device {device}: blocks {first}-{end - 1}")
+
+        # The rising edge of start enqueues the descriptor on every device at once
+        self.dut.start.value = sum(1 << run.device for run in self.runs)
+        self.cycles = 0
+        self.contention = 0
+        return self.runs
+
+    async def _write_dcr(self, devices: int, address: int, value: int):
+        self.dut.device_control_write_enable.value = devices
+        self.dut.device_control_address.value = address
+        self.dut.device_control_data.value = value
+        await RisingEdge(self.dut.clk)
+        self.dut.device_control_write_enable.value = 0
+
+    async def run(self, timeout: int = 100000) -> int:
+        # Runs until every launched device is done; returns the cycles until the last one finished
+        pending = {run.device: run for run in self.runs}
+        while pending:
+            self.data_memory.run()
+            self.program_memory.run()
+            if self.shared:
+                self._sample_contention()
+            await RisingEdge(self.dut.clk)
+            self.cycles += 1
+
+            done = read_value(self.dut.done) or 0
+            for device in [device for device in pending if done >> device & 1]:
+                pending.pop(device).done_at = self.cycles
+            if self.cycles > timeout:
+                raise RuntimeError(f"Timeout: devices {sorted(pending)} still running")
+        self.dut.start.value = 0
+        return self.cycles
+
+    def _sample_contention(self):
+        controller = self.dut.shared.shared_data_memory_controller
+        requests = (read_value(controller.consumer_read_valid) or 0) | (read_value(controller.consumer_write_valid) or 0)
+        serving = read_value(controller.channel_serving_consumer) or 0
+        self.contention += bin(requests & ~serving).count("1")
+
+    def merge(self) -> np.ndarray:
+        # The data memory image of the whole launch, as one device would have left it
+        if self.shared:
+            return self.data_memory.view(0, self.device_rows).copy()
+        merged = self.initial.copy()
+        written = np.zeros(self.device_rows, dtype=bool)
+        for run in self.runs:
+            rows = self.data_memory.view(self.device_offset(run.device), self.device_rows)
+            changed = rows != self.initial
+            conflicts = np.flatnonzero(changed & written & (rows != merged))
+            if len(conflicts):
+                raise RuntimeError(f"Device {run.device} and an earlier device both wrote rows {conflicts.tolist()}")
+            merged[changed] = rows[changed]
+            written |= changed
+        return merged
+
+    def log_summary(self):
+        logger.info("\nMULTI-DEVICE RUN")
+        for run in self.runs:
+            logger.info(f"Device {run.device}: {run.blocks} blocks, done at cycle {run.done_at}")
+        logger.info(f"All devices done in {self.cycles} cycles")
+        if self.shared and self.cycles:
+            logger.info(f"Shared memory contention: {self.contention / self.cycles:.2f} waiting requests per cycle")
@@ -0,0 +1,425 @@
+from typing import Dict, List, Optional, Set, Union
+from .assembler import (
+    NUM_WRITABLE_REGISTERS,
+    SPECIAL_REGISTERS,
+    Statement,
+    branch_condition,
+    select_opcode,
+    split_operands,
+    _immediate,
+    _register,
+)
+
+# Optimizer passes for tiny-gpu assembly
+# > fold: constant propagation across the control flow graph, then CONST deduplication, constant
+#   folding and strength reduction (x*0, x*1, x*2 -> x+x, x/1, x+0, x-0, x-x)
+# > licm: hoists loop-invariant CONST/S2R/arithmetic out of straight-line loops, moving a value
+#   into a free register when its register is reused inside the loop
+# > dce: liveness-based removal of writes nobody reads (including CMPs whose NZP is never used)
+# > The ISA has no shifts, so divisions by powers of two stay as DIV; every ALU op takes the same
+#   number of cycles, so strength reduction pays off by freeing the constant's register and CONST
+# > Programs with numeric branch targets are returned unchanged
+
+ALU_OPS = {"ADD", "SUB", "MUL", "DIV"}
+HOISTABLE_OPS = ALU_OPS | {"CONST", "S2R"}
+PURE_OPS = HOISTABLE_OPS | {"LDR", "CMP", "SEL", "NOP"}
+DATA_MASK = 0xFF
+
+# Pseudo register for the NZP flags, so CMP -> BRnzp dependencies go through the same analyses
+NZP = 16
+
+SPECIAL_NAMES = {index: name for name, index in SPECIAL_REGISTERS.items()}
+
+
+class Unoptimizable(Exception):
+    pass
+
+
+class Label:
+    def __init__(self, name: str, statement: Statement):
+        self.name = name
+        self.statement = statement
+
+    def to_statement(self) -> Statement:
+        return self.statement
+
+
+class Instruction:
+    def __init__(
+        self,
+        op: str,
+        rd: Optional[int] = None,
+        rs: Optional[int] = None,
+        rt: Optional[int] = None,
+        imm: Optional[int] = None,
+        target: Optional[str] = None,
+        mnemonic: Optional[str] = None,
+        statement: Optional[Statement] = None,
+    ):
+        self.op = op
+        self.rd = rd
+        self.rs = rs
+        self.rt = rt
+        self.imm = imm
+        self.target = target
+        self.mnemonic = mnemonic or op
+        self.statement = statement
+        self.original: Optional[str] = None  # render() as parsed; None for instructions the passes made up
+
+    @classmethod
+    def from_statement(cls, statement: Statement) -> "Instruction":
+        instruction = cls._parse(statement)
+        instruction.original = instruction.render()
+        return instruction
+
+    @classmethod
+    def _parse(cls, statement: Statement) -> "Instruction":
+        parts = split_operands(statement.text)
+        mnemonic, operands = parts[0], parts[1:]
+
+        if branch_condition(mnemonic) is not None:
+            if operands[0][0].isdigit() or operands[0].startswith("#"):
+                raise Unoptimizable(f"numeric branch target on line {statement.line_number}")
+            return cls("BR", target=operands[0], mnemonic=mnemonic, statement=statement)
+
+        registers = [_register(operand, writable=False) for operand in operands if operand[0] in "Rr"]
+        if select_opcode(mnemonic) is not None:
+            return cls("SEL", rd=registers[0], rs=registers[1], rt=registers[2], mnemonic=mnemonic, statement=statement)
+
+        op = mnemonic.upper()
+        if op in ALU_OPS:
+            return cls(op, rd=registers[0], rs=registers[1], rt=registers[2], statement=statement)
+        if op in ("CMP", "STR"):
+            return cls(op, rs=registers[0], rt=registers[1], statement=statement)
+        if op == "LDR":
+            return cls(op, rd=registers[0], rs=registers[1], statement=statement)
+        if op == "CONST":
+            return cls(op, rd=registers[0], imm=_immediate(operands[1]), statement=statement)
+        if op == "S2R":
+            return cls(op, rd=registers[0], imm=SPECIAL_REGISTERS[operands[1]], statement=statement)
+        return cls(op, statement=statement)
+
+    def defs(self) -> Set[int]:
+        if self.op == "CMP":
+            return {NZP}
+        return set() if self.rd is None else {self.rd}
+
+    def uses(self) -> Set[int]:
+        if self.op == "BR":
+            return {NZP}
+        if self.op == "SEL":
+            return {self.rs, self.rt, NZP}
+        return {r for r in (self.rs, self.rt) if r is not None}
+
+    def key(self):
+        # Identifies the value an invariant instruction computes
+        return (self.op, self.rs, self.rt, self.imm)
+
+    def replace(self, **fields) -> "Instruction":
+        instruction = Instruction(
+            self.op, self.rd, self.rs, self.rt, self.imm, self.target, self.mnemonic, self.statement
+        )
+        instruction.original = self.original
+        for name, value in fields.items():
+            setattr(instruction, name, value)
+        if "op" in fields:
+            instruction.mnemonic = fields["op"]
+        return instruction
+
+    def rename_uses(self, old: int, new: int):
+        if self.rs == old:
+            self.rs = new
+        if self.rt == old:
+            self.rt = new
+
+    def render(self) -> str:
+        if self.op in ALU_OPS:
+            return f"{self.op} R{self.rd}, R{self.rs}, R{self.rt}"
+        if self.op in ("CMP", "STR"):
+            return f"{self.op} R{self.rs}, R{self.rt}"
+        if self.op == "LDR":
+            return f"LDR R{self.rd}, R{self.rs}"
+        if self.op == "CONST":
+            return f"CONST R{self.rd}, #{self.imm}"
+        if self.op == "S2R":
+            return f"S2R R{self.rd}, {SPECIAL_NAMES[self.imm]}"
+        if self.op == "BR":
+            return f"{self.mnemonic} {self.target}"
+        if self.op == "SEL":
+            return f"{self.mnemonic} R{self.rd}, R{self.rs}, R{self.rt}"
+        return self.op
+
+    def to_statement(self) -> Statement:
+        text = self.render()
+        return Statement(self.statement.line_number, self.statement.raw, text=text, rewritten=text != self.original)
+
+    def __repr__(self):
+        return self.render()
+
+
+Item = Union[Label, Instruction]
+
+
+def evaluate(op: str, a: int, b: int) -> Optional[int]:
+    if op == "ADD":
+        return (a + b) & DATA_MASK
+    if op == "SUB":
+        return (a - b) & DATA_MASK
+    if op == "MUL":
+        return (a * b) & DATA_MASK
+    if op == "DIV":
+        return a // b if b else None
+    return None
+
+
+def successors(items: List[Item]) -> List[List[int]]:
+    labels = {item.name: i for i, item in enumerate(items) if isinstance(item, Label)}
+    result = []
+    for i, item in enumerate(items):
+        following = [i + 1] if i + 1 < len(items) else []
+        if isinstance(item, Instruction) and item.op == "RET":
+            result.append([])
+        elif isinstance(item, Instruction) and item.op == "BR":
+            # Even BRnzp falls through when no CMP has set the flags yet
+            result.append([labels[item.target]] + following)
+        else:
+            result.append(following)
+    return result
+
+
+def liveness(items: List[Item]) -> List[Set[int]]:
+    # Registers live on entry to each item
+    succ = successors(items)
+    live_in: List[Set[int]] = [set() for _ in items]
+    changed = True
+    while changed:
+        changed = False
+        for i in reversed(range(len(items))):
+            live_out = set().union(*(live_in[s] for s in succ[i]))
+            item = items[i]
+            if isinstance(item, Instruction):
+                new = item.uses() | (live_out - item.defs())
+            else:
+                new = live_out
+            if new != live_in[i]:
+                live_in[i] = new
+                changed = True
+    return live_in
+
+
+def live_out(items: List[Item], live_in: List[Set[int]]) -> List[Set[int]]:
+    return [set().union(*(live_in[s] for s in succ)) for succ in successors(items)]
+
+
+def transfer(item: Item, state: Dict[int, int]) -> Dict[int, int]:
+    if not isinstance(item, Instruction) or not item.defs():
+        return state
+    state = dict(state)
+    for register in item.defs():
+        state.pop(register, None)
+    if item.op == "CONST":
+        state[item.rd] = item.imm
+    elif item.op in ALU_OPS and item.rs in state and item.rt in state:
+        value = evaluate(item.op, state[item.rs], state[item.rt])
+        if value is not None:
+            state[item.rd] = value
+    elif item.op == "SEL" and item.rs in state and state.get(item.rs) == state.get(item.rt):
+        # Both sides hold the same constant, whichever way the condition goes
+        state[item.rd] = state[item.rs]
+    return state
+
+
+def constants(items: List[Item]) -> List[Optional[Dict[int, int]]]:
+    # Registers with a known constant value on entry to each item (None if unreachable)
+    succ = successors(items)
+    preds: List[List[int]] = [[] for _ in items]
+    for i, targets in enumerate(succ):
+        for target in targets:
+            preds[target].append(i)
+
+    state_in: List[Optional[Dict[int, int]]] = [None] * len(items)
+    state_out: List[Optional[Dict[int, int]]] = [None] * len(items)
+    changed = True
+    while changed:
+        changed = False
+        for i, item in enumerate(items):
+            incoming = [state_out[p] for p in preds[i] if state_out[p] is not None]
+            if i == 0:
+                incoming.append({})
+            if not incoming:
+                continue
+            merged = {r: v for r, v in incoming[0].items() if all(s.get(r) == v for s in incoming[1:])}
+            if merged != state_in[i] or state_out[i] is None:
+                state_in[i] = merged
+                state_out[i] = transfer(item, merged)
+                changed = True
+    return state_in
+
+
+def simplify(item: Instruction, known: Dict[int, int]) -> Optional[Instruction]:
+    # Returns the replacement for item (None to delete it), or item itself if nothing applies
+    if item.op == "CONST":
+        return None if known.get(item.rd) == item.imm else item
+    if item.op not in ALU_OPS:
+        return item
+
+    a, b = known.get(item.rs), known.get(item.rt)
+    if a is not None and b is not None:
+        value = evaluate(item.op, a, b)
+        if value is not None:
+            return None if known.get(item.rd) == value else item.replace(op="CONST", rs=None, rt=None, imm=value)
+
+    # x + 0, x - 0, x * 1, x / 1 in place are no-ops
+    identity = 1 if item.op in ("MUL", "DIV") else 0
+    if b == identity and item.rd == item.rs:
+        return None
+    if item.op in ("ADD", "MUL") and a == identity and item.rd == item.rt:
+        return None
+
+    if item.op == "SUB" and item.rs == item.rt:
+        return item.replace(op="CONST", rs=None, rt=None, imm=0)
+    if item.op == "MUL":
+        if a == 0 or b == 0:
+            return item.replace(op="CONST", rs=None, rt=None, imm=0)
+        if b == 2:
+            return item.replace(op="ADD", rt=item.rs)
+        if a == 2:
+            return item.replace(op="ADD", rs=item.rt)
+    return item
+
+
+def fold(items: List[Item]) -> bool:
+    known = constants(items)
+    result = []
+    changed = False
+    for item, state in zip(items, known):
+        if isinstance(item, Instruction) and state is not None:
+            replacement = simplify(item, state)
+            if replacement is not item:
+                changed = True
+                if replacement is not None:
+                    result.append(replacement)
+                continue
+        result.append(item)
+    items[:] = result
+    return changed
+
+
+def dce(items: List[Item]) -> bool:
+    live = live_out(items, liveness(items))
+    result = [
+        item for item, out in zip(items, live)
+        if not (isinstance(item, Instruction) and item.op in PURE_OPS and not (item.defs() & out))
+    ]
+    changed = len(result) != len(items)
+    items[:] = result
+    return changed
+
+
+def _hoist_loop(items: List[Item], header: int, end: int, live_at_header: Set[int], live_at_exit: Set[int]) -> bool:
+    body = items[header + 1:end + 1]
+    hoisted: List[Instruction] = []
+    values: Dict[tuple, int] = {}
+    claimed: Set[int] = set()
+
+    def defined_in_body(register: int) -> bool:
+        return any(register in item.defs() for item in body)
+
+    def referenced_in_body(register: int) -> bool:
+        return any(register in item.defs() | item.uses() for item in body)
+
+    def free_register() -> Optional[int]:
+        # Untouched by the loop and dead on entry to it, so nothing before or after needs its value
+        for register in range(NUM_WRITABLE_REGISTERS):
+            if register not in live_at_header and register not in claimed and not referenced_in_body(register):
+                return register
+        return None
+
+    progress = True
+    while progress:
+        progress = False
+        for k, item in enumerate(body):
+            if item.op not in HOISTABLE_OPS or any(defined_in_body(r) for r in item.uses()):
+                continue
+
+            d = item.rd
+            defs = [m for m, other in enumerate(body) if d in other.defs()]
+            used_before = any(d in body[m].uses() for m in range(k))
+
+            if len(defs) == 1 and not used_before and item.key() not in values:
+                values[item.key()] = d
+                claimed.add(d)
+                hoisted.append(item)
+                del body[k]
+                progress = True
+                break
+
+            # Otherwise move the value into its own register, if it dies before the register's next
+            # write (so nothing outside this stretch of the body sees it). That write can be further
+            # down the body, or before this one on the next iteration if the value is dead on exit
+            # and the start of the body doesn't read what was there before the loop
+            following = [m for m in defs if m > k]
+            if following:
+                stop = following[0]
+            elif d not in live_at_exit and not any(d in body[m].uses() for m in range(defs[0] + 1)):
+                stop = len(body) - 1
+            else:
+                continue
+            register = values.get(item.key())
+            if register is None:
+                register = free_register()
+                if register is None:
+                    continue
+                values[item.key()] = register
+                claimed.add(register)
+                hoisted.append(item.replace(rd=register))
+            for m in range(k + 1, stop + 1):
+                body[m] = body[m].replace()
+                body[m].rename_uses(d, register)
+            del body[k]
+            progress = True
+            break
+
+    if not hoisted:
+        return False
+    items[header:end + 1] = hoisted + [items[header]] + body
+    return True
+
+
+def licm(items: List[Item]) -> bool:
+    # Loops are a label followed by straight-line code ending in the only branch back to it
+    labels = {item.name: i for i, item in enumerate(items) if isinstance(item, Label)}
+    branches = [i for i, item in enumerate(items) if isinstance(item, Instruction) and item.op == "BR"]
+    references: Dict[str, int] = {}
+    for i in branches:
+        references[items[i].target] = references.get(items[i].target, 0) + 1
+
+    live_in = liveness(items)
+    for end in branches:
+        header = labels[items[end].target]
+        if header > end or references[items[end].target] != 1:
+            continue
+        body = items[header + 1:end]
+        if any(isinstance(item, Label) or item.op in ("BR", "RET") for item in body):
+            continue
+        live_at_exit = live_in[end + 1] if end + 1 < len(items) else set()
+        if _hoist_loop(items, header, end, live_in[header], live_at_exit):
+            return True
+    return False
+
+
+def optimize_statements(statements: List[Statement], max_rounds: int = 32) -> List[Statement]:
+    try:
+        items: List[Item] = [
+            Label(s.label, s) if s.label is not None else Instruction.from_statement(s) for s in statements
+        ]
+    except Unoptimizable:
+        return statements
+
+    for _ in range(max_rounds):
+        changed = fold(items)
+        changed |= licm(items)
+        changed |= dce(items)
+        if not changed:
+            break
+    return [item.to_statement() for item in items]
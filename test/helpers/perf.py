@@ -0,0 +1,50 @@
+from typing import Dict, List
+from .logger import logger
+
+PERF_COUNTERS = [
+    "perf_active_cycles",
+    "perf_handoff_cycles",
+    "perf_handoffs",
+    "perf_blocks_retired",
+    "perf_divergent_cycles",
+    "perf_divergences",
+]
+
+# Counters kept by the fetcher (only count on PREFETCH_DEPTH > 0 builds)
+FETCHER_COUNTERS = [
+    "perf_prefetch_hits",
+    "perf_prefetch_flushes",
+]
+
+def read_perf_counters(dut) -> List[Dict[str, int]]:
+    counters = []
+    for core in dut.cores:
+        scheduler = core.core_instance.scheduler_instance
+        fetcher = core.core_instance.fetcher_instance
+        counters.append({
+            **{name: int(getattr(scheduler, name).value) for name in PERF_COUNTERS},
+            **{name: int(getattr(fetcher, name).value) for name in FETCHER_COUNTERS},
+        })
+    return counters
+
+def log_perf_counters(dut):
+    logger.info("\nPERF COUNTERS")
+    for i, counters in enumerate(read_perf_counters(dut)):
+        blocks = counters["perf_blocks_retired"]
+        # Only blocks picked up from DONE have a handoff gap, not the first block after a reset
+        handoffs = counters["perf_handoffs"]
+        gap = counters["perf_handoff_cycles"] / handoffs if handoffs else 0
+        active = counters["perf_active_cycles"]
+        divergent = counters["perf_divergent_cycles"] / active if active else 0
+        logger.info(
+            f"Core {i}: active = {active}, "
+            f"handoff gap = {counters['perf_handoff_cycles']} ({gap:.1f} per handoff over {handoffs}), "
+            f"blocks = {blocks}, "
+            f"divergent = {counters['perf_divergent_cycles']} ({divergent:.1%} of active) "
+            f"over {counters['perf_divergences']} divergences"
+        )
+        if counters["perf_prefetch_hits"] or counters["perf_prefetch_flushes"]:
+            logger.info(
+                f"Core {i}: prefetch hits = {counters['perf_prefetch_hits']}, "
+                f"flushes = {counters['perf_prefetch_flushes']}"
+            )
@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional, Tuple
+from .assembler import Program
+from .cost import DONE, FETCH, IDLE, UPDATE, WAIT, InstructionCost
+from .logger import logger
+
+# PC-level cycle profiler
+# > Call sample(dut) once per cycle from the test loop (next to format_cycle). Every core that's
+#   working on a block charges the cycle to the instruction at its current_pc, split the same way as
+#   the estimates from test/helpers/cost.py: fetch (FETCH), wait (WAIT on data memory) and compute
+#   (the DECODE, REQUEST, EXECUTE and UPDATE stages)
+# > Samples are per core, so with several cores busy at once the line totals add up to more than
+#   the kernel's wall-clock cycles
+# > report() maps PCs back to source lines through the Program's line table, sorted hottest first,
+#   and sums each labelled region (loop bodies in practice) so hot loops stand out
+# > For an optimized kernel each row shows the instruction the optimizer emitted, not the source text:
+#   rows the optimizer rewrote are marked with * next to the line they came from, and instructions it
+#   removed have no PC, so they never show up
+
+
+class Profiler:
+    def __init__(self, program: Program, program_base: int = 0):
+        self.program = program
+        self.program_base = program_base
+        self.instructions: Dict[int, InstructionCost] = {}
+        self.cycles = 0
+        self.unmapped = 0  # Busy core cycles whose PC isn't part of the program
+
+    def sample(self, dut):
+        self.cycles += 1
+        for core in dut.cores:
+            core_state = core.core_instance.core_state.value
+            current_pc = core.core_instance.current_pc.value
+            if not core_state.is_resolvable or not current_pc.is_resolvable:
+                continue
+            state = int(core_state)
+            if state in (IDLE, DONE):
+                continue
+
+            pc = int(current_pc) - self.program_base
+            if not 0 <= pc < len(self.program):
+                self.unmapped += 1
+                continue
+            cost = self.instructions.setdefault(pc, InstructionCost(pc, self.program.code[pc] >> 12))
+            if state == FETCH:
+                cost.fetch += 1
+            elif state == WAIT:
+                cost.wait += 1
+            else:
+                cost.issue += 1
+                if state == UPDATE:
+                    cost.executions += 1
+
+    @property
+    def core_cycles(self) -> int:
+        return sum(cost.total for cost in self.instructions.values()) + self.unmapped
+
+    def regions(self) -> List[Tuple[str, int]]:
+        # (label, core cycles) for every labelled region, running from the label to the next one
+        starts = sorted((pc, label) for label, pc in self.program.labels.items())
+        regions = []
+        for index, (start, label) in enumerate(starts):
+            end = starts[index + 1][0] if index + 1 < len(starts) else len(self.program)
+            cycles = sum(cost.total for pc, cost in self.instructions.items() if start <= pc < end)
+            regions.append((label, cycles))
+        return regions
+
+    def report(self, limit: Optional[int] = None) -> List[str]:
+        total = self.core_cycles or 1
+        lines = [
+            f"Profiled {self.cycles} cycles, {self.core_cycles} core cycles",
+            f"{'line':>5}  {'source':<28} {'cycles':>7} {'share':>6} {'runs':>5} {'avg':>6} "
+            f"{'fetch':>6} {'wait':>6} {'compute':>7}",
+        ]
+        hottest = sorted(self.instructions.values(), key=lambda cost: (-cost.total, cost.pc))
+        rewritten = False
+        for cost in hottest[:limit]:
+            line = f"{self.program.lines[cost.pc]}{'*' if cost.pc in self.program.rewritten else ''}"
+            rewritten = rewritten or cost.pc in self.program.rewritten
+            text = self.program.instruction_text(cost.pc)
+            lines.append(
+                f"{line:>5}  {text[:28]:<28} {cost.total:>7} {cost.total / total:>6.1%} {cost.executions:>5} "
+                f"{cost.per_execution:>6.1f} {cost.fetch / cost.total:>6.0%} {cost.wait / cost.total:>6.0%} "
+                f"{cost.issue / cost.total:>7.0%}"
+            )
+        if rewritten:
+            lines.append("* rewritten by the optimizer; the line is the source instruction it came from")
+        for label, cycles in self.regions():
+            lines.append(f"{label}: {cycles} core cycles ({cycles / total:.1%})")
+        return lines
+
+    def log(self, limit: Optional[int] = None):
+        logger.info("\nPROFILE")
+        for line in self.report(limit):
+            logger.info(line)
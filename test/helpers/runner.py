@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+from . import builds
+
+# Cached simulator builds
+# > `make test_<name>` rebuilds from scratch on every run and only ever simulates gpu.sv's default
+#   parameters. This runner builds one compiled simulator per parameter set instead, passing the
+#   values as top-level parameter overrides (iverilog -P / verilator -G), so nothing in src/ is edited
+# > sv2v runs once per version of the sources: its output is kept in build/sim/sv2v-<hash>, where the
+#   hash covers every src/*.sv file. Each (simulator, parameters) build lives next to it in a directory
+#   keyed by the same hash plus the parameters, so repeat runs skip straight to simulation and any
+#   change to the sources gets a fresh build
+# > The simulator is Icarus by default; Verilator (compiled C++, much faster on long kernels) is used
+#   with --simulator verilator. Both run the same cocotb test modules through cocotb.runner
+# > Tests that size their Memory models by hand (channels=4, ...) only match builds that keep those
+#   parameters; NUM_CORES, THREADS_PER_BLOCK, QUEUE_DEPTH and PREFETCH_DEPTH can be changed freely
+# > Each test gets the top level and parameter overrides test/helpers/builds.py lists for it (the same
+#   table `make test_<name>` reads), with -P overrides on top, so tests that need different builds
+#   can be run together
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SOURCE_DIR = os.path.join(ROOT, "src")
+DEFAULT_BUILD_DIR = os.path.join(ROOT, "build", "sim")
+SIMULATORS = ("icarus", "verilator")
+
+# Bump whenever the build steps below change, so builds from older versions are ignored
+BUILD_VERSION = 2
+
+
+def default_parameters(source_dir: str = SOURCE_DIR, toplevel: str = builds.DEFAULT_TOPLEVEL) -> Dict[str, int]:
+    # The top-level module's parameters and their defaults, read from its source (e.g. gpu.sv)
+    with open(os.path.join(source_dir, f"{toplevel}.sv")) as f:
+        header = f.read().split(") (", 1)[0]
+    return {name: int(value) for name, value in re.findall(r"parameter\s+(\w+)\s*=\s*(\d+)", header)}
+
+
+def source_files(source_dir: str = SOURCE_DIR) -> List[str]:
+    return sorted(os.path.join(source_dir, name) for name in os.listdir(source_dir) if name.endswith(".sv"))
+
+
+def source_hash(source_dir: str = SOURCE_DIR) -> str:
+    digest = hashlib.sha256(f"build-v{BUILD_VERSION}\n".encode())
+    for path in source_files(source_dir):
+        digest.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def build_key(sources: str, simulator: str, parameters: Mapping[str, int], toplevel: str = builds.DEFAULT_TOPLEVEL) -> str:
+    options = json.dumps({"simulator": simulator, "toplevel": toplevel, "parameters": dict(sorted(parameters.items()))})
+    return hashlib.sha256(f"{sources}\n{options}".encode()).hexdigest()
+
+
+def resolve_parameters(
+    overrides: Mapping[str, int], source_dir: str = SOURCE_DIR, toplevel: str = builds.DEFAULT_TOPLEVEL
+) -> Dict[str, int]:
+    # Full parameter set for a build: the top level's defaults with the overrides applied
+    parameters = default_parameters(source_dir, toplevel)
+    unknown = sorted(set(overrides) - set(parameters))
+    if unknown:
+        raise ValueError(f"Unknown {toplevel} parameters: {', '.join(unknown)} (expected one of {', '.join(parameters)})")
+    parameters.update({name: int(value) for name, value in overrides.items()})
+    return parameters
+
+
+def translate(source_dir: str = SOURCE_DIR, build_dir: str = DEFAULT_BUILD_DIR) -> str:
+    # Runs sv2v over the sources once per source hash; returns the path of the Verilog it wrote
+    output_dir = os.path.join(build_dir, f"sv2v-{source_hash(source_dir)[:16]}")
+    output = os.path.join(output_dir, "gpu.v")  # Every module, whichever one is the top level
+    if os.path.exists(output):
+        return output
+
+    os.makedirs(output_dir, exist_ok=True)
+    # alu.sv is translated on its own, like `make compile_alu`, and appended after the rest
+    sources = source_files(source_dir)
+    alu = [path for path in sources if os.path.basename(path) == "alu.sv"]
+    rest = [path for path in sources if path not in alu]
+    verilog = subprocess.run(["sv2v", "-I", source_dir, *rest], check=True, capture_output=True, text=True).stdout
+    if alu:
+        verilog += "\n" + subprocess.run(["sv2v", *alu], check=True, capture_output=True, text=True).stdout
+
+    temp = f"{output}.{os.getpid()}.tmp"
+    with open(temp, "w") as f:
+        f.write("`timescale 1ns/1ns\n" + verilog)
+    os.replace(temp, output)
+    return output
+
+
+class Build:
+    def __init__(
+        self,
+        simulator: str,
+        parameters: Dict[str, int],
+        directory: str,
+        verilog: str,
+        toplevel: str = builds.DEFAULT_TOPLEVEL,
+    ):
+        self.simulator = simulator
+        self.toplevel = toplevel
+        self.parameters = parameters
+        self.directory = directory
+        self.verilog = verilog
+
+    @property
+    def cached(self) -> bool:
+        return os.path.exists(os.path.join(self.directory, "build.json"))
+
+    def _runner(self):
+        from cocotb.runner import get_runner
+
+        return get_runner(self.simulator)
+
+    def compile(self, force: bool = False):
+        if self.cached and not force:
+            return
+        build_args = []
+        if self.simulator == "verilator":
+            # sv2v's output trips plenty of lint warnings that don't matter for simulation
+            build_args = ["-Wno-fatal", "-Wno-lint", "-Wno-style"]
+        self._runner().build(
+            verilog_sources=[self.verilog],
+            hdl_toplevel=self.toplevel,
+            parameters=self.parameters,
+            build_args=build_args,
+            build_dir=self.directory,
+            always=True,
+            timescale=("1ns", "1ns"),
+        )
+        with open(os.path.join(self.directory, "build.json"), "w") as f:
+            json.dump(
+                {"simulator": self.simulator, "toplevel": self.toplevel, "parameters": self.parameters, "verilog": self.verilog},
+                f,
+            )
+
+    def test(
+        self,
+        module: str,
+        testcase: Optional[str] = None,
+        plusargs: Sequence[str] = (),
+        extra_env: Mapping[str, str] = {},
+    ) -> Tuple[int, int]:
+        # Runs a cocotb test module (e.g. test.test_matadd) from the repository root, so logs land
+        # in the same place as with `make test_<name>`; returns (tests run, tests failed)
+        from cocotb.runner import get_results
+
+        environment = {"PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+        environment.update(extra_env)
+        results = self._runner().test(
+            test_module=module,
+            hdl_toplevel=self.toplevel,
+            testcase=testcase,
+            plusargs=list(plusargs),
+            extra_env=environment,
+            build_dir=self.directory,
+            test_dir=ROOT,
+            results_xml=os.path.join(self.directory, "results.xml"),
+        )
+        return get_results(results)
+
+
+def get_build(
+    parameters: Mapping[str, int] = {},
+    simulator: str = "icarus",
+    build_dir: str = DEFAULT_BUILD_DIR,
+    source_dir: str = SOURCE_DIR,
+    force: bool = False,
+    toplevel: str = builds.DEFAULT_TOPLEVEL,
+) -> Build:
+    # Returns a compiled simulator for the given top level and parameter overrides, building it only
+    # if no build for the same sources, simulator, top level and parameters exists yet
+    if simulator not in SIMULATORS:
+        raise ValueError(f"Unknown simulator {simulator!r} (expected one of {', '.join(SIMULATORS)})")
+    parameters = resolve_parameters(parameters, source_dir, toplevel)
+    sources = source_hash(source_dir)
+    directory = os.path.join(build_dir, f"{simulator}-{build_key(sources, simulator, parameters, toplevel)[:16]}")
+    build = Build(simulator, parameters, directory, translate(source_dir, build_dir), toplevel)
+    build.compile(force)
+    return build
+
+
+def clean(build_dir: str = DEFAULT_BUILD_DIR, source_dir: str = SOURCE_DIR) -> List[str]:
+    # Removes builds made from older versions of the sources; returns the directories removed
+    if not os.path.isdir(build_dir):
+        return []
+    current = source_hash(source_dir)
+    keep = {f"sv2v-{current[:16]}"}
+    for name in os.listdir(build_dir):
+        manifest = os.path.join(build_dir, name, "build.json")
+        try:
+            with open(manifest) as f:
+                if os.path.dirname(json.load(f)["verilog"]).endswith(f"sv2v-{current[:16]}"):
+                    keep.add(name)
+        except (OSError, ValueError, KeyError):
+            pass
+    removed = [name for name in sorted(os.listdir(build_dir)) if name not in keep]
+    for name in removed:
+        shutil.rmtree(os.path.join(build_dir, name), ignore_errors=True)
+    return removed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run tiny-gpu cocotb tests on cached, parameterized builds")
+    parser.add_argument("tests", nargs="*", help="test names, e.g. matadd for test/test_matadd.py")
+    parser.add_argument(
+        "-P", "--param", type=builds.parse_parameter, action="append", default=[],
+        help="parameter override on top of the test's own (test/helpers/builds.py), e.g. NUM_CORES=4",
+    )
+    parser.add_argument("--simulator", choices=SIMULATORS, default=os.environ.get("SIM", "icarus"))
+    parser.add_argument("--testcase", help="only run this cocotb test function")
+    parser.add_argument("--rebuild", action="store_true", help="ignore any cached build")
+    parser.add_argument("--build-dir", default=DEFAULT_BUILD_DIR)
+    parser.add_argument("--clean", action="store_true", help="remove builds of older sources and exit")
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        for name in clean(args.build_dir):
+            print(f"Removed {name}")
+        return
+    if not args.tests:
+        parser.error("no tests given")
+
+    failed = 0
+    rebuilt = set()  # --rebuild builds each (top level, parameters) once, however many tests share it
+    for test in args.tests:
+        toplevel = builds.toplevel(test)
+        parameters = builds.parameters(test, dict(args.param))
+        key = (toplevel, tuple(sorted(parameters.items())))
+        build = get_build(
+            parameters, args.simulator, args.build_dir, force=args.rebuild and key not in rebuilt, toplevel=toplevel
+        )
+        rebuilt.add(key)
+        print(f"Using {build.simulator} {toplevel} build {os.path.relpath(build.directory, ROOT)}", file=sys.stderr)
+        failed += build.test(f"test.test_{test}", args.testcase)[1]
+    if failed:
+        sys.exit(f"{failed} test(s) failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import json
+import time
+from typing import List, Optional, Sequence, Union
+from cocotb.triggers import RisingEdge
+from .assembler import Program
+from .logger import logger
+from .memory import Memory
+from .model import GpuModel
+from .setup import setup
+
+# Multi-kernel sessions
+# > Runs a list of jobs (program, data, thread count, ...) one after another on the gpu the simulator
+#   already elaborated, so a regression suite of many small kernels pays for simulator startup,
+#   elaboration and cocotb imports once instead of once per make target
+# > Before every job the GPU is reset and both memories are cleared, so no job sees another's rows,
+#   descriptor or requests left in flight. Clearing a path-backed memory zeroes its file on disk, so
+#   a session only takes one with clear_files=True
+# > Each job's output rows are checked against its expected values, or against the functional model
+#   (test/helpers/model.py) when none are given
+# > A job that fails (result mismatch, timeout, model error) is recorded and the session moves on: the
+#   reset before the next job puts the GPU back in a known state
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        program: Union[Program, Sequence[int]],
+        data: Sequence[int],
+        threads: int,
+        output: int = 0,
+        expected: Optional[Sequence[int]] = None,
+        size: Optional[int] = None,
+        grid_dim_x: int = 0,
+        program_base: int = 0,
+        params: Sequence[int] = (),
+        timeout: int = 20000,
+    ):
+        self.name = name
+        self.program = list(program.code if isinstance(program, Program) else program)
+        self.data = list(data)
+        self.threads = threads
+        self.output = output  # First data memory row of the result
+        self.expected = None if expected is None else list(expected)
+        self.size = size if size is not None else (len(self.expected) if self.expected is not None else None)
+        self.grid_dim_x = grid_dim_x
+        self.program_base = program_base
+        self.params = list(params)
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"Job(name={self.name!r}, threads={self.threads}, instructions={len(self.program)})"
+
+
+class JobResult:
+    def __init__(
+        self,
+        name: str,
+        cycles: Optional[int],
+        output: List[int],
+        expected: Optional[List[int]],
+        wall_seconds: float,
+        error: Optional[str] = None,
+    ):
+        self.name = name
+        self.cycles = cycles
+        self.output = output
+        self.expected = expected
+        self.wall_seconds = wall_seconds
+        self.error = error
+
+    @property
+    def passed(self) -> bool:
+        return self.error is None and self.output == self.expected
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "passed": self.passed,
+            "cycles": self.cycles,
+            "output": self.output,
+            "expected": self.expected,
+            "wall_seconds": self.wall_seconds,
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"JobResult(name={self.name!r}, passed={self.passed}, cycles={self.cycles})"
+
+
+class Session:
+    def __init__(
+        self,
+        dut,
+        program_memory: Optional[Memory] = None,
+        data_memory: Optional[Memory] = None,
+        clear_files: bool = False,
+    ):
+        # The memories default to the build's own widths and channel counts
+        for memory in (program_memory, data_memory):
+            if memory is not None and memory.path is not None and not clear_files:
+                raise ValueError(
+                    f"The session clears {memory.name} memory before every job, which would zero {memory.path}; "
+                    "pass clear_files=True to allow it"
+                )
+        self.dut = dut
+        self.clear_files = clear_files
+        self.program_memory = program_memory or Memory(
+            dut=dut,
+            addr_bits=int(dut.PROGRAM_MEM_ADDR_BITS.value),
+            data_bits=int(dut.PROGRAM_MEM_DATA_BITS.value),
+            channels=int(dut.PROGRAM_MEM_NUM_CHANNELS.value),
+            name="program",
+        )
+        self.data_memory = data_memory or Memory(
+            dut=dut,
+            addr_bits=int(dut.DATA_MEM_ADDR_BITS.value),
+            data_bits=int(dut.DATA_MEM_DATA_BITS.value),
+            channels=int(dut.DATA_MEM_NUM_CHANNELS.value),
+            name="data",
+        )
+        self.threads_per_block = int(dut.THREADS_PER_BLOCK.value)
+        self.results: List[JobResult] = []
+
+    def _expected(self, job: Job, size: int) -> List[int]:
+        if job.expected is not None:
+            return job.expected
+        model = GpuModel(
+            job.program,
+            job.data,
+            self.threads_per_block,
+            job.program_base,
+            job.grid_dim_x,
+            job.params,
+            memory_size=len(self.data_memory.memory),
+        )
+        model.run(job.threads)
+        return model.memory[job.output:job.output + size].tolist()
+
+    async def run_job(self, job: Job) -> JobResult:
+        wall_start = time.perf_counter()
+        size = job.size if job.size is not None else len(self.data_memory.memory) - job.output
+        cycles = None
+        output: List[int] = []
+        expected = None
+        error = None
+        try:
+            expected = self._expected(job, size)
+
+            self.program_memory.clear(self.clear_files)
+            self.data_memory.clear(self.clear_files)
+            await setup(
+                dut=self.dut,
+                program_memory=self.program_memory,
+                program=job.program,
+                data_memory=self.data_memory,
+                data=job.data,
+                threads=job.threads,
+                grid_dim_x=job.grid_dim_x,
+                program_base=job.program_base,
+                params=job.params,
+            )
+
+            cycles = 0
+            while self.dut.done.value != 1:
+                self.data_memory.run()
+                self.program_memory.run()
+                await RisingEdge(self.dut.clk)
+                cycles += 1
+
+                if cycles > job.timeout:
+                    raise RuntimeError(f"Timeout after {job.timeout} cycles")
+
+            output = self.data_memory.view(job.output, size).tolist()
+            if output != expected:
+                error = "Result mismatch"
+        except (RuntimeError, ValueError, IndexError) as e:
+            error = str(e)
+        finally:
+            self.dut.start.value = 0
+
+        result = JobResult(job.name, cycles, output, expected, time.perf_counter() - wall_start, error)
+        self.results.append(result)
+        status = "passed" if result.passed else f"FAILED ({error})"
+        logger.info(f"Job {job.name}: {status}, {cycles} cycles")
+        return result
+
+    async def run(self, jobs: Sequence[Job]) -> List[JobResult]:
+        # Runs the jobs in order; returns their results (also kept in self.results)
+        return [await self.run_job(job) for job in jobs]
+
+    def log_summary(self):
+        logger.info("\nSESSION")
+        for result in self.results:
+            cycles = "-" if result.cycles is None else result.cycles
+            status = "ok" if result.passed else f"FAILED: {result.error}"
+            logger.info(f"{result.name:<24} {cycles:>7} cycles  {result.wall_seconds:6.2f} s  {status}")
+        passed = sum(result.passed for result in self.results)
+        logger.info(f"{passed}/{len(self.results)} jobs passed")
+
+    def save(self, path: str):
+        # Per-job records as JSON, e.g. to compare regression runs
+        with open(path, "w") as f:
+            json.dump([result.to_json() for result in self.results], f, indent=2)
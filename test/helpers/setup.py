@@ -1,10 +1,76 @@
-from typing import List
+from typing import Dict, List, Sequence
 import cocotb
 from cocotb.clock import Clock
+from cocotb.task import Task
 from cocotb.triggers import RisingEdge
 from .memory import Memory
 
-_clock_started = False   # <-- IMPORTANT
+# Clock task per top level. cocotb kills every task a test started when the test ends, so each test
+# in a module (or each session) needs its clock started again rather than once per process
+_clocks: Dict[str, Task] = {}
+
+# Device control register addresses (see src/dcr.sv)
+DCR_THREAD_COUNT_LO = 0
+DCR_THREAD_COUNT_HI = 1
+DCR_GRID_DIM_X = 2
+DCR_PROGRAM_BASE = 3
+DCR_PARAM0 = 4
+NUM_PARAMS = 4
+DCR_FIRST_BLOCK_X = 8
+DCR_FIRST_BLOCK_Y = 9
+
+
+# DCR (address, value) writes describing one kernel launch
+# > first_block is the linear index (row by row) of the first block to run; blocks before it are
+#   treated as already done, which is how a kernel resumes from a checkpoint
+def descriptor_writes(
+    threads: int,
+    grid_dim_x: int = 0,
+    program_base: int = 0,
+    params: Sequence[int] = (),
+    first_block: int = 0,
+):
+    if len(params) > NUM_PARAMS:
+        raise ValueError(f"At most {NUM_PARAMS} kernel parameters are supported, got {len(params)}")
+    params = list(params) + [0] * (NUM_PARAMS - len(params))
+    first_block_y, first_block_x = divmod(first_block, grid_dim_x or 256)
+    if first_block < 0 or first_block_y > 0xFF:
+        raise ValueError(f"First block {first_block} is outside the grid")
+    writes = [
+        (DCR_THREAD_COUNT_LO, threads & 0xFF),
+        (DCR_THREAD_COUNT_HI, (threads >> 8) & 0xFF),
+        (DCR_GRID_DIM_X, grid_dim_x),
+        (DCR_PROGRAM_BASE, program_base),
+    ]
+    writes += [(DCR_PARAM0 + i, param) for i, param in enumerate(params)]
+    writes += [(DCR_FIRST_BLOCK_X, first_block_x), (DCR_FIRST_BLOCK_Y, first_block_y)]
+    return writes
+
+
+async def write_dcr(dut, address: int, value: int):
+    dut.device_control_write_enable.value = 1
+    dut.device_control_address.value = address
+    dut.device_control_data.value = value
+    await RisingEdge(dut.clk)
+    dut.device_control_write_enable.value = 0
+
+
+def start_clock(dut):
+    # Starts the clock unless it's already running for the current test
+    task = _clocks.get(dut._path)
+    if task is None or task.done():
+        _clocks[dut._path] = cocotb.start_soon(Clock(dut.clk, 25, units="us").start())
+
+
+async def reset(dut):
+    start_clock(dut)
+
+    dut.start.value = 0
+    dut.device_control_write_enable.value = 0
+    dut.reset.value = 1
+    await RisingEdge(dut.clk)
+    dut.reset.value = 0
+    await RisingEdge(dut.clk)
 
 
 async def setup(
@@ -14,25 +80,15 @@ async def setup(
     data_memory: Memory,
     data: List[int],
     threads: int,
-    block_idx=0,
+    grid_dim_x: int = 0,
+    program_base: int = 0,
+    params: Sequence[int] = (),
+    first_block: int = 0,
 ):
-    global _clock_started
-
-    # -------------------------------------------------
-    # Start clock ONCE
-    # -------------------------------------------------
-    if not _clock_started:
-        clock = Clock(dut.clk, 25, units="us")
-        cocotb.start_soon(clock.start())
-        _clock_started = True
-
     # -------------------------------------------------
     # Reset ONCE
     # -------------------------------------------------
-    dut.reset.value = 1
-    await RisingEdge(dut.clk)
-    dut.reset.value = 0
-    await RisingEdge(dut.clk)
+    await reset(dut)
 
     # -------------------------------------------------
     # Load memories ONCE
@@ -41,17 +97,12 @@ async def setup(
     data_memory.load(data)
 
     # -------------------------------------------------
-    # Write blockDim (threads per block)
+    # Write the kernel descriptor (thread count, grid width, program base, params, first block)
     # -------------------------------------------------
-    dut.device_control_write_enable.value = 1
-    dut.device_control_data.value = threads
-    await RisingEdge(dut.clk)
-    dut.device_control_write_enable.value = 0
+    for address, value in descriptor_writes(threads, grid_dim_x, program_base, params, first_block):
+        await write_dcr(dut, address, value)
 
     # -------------------------------------------------
-    # Write initial blockIdx (usually 0)
+    # Launch the kernel (the rising edge of start enqueues it)
     # -------------------------------------------------
-    dut.device_control_write_enable.value = 1
-    dut.device_control_data.value = block_idx
-    await RisingEdge(dut.clk)
-    dut.device_control_write_enable.value = 0
+    dut.start.value = 1
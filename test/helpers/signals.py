@@ -0,0 +1,15 @@
+from typing import Optional
+
+
+def read_value(handle, index: Optional[int] = None, width: int = 1) -> Optional[int]:
+    # Reads a signal, or one element of an array that sv2v may have flattened into a packed vector
+    # (element 0 in the low bits), returning None while it holds x/z
+    if index is not None:
+        try:
+            handle = handle[index]
+        except (IndexError, TypeError):
+            bits = str(handle.value)
+            field = bits[len(bits) - (index + 1) * width:len(bits) - index * width]
+            return int(field, 2) if field and set(field) <= {"0", "1"} else None
+    value = handle.value
+    return int(value) if value.is_resolvable else None
@@ -0,0 +1,112 @@
+import time
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+from .memory import Memory
+from .command_queue import CommandQueue
+from .logger import logger
+
+# Streaming tiled image pipeline
+# > Cuts an image of any size into tiles that fit in half of data memory and double-buffers them:
+#   while the kernel for tile N runs on one half, tile N+1 is loaded into the other half and queued
+# > Each half holds a tile's RGB pixels followed by its output pixels, and the kernel gets both base
+#   addresses as %param0 (input) and %param1 (output)
+# > Results are copied into a memory-mapped .npy output as soon as each tile's kernel finishes, so
+#   neither the input nor the output has to fit in host memory as a whole
+class TiledImagePipeline:
+    def __init__(
+        self,
+        dut,
+        program_memory: Memory,
+        data_memory: Memory,
+        program: List[int],
+        program_base: int = 0,
+        channels_in: int = 3,
+    ):
+        self.dut = dut
+        self.program_memory = program_memory
+        self.data_memory = data_memory
+        self.program = program
+        self.program_base = program_base
+        self.channels_in = channels_in
+
+        self.threads_per_block = int(dut.THREADS_PER_BLOCK.value)
+
+        # Each half of data memory holds channels_in input bytes + 1 output byte per pixel. The tile
+        # capacity is rounded down to whole blocks, and partial tiles are padded up to whole blocks
+        self.half_size = len(data_memory.memory) // 2
+        capacity = self.half_size // (channels_in + 1)
+        self.tile_pixels = capacity - capacity % self.threads_per_block
+        if self.tile_pixels == 0:
+            raise ValueError(f"Data memory of {len(data_memory.memory)} rows is too small for a single block per tile")
+
+    def tiles(self, height: int, width: int) -> Iterator[Tuple[int, int, int, int]]:
+        tile_w = min(width, self.tile_pixels)
+        tile_h = max(1, self.tile_pixels // tile_w)
+        for y0 in range(0, height, tile_h):
+            for x0 in range(0, width, tile_w):
+                yield y0, min(y0 + tile_h, height), x0, min(x0 + tile_w, width)
+
+    def _load_tile(self, image: np.ndarray, tile: Tuple[int, int, int, int], half: int) -> int:
+        y0, y1, x0, x1 = tile
+        pixels = (y1 - y0) * (x1 - x0)
+        padded = pixels + (-pixels) % self.threads_per_block
+
+        base = half * self.half_size
+        rgb = np.zeros(padded * self.channels_in, dtype=np.uint8)
+        rgb[:pixels * self.channels_in] = np.asarray(image[y0:y1, x0:x1]).reshape(-1)
+        self.data_memory.load_array(base, rgb)
+        return padded
+
+    def _store_tile(self, output: np.ndarray, tile: Tuple[int, int, int, int], half: int):
+        y0, y1, x0, x1 = tile
+        pixels = (y1 - y0) * (x1 - x0)
+        out_base = half * self.half_size + self.tile_pixels * self.channels_in
+        output[y0:y1, x0:x1] = self.data_memory.view(out_base, (y1 - y0, x1 - x0))
+
+    async def _enqueue(self, queue: CommandQueue, threads: int, half: int):
+        in_base = half * self.half_size
+        out_base = in_base + self.tile_pixels * self.channels_in
+        return await queue.enqueue(threads, program_base=self.program_base, params=[in_base, out_base])
+
+    async def run(self, image: np.ndarray, output_path: str) -> Dict[str, float]:
+        height, width = image.shape[:2]
+        output = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.uint8, shape=(height, width))
+
+        self.program_memory.load(self.program, offset=self.program_base)
+        queue = CommandQueue(self.dut, self.program_memory, self.data_memory)
+
+        tiles = list(self.tiles(height, width))
+        wall_start = time.perf_counter()
+        cycle_start = queue.cycles
+
+        threads = self._load_tile(image, tiles[0], half=0)
+        kernels = [await self._enqueue(queue, threads, half=0)]
+
+        for n, tile in enumerate(tiles):
+            # Fill the idle half with the next tile and queue it behind the one that's running
+            if n + 1 < len(tiles):
+                half = (n + 1) % 2
+                threads = self._load_tile(image, tiles[n + 1], half)
+                kernels.append(await self._enqueue(queue, threads, half))
+
+            await queue.wait(kernels[n])
+            self._store_tile(output, tile, n % 2)
+
+        output.flush()
+
+        wall_seconds = time.perf_counter() - wall_start
+        cycles = queue.cycles - cycle_start
+        pixels = height * width
+        stats = {
+            "pixels": pixels,
+            "tiles": len(tiles),
+            "cycles": cycles,
+            "wall_seconds": wall_seconds,
+            "pixels_per_cycle": pixels / cycles if cycles else 0.0,
+            "pixels_per_second": pixels / wall_seconds if wall_seconds else 0.0,
+        }
+        logger.info(
+            f"Streamed {pixels} pixels in {len(tiles)} tiles: {cycles} cycles, {wall_seconds:.2f} s, "
+            f"{stats['pixels_per_cycle']:.4f} pixels/cycle, {stats['pixels_per_second']:.1f} pixels/s"
+        )
+        return stats
@@ -0,0 +1,152 @@
+import json
+from typing import Dict, List, Optional, Tuple
+from .cost import HardwareConfig, config_from_dut
+from .format import format_core_state, format_fetcher_state, format_lsu_state, format_memory_controller_state
+from .signals import read_value
+
+# Chrome trace-event export
+# > Call sample(dut, cycle) once per cycle from the test loop, then export(path) to write a JSON file
+#   that chrome://tracing or ui.perfetto.dev can open
+# > Every state machine gets its own track: each core has a scheduler track (annotated with the
+#   block it's running and the PC), a fetcher track and one track per thread's LSU, and each memory
+#   controller has one track per channel (annotated with the consumer it's serving)
+# > A span runs for as long as a track's state and annotations stay the same; IDLE isn't drawn
+# > One cycle is drawn as one microsecond
+# > Core, thread and channel counts come from the config passed in, or else from the parameters of the
+#   dut handed to the first sample, so non-default builds get all their tracks
+
+IDLE = 0
+
+
+class _Track:
+    def __init__(self, pid: int, tid: int, name: str):
+        self.pid = pid
+        self.tid = tid
+        self.name = name
+        self.current: Optional[Tuple[str, Tuple]] = None
+        self.start = 0
+
+
+class TraceRecorder:
+    def __init__(self, config: Optional[HardwareConfig] = None):
+        self.config = config
+        self.events: List[Dict] = []
+        self.tracks: Dict[Tuple[int, int], _Track] = {}
+        self.cycle = 0
+
+    def _track(self, pid: int, tid: int, process: str, name: str) -> _Track:
+        key = (pid, tid)
+        if key not in self.tracks:
+            if not any(track.pid == pid for track in self.tracks.values()):
+                self.events.append({"ph": "M", "name": "process_name", "pid": pid, "args": {"name": process}})
+                self.events.append({"ph": "M", "name": "process_sort_index", "pid": pid, "args": {"sort_index": pid}})
+            self.events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}})
+            self.events.append({"ph": "M", "name": "thread_sort_index", "pid": pid, "tid": tid, "args": {"sort_index": tid}})
+            self.tracks[key] = _Track(pid, tid, name)
+        return self.tracks[key]
+
+    def _close(self, track: _Track, cycle: int):
+        if track.current is None:
+            return
+        name, args = track.current
+        self.events.append({
+            "ph": "X",
+            "name": name,
+            "cat": track.name,
+            "pid": track.pid,
+            "tid": track.tid,
+            "ts": track.start,
+            "dur": cycle - track.start,
+            "args": dict(args),
+        })
+        track.current = None
+
+    def _set(self, track: _Track, cycle: int, name: Optional[str], args: Tuple = ()):
+        state = (name, args) if name is not None else None
+        if state == track.current:
+            return
+        self._close(track, cycle)
+        if state is not None:
+            track.current = state
+            track.start = cycle
+
+    def sample(self, dut, cycle: int):
+        self.cycle = cycle
+        if self.config is None:
+            self.config = config_from_dut(dut)
+        config = self.config
+        threads = config.threads_per_block
+
+        for core in dut.cores:
+            index = int(core.i.value)
+            instance = core.core_instance
+            pid = index + 1
+            process = f"Core {index}"
+
+            state = read_value(instance.core_state)
+            block = (
+                ("block", (read_value(instance.block_id), read_value(instance.block_id_y))),
+                ("pc", read_value(instance.current_pc)),
+            )
+            self._set(
+                self._track(pid, 0, process, "Scheduler"),
+                cycle,
+                format_core_state(f"{state:03b}") if state not in (None, IDLE) else None,
+                block,
+            )
+
+            fetcher = read_value(instance.fetcher_state)
+            self._set(
+                self._track(pid, 1, process, "Fetcher"),
+                cycle,
+                format_fetcher_state(f"{fetcher:03b}") if fetcher not in (None, IDLE) else None,
+            )
+
+            for thread in instance.threads:
+                j = int(thread.i.value)
+                lsu = read_value(thread.lsu_instance.lsu_state)
+                self._set(
+                    self._track(pid, 2 + j, process, f"LSU {j}"),
+                    cycle,
+                    format_lsu_state(f"{lsu:02b}") if lsu not in (None, IDLE) else None,
+                )
+
+        controllers = [
+            (
+                dut.data_memory_controller,
+                "Data memory controller",
+                config.data_mem_num_channels,
+                config.num_cores * threads,
+                lambda c: f"core {c // threads} thread {c % threads}",
+            ),
+            (
+                dut.program_memory_controller,
+                "Program memory controller",
+                config.program_mem_num_channels,
+                config.num_cores,
+                lambda c: f"core {c}",
+            ),
+        ]
+        for offset, (controller, process, channels, consumers, consumer_name) in enumerate(controllers):
+            pid = config.num_cores + 1 + offset
+            consumer_bits = max(1, (consumers - 1).bit_length())
+            for channel in range(channels):
+                state = read_value(controller.controller_state, channel, 3)
+                consumer = read_value(controller.current_consumer, channel, consumer_bits)
+                self._set(
+                    self._track(pid, channel, process, f"Channel {channel}"),
+                    cycle,
+                    format_memory_controller_state(f"{state:03b}") if state not in (None, IDLE) else None,
+                    (("consumer", consumer_name(consumer) if consumer is not None else None),),
+                )
+
+    def finish(self, cycle: Optional[int] = None):
+        # Ends every open span at the given cycle (by default one past the last sample)
+        cycle = self.cycle + 1 if cycle is None else cycle
+        for track in self.tracks.values():
+            self._close(track, cycle)
+
+    def export(self, path: str):
+        self.finish()
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ns"}, f)
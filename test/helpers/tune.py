@@ -0,0 +1,325 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence
+from .assembler import Program, assemble_program
+from .cost import HardwareConfig, estimate
+from .runner import DEFAULT_BUILD_DIR, get_build, resolve_parameters, source_hash
+
+# Launch-configuration auto-tuner
+# > A tunable kernel has one or more data layouts (e.g. AoS vs SoA pixels for grayscale), each of
+#   which builds a Launch for a given problem size: the program, the input data and the expected
+#   output
+# > Every combination of layout, THREADS_PER_BLOCK, NUM_CORES and DATA_MEM_NUM_CHANNELS is screened
+#   with the cycle-cost estimator (test/helpers/cost.py), which takes milliseconds per candidate.
+#   The best few are then confirmed on the RTL through cached simulator builds (test/helpers/runner.py),
+#   running test/test_tune.py with the candidate passed in TINY_GPU_TUNE_CANDIDATE
+# > With --prebuilt, only hardware configs that already have a cached build are considered, so
+#   confirming doesn't have to compile anything. A build only counts if all its other parameters are
+#   the defaults a candidate resolves to (a sim_banked or sim_prefetch build doesn't)
+# > `python -m test.helpers.tune grayscale --size 64 --confirm 3` prints the best config and the
+#   ranked table of predicted (and measured) cycles
+
+# THREADS_PER_BLOCK=1 would leave the memory controllers with a zero-width consumer index
+THREADS_PER_BLOCK = (2, 4, 8, 16)
+NUM_CORES = (1, 2, 4)
+DATA_MEM_NUM_CHANNELS = (1, 2, 4, 8)
+
+
+class Launch:
+    def __init__(
+        self,
+        program: Program,
+        data: Sequence[int],
+        threads: int,
+        output: int,
+        expected: Sequence[int],
+        params: Sequence[int] = (),
+    ):
+        self.program = program
+        self.data = list(data)
+        self.threads = threads
+        self.output = output  # data memory address of the first output row
+        self.expected = list(expected)
+        self.params = list(params)
+
+
+class TunableKernel:
+    def __init__(self, name: str, layouts: Dict[str, Callable[[int], Launch]], default_size: int):
+        self.name = name
+        self.layouts = layouts
+        self.default_size = default_size
+
+
+def _pixels(size: int) -> List[List[int]]:
+    # 4 rows per pixel (r, g, b and gray) have to fit in the 256-row data memory
+    if not 0 < size <= 64:
+        raise ValueError(f"Grayscale supports 1 to 64 pixels, got {size}")
+    return [[(37 * i + 11) % 256, (91 * i + 7) % 256, (53 * i + 200) % 256] for i in range(size)]
+
+
+def _gray(pixel: Sequence[int]) -> int:
+    r, g, b = pixel
+    return (r // 4 + g // 2 + b // 8) & 0xFF
+
+
+GRAYSCALE_SHADE = """
+CONST R7, #4
+DIV R4, R4, R7
+CONST R7, #2
+DIV R5, R5, R7
+CONST R7, #8
+DIV R6, R6, R7
+ADD R4, R4, R5
+ADD R4, R4, R6
+"""
+
+
+def grayscale_aos(size: int) -> Launch:
+    # Pixels stored as r, g, b triples; gray[i] follows them at 3 * size
+    source = f"""
+MUL R0, R13, R14
+ADD R0, R0, R15
+ADD R3, R0, R0
+ADD R3, R3, R0          ; 3i
+LDR R4, R3
+CONST R7, #1
+ADD R3, R3, R7
+LDR R5, R3
+ADD R3, R3, R7
+LDR R6, R3
+{GRAYSCALE_SHADE}
+CONST R2, #{3 * size}
+ADD R2, R2, R0
+STR R2, R4
+RET
+"""
+    pixels = _pixels(size)
+    data = [channel for pixel in pixels for channel in pixel]
+    program = assemble_program(source, name="grayscale_aos")
+    return Launch(program, data, size, 3 * size, [_gray(pixel) for pixel in pixels])
+
+
+def grayscale_soa(size: int) -> Launch:
+    # Pixels stored as three planes (all r, then all g, then all b); gray[i] follows at 3 * size
+    source = f"""
+MUL R0, R13, R14
+ADD R0, R0, R15
+CONST R1, #{size}
+LDR R4, R0
+ADD R3, R0, R1
+LDR R5, R3
+ADD R3, R3, R1
+LDR R6, R3
+{GRAYSCALE_SHADE}
+ADD R3, R3, R1
+STR R3, R4
+RET
+"""
+    pixels = _pixels(size)
+    data = [pixel[channel] for channel in range(3) for pixel in pixels]
+    program = assemble_program(source, name="grayscale_soa")
+    return Launch(program, data, size, 3 * size, [_gray(pixel) for pixel in pixels])
+
+
+KERNELS = {
+    "grayscale": TunableKernel("grayscale", {"aos": grayscale_aos, "soa": grayscale_soa}, 32),
+}
+
+
+class Candidate:
+    def __init__(self, kernel: str, layout: str, size: int, config: HardwareConfig):
+        self.kernel = kernel
+        self.layout = layout
+        self.size = size
+        self.config = config
+        self.predicted: Optional[int] = None
+        self.measured: Optional[int] = None
+
+    @property
+    def parameters(self) -> Dict[str, int]:
+        # gpu.sv parameter overrides for this candidate's build
+        return {
+            "NUM_CORES": self.config.num_cores,
+            "THREADS_PER_BLOCK": self.config.threads_per_block,
+            "DATA_MEM_NUM_CHANNELS": self.config.data_mem_num_channels,
+        }
+
+    @property
+    def cost(self):
+        # Ties go to the smaller hardware config
+        config = self.config
+        return (self.cycles, config.num_cores * config.threads_per_block, config.data_mem_num_channels)
+
+    @property
+    def cycles(self) -> int:
+        # Measured cycles once confirmed, the prediction otherwise
+        return self.measured if self.measured is not None else self.predicted
+
+    def launch(self) -> Launch:
+        return KERNELS[self.kernel].layouts[self.layout](self.size)
+
+    def to_json(self) -> dict:
+        return {"kernel": self.kernel, "layout": self.layout, "size": self.size, "parameters": self.parameters}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Candidate":
+        parameters = data["parameters"]
+        config = HardwareConfig(
+            num_cores=parameters["NUM_CORES"],
+            threads_per_block=parameters["THREADS_PER_BLOCK"],
+            data_mem_num_channels=parameters["DATA_MEM_NUM_CHANNELS"],
+        )
+        return cls(data["kernel"], data["layout"], data["size"], config)
+
+    def __repr__(self):
+        return f"Candidate({self.kernel}/{self.layout}, {self.parameters}, predicted={self.predicted}, measured={self.measured})"
+
+
+def candidates(
+    kernel: str,
+    size: int,
+    layouts: Optional[Sequence[str]] = None,
+    threads_per_block: Sequence[int] = THREADS_PER_BLOCK,
+    num_cores: Sequence[int] = NUM_CORES,
+    data_channels: Sequence[int] = DATA_MEM_NUM_CHANNELS,
+) -> List[Candidate]:
+    layouts = layouts or list(KERNELS[kernel].layouts)
+    return [
+        Candidate(kernel, layout, size, HardwareConfig(cores, threads, channels))
+        for layout, threads, cores, channels in itertools.product(layouts, threads_per_block, num_cores, data_channels)
+    ]
+
+
+def prebuilt_configs(build_dir: Optional[str] = None, simulator: str = "icarus") -> List[Dict[str, int]]:
+    # Full parameter sets of every cached gpu build of the current sources for the simulator
+    build_dir = build_dir or DEFAULT_BUILD_DIR
+    current = f"sv2v-{source_hash()[:16]}"
+    configs = []
+    for name in sorted(os.listdir(build_dir)) if os.path.isdir(build_dir) else []:
+        try:
+            with open(os.path.join(build_dir, name, "build.json")) as f:
+                build = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if (
+            os.path.basename(os.path.dirname(build["verilog"])) == current
+            and build.get("toplevel", "gpu") == "gpu"
+            and build.get("simulator") == simulator
+        ):
+            configs.append(build["parameters"])
+    return configs
+
+
+def screen(candidates: List[Candidate]) -> List[Candidate]:
+    # Predicts every candidate with the cost estimator; returns them fastest first
+    launches = {}
+    for candidate in candidates:
+        key = (candidate.layout, candidate.size)
+        if key not in launches:
+            launches[key] = candidate.launch()
+        launch = launches[key]
+        report = estimate(launch.program, launch.threads, candidate.config, launch.data, params=launch.params)
+        candidate.predicted = report.cycles
+    return sorted(candidates, key=lambda candidate: candidate.cost)
+
+
+def confirm(candidates: List[Candidate], simulator: str = "icarus", build_dir: Optional[str] = None) -> List[Candidate]:
+    # Measures each candidate on the RTL (building any missing configs); returns them fastest first
+    for candidate in candidates:
+        build = get_build(candidate.parameters, simulator, build_dir or DEFAULT_BUILD_DIR)
+        with tempfile.TemporaryDirectory() as directory:
+            result = os.path.join(directory, "result.json")
+            environment = {
+                "TINY_GPU_TUNE_CANDIDATE": json.dumps(candidate.to_json()),
+                "TINY_GPU_TUNE_RESULT": result,
+            }
+            _, failed = build.test("test.test_tune", extra_env=environment)
+            if failed:
+                raise RuntimeError(f"{candidate} failed on the RTL")
+            with open(result) as f:
+                candidate.measured = json.load(f)["cycles"]
+    return sorted(candidates, key=lambda candidate: candidate.cost)
+
+
+def ranked_table(candidates: List[Candidate]) -> List[str]:
+    lines = [f"{'rank':>4}  {'layout':<8} {'cores':>5} {'threads':>7} {'channels':>8} {'predicted':>9} {'measured':>8}"]
+    ranked = sorted(candidates, key=lambda candidate: (candidate.measured is None, candidate.cost))
+    for rank, candidate in enumerate(ranked, 1):
+        config = candidate.config
+        measured = "" if candidate.measured is None else str(candidate.measured)
+        lines.append(
+            f"{rank:>4}  {candidate.layout:<8} {config.num_cores:>5} {config.threads_per_block:>7} "
+            f"{config.data_mem_num_channels:>8} {candidate.predicted:>9} {measured:>8}"
+        )
+    return lines
+
+
+def tune(
+    kernel: str,
+    size: Optional[int] = None,
+    confirm_top: int = 0,
+    prebuilt: bool = False,
+    simulator: str = "icarus",
+    build_dir: Optional[str] = None,
+    **space,
+) -> List[Candidate]:
+    # Screens the whole search space and confirms the best confirm_top candidates on the RTL.
+    # Returns every candidate, best first (confirmed candidates rank by their measured cycles)
+    if kernel not in KERNELS:
+        raise ValueError(f"Unknown kernel {kernel!r} (expected one of {', '.join(KERNELS)})")
+    size = size or KERNELS[kernel].default_size
+    pool = candidates(kernel, size, **space)
+    if prebuilt:
+        # Compared on the resolved parameters, which is what get_build() looks the build up by
+        configs = prebuilt_configs(build_dir, simulator)
+        pool = [candidate for candidate in pool if resolve_parameters(candidate.parameters) in configs]
+        if not pool:
+            raise RuntimeError("No cached build matches the search space; run without --prebuilt")
+
+    ranked = screen(pool)
+    if confirm_top:
+        confirm(ranked[:confirm_top], simulator, build_dir)
+    return sorted(ranked, key=lambda candidate: (candidate.measured is None, candidate.cost))
+
+
+def _choices(text: str) -> List[int]:
+    return [int(value) for value in text.split(",")]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Search launch configurations for a tiny-gpu kernel")
+    parser.add_argument("kernel", choices=sorted(KERNELS))
+    parser.add_argument("--size", type=int, help="problem size (e.g. pixels)")
+    parser.add_argument("--layouts", type=lambda text: text.split(","), help="comma-separated data layouts")
+    parser.add_argument("--threads-per-block", type=_choices, default=list(THREADS_PER_BLOCK))
+    parser.add_argument("--cores", type=_choices, default=list(NUM_CORES))
+    parser.add_argument("--data-channels", type=_choices, default=list(DATA_MEM_NUM_CHANNELS))
+    parser.add_argument("--confirm", type=int, default=0, help="run the best N candidates on the RTL")
+    parser.add_argument("--prebuilt", action="store_true", help="only consider configs with a cached build")
+    parser.add_argument("--simulator", default=os.environ.get("SIM", "icarus"))
+    args = parser.parse_args(argv)
+
+    ranked = tune(
+        args.kernel,
+        args.size,
+        args.confirm,
+        args.prebuilt,
+        args.simulator,
+        layouts=args.layouts,
+        threads_per_block=args.threads_per_block,
+        num_cores=args.cores,
+        data_channels=args.data_channels,
+    )
+    for line in ranked_table(ranked):
+        print(line)
+    best = ranked[0]
+    source = "measured" if best.measured is not None else "predicted"
+    print(f"Best: {best.layout} layout, {best.parameters} ({best.cycles} cycles, {source})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
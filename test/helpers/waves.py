@@ -0,0 +1,310 @@
+import argparse
+import re
+import sys
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, TextIO, Tuple
+from .builds import DEFAULT_TOPLEVEL, parse_parameter
+from .cost import HardwareConfig
+from .format import format_core_header, format_cycle_header, format_thread
+from .runner import resolve_parameters
+
+# Waveform dump pipeline
+# > `make test_<name> WAVES=1` compiles an extra top-level module (written by `dump_module`) that
+#   has the simulator dump just the signals format_cycle prints, plus the memory controller channel
+#   states, to build/<name>.vcd. format_cycle stops probing from Python for that run
+# > `python -m test.helpers.waves format build/<name>.vcd` then streams through the dump once and
+#   writes the same per-cycle, per-thread table format_cycle would have logged
+# > Cycles are numbered like the test loops do: cycle 0 is the last sample before the first rising
+#   edge that sees start high, and each cycle shows the values just before its rising edge
+# > Both commands take the build's top level and parameter overrides (the Makefile passes the test's
+#   own, from test/helpers/builds.py), so the dumped paths and the core/thread/channel counts match the
+#   design that was simulated. On multi_gpu every device's gpu is dumped; format picks one with --device
+
+NUM_REGISTERS = 16
+
+
+def core_signals(core: int) -> List[str]:
+    prefix = f"cores[{core}].core_instance"
+    return [
+        f"{prefix}.{name}"
+        for name in (
+            "core_state",
+            "current_pc",
+            "fetcher_state",
+            "instruction",
+            "block_id",
+            "block_id_y",
+            "thread_count",
+            "decoded_reg_input_mux",
+            "decoded_immediate",
+            "active_mask",
+            "done",
+        )
+    ]
+
+
+def thread_signals(core: int, thread: int) -> List[str]:
+    prefix = f"cores[{core}].core_instance.threads[{thread}]"
+    signals = [
+        f"{prefix}.lsu_instance.lsu_state",
+        f"{prefix}.lsu_instance.lsu_out",
+        f"{prefix}.alu_instance.alu_out",
+        f"{prefix}.register_instance.rs",
+        f"{prefix}.register_instance.rt",
+    ]
+    return signals + [f"{prefix}.register_instance.registers[{i}]" for i in range(NUM_REGISTERS)]
+
+
+def dumped_signals(config: HardwareConfig) -> List[str]:
+    signals = ["clk", "reset", "start", "done", "thread_count", "grid_dim_x"]
+    for core in range(config.num_cores):
+        signals += core_signals(core)
+        for thread in range(config.threads_per_block):
+            signals += thread_signals(core, thread)
+    for controller, channels in (
+        ("data_memory_controller", config.data_mem_num_channels),
+        ("program_memory_controller", config.program_mem_num_channels),
+    ):
+        for channel in range(channels):
+            signals += [f"{controller}.controller_state[{channel}]", f"{controller}.current_consumer[{channel}]"]
+    return signals
+
+
+def gpu_instances(toplevel: str = DEFAULT_TOPLEVEL, parameters: Mapping[str, int] = {}) -> List[str]:
+    # Hierarchical paths of the gpu instances in a build
+    if toplevel == "multi_gpu":
+        return [f"multi_gpu.devices[{device}].gpu_instance" for device in range(parameters.get("NUM_DEVICES", 2))]
+    return [toplevel]
+
+
+def build_config(toplevel: str = DEFAULT_TOPLEVEL, overrides: Mapping[str, int] = {}) -> Tuple[HardwareConfig, Dict[str, int]]:
+    # The config of each gpu in a build, from its top level's defaults with the overrides applied;
+    # also returns the full parameter set
+    parameters = resolve_parameters(overrides, toplevel=toplevel)
+    config = HardwareConfig(
+        num_cores=parameters["NUM_CORES"],
+        threads_per_block=parameters["THREADS_PER_BLOCK"],
+        data_mem_num_channels=parameters["DATA_MEM_NUM_CHANNELS"],
+        program_mem_num_channels=parameters["PROGRAM_MEM_NUM_CHANNELS"],
+    )
+    return config, parameters
+
+
+def dump_module(config: Optional[HardwareConfig] = None, roots: Sequence[str] = (DEFAULT_TOPLEVEL,)) -> str:
+    # Second top-level module for iverilog; the dump file comes from +vcd=<path>
+    # roots: the gpu instances to dump (see gpu_instances)
+    config = config or HardwareConfig()
+    lines = [
+        "`timescale 1ns/1ns",
+        "",
+        "// Generated by test/helpers/waves.py",
+        "module waves;",
+        "    reg [1023:0] vcd_file;",
+        "    initial begin",
+        '        if (!$value$plusargs("vcd=%s", vcd_file)) vcd_file = "build/waves.vcd";',
+        "        $dumpfile(vcd_file);",
+    ]
+    lines += [f"        $dumpvars(0, {root}.{signal});" for root in roots for signal in dumped_signals(config)]
+    lines += ["    end", "endmodule", ""]
+    return "\n".join(lines)
+
+
+def _expand(value: str, width: int) -> str:
+    # VCD drops leading bits: pad with 0, or with x/z if that's what the value starts with
+    fill = value[0] if value[0] in "xzXZ" else "0"
+    return value.rjust(width, fill).lower()
+
+
+class VcdReader:
+    # Streaming VCD reader: holds only the current value of each signal
+    def __init__(self, stream: TextIO, root: str = "gpu"):
+        self.stream = stream
+        self.root = root
+        self.signals: Dict[str, Tuple[str, int]] = {}  # path relative to root -> (id, width)
+        self._widths: Dict[str, int] = {}
+        self._tokens = self._read_tokens()
+        self._read_header()
+
+    def _read_tokens(self) -> Iterator[str]:
+        for line in self.stream:
+            yield from line.split()
+
+    def _read_header(self):
+        scopes: List[str] = []
+        for token in self._tokens:
+            if token == "$scope":
+                _, name = next(self._tokens), next(self._tokens)
+                scopes.append(name)
+                next(self._tokens)  # $end
+            elif token == "$upscope":
+                scopes.pop()
+                next(self._tokens)
+            elif token == "$var":
+                fields = []
+                for field in self._tokens:
+                    if field == "$end":
+                        break
+                    fields.append(field)
+                _, width, identifier, reference = fields[:4]
+                # Array words are named like registers[3]; a trailing [msb:lsb] is just the range
+                if len(fields) > 4 and not re.fullmatch(r"\[\d+:\d+\]", fields[4]):
+                    reference += fields[4]
+                path = ".".join(scopes + [reference])
+                if path.startswith(self.root + "."):
+                    path = path[len(self.root) + 1:]
+                self.signals.setdefault(path, (identifier, int(width)))
+                self._widths[identifier] = int(width)
+            elif token == "$enddefinitions":
+                next(self._tokens)
+                return
+            elif token.startswith("$"):
+                # $date, $version, $timescale, $comment: skip to $end
+                for field in self._tokens:
+                    if field == "$end":
+                        break
+
+    def changes(self) -> Iterator[Tuple[int, Dict[str, str]]]:
+        # Yields (time, {id: value}) for every timestamp, in order
+        time = 0
+        changes: Dict[str, str] = {}
+        tokens = self._tokens
+        for token in tokens:
+            if token.startswith("#"):
+                if changes:
+                    yield time, changes
+                time, changes = int(token[1:]), {}
+            elif token[0] in "bBrR":
+                identifier = next(tokens)
+                if identifier in self._widths:
+                    changes[identifier] = _expand(token[1:], self._widths[identifier])
+            elif token[0] in "01xzXZ":
+                identifier = token[1:]
+                if identifier in self._widths:
+                    changes[identifier] = token[0].lower()
+            # $dumpvars/$dumpall/$end and other keywords carry no values of their own
+        if changes:
+            yield time, changes
+
+    def cycles(self) -> Iterator[Dict[str, str]]:
+        # Values just before each rising edge of clk, by path
+        clock = self.signals["clk"][0]
+        values: Dict[str, str] = {}
+        for _, changes in self.changes():
+            if changes.get(clock) == "1" and values.get(clock) == "0":
+                yield {path: values.get(identifier, "x") for path, (identifier, _) in self.signals.items()}
+            values.update(changes)
+
+
+def _resolved(bits: str) -> bool:
+    return bool(bits) and set(bits) <= {"0", "1"}
+
+
+def format_vcd(
+    stream: TextIO,
+    output: TextIO,
+    config: Optional[HardwareConfig] = None,
+    thread_id: Optional[int] = None,
+    root: str = DEFAULT_TOPLEVEL,
+) -> int:
+    # Writes the format_cycle table for every cycle after launch; returns the number of cycles
+    # root: the gpu instance to format (see gpu_instances)
+    config = config or HardwareConfig()
+    reader = VcdReader(stream, root)
+    cycle = 0
+    started = False
+    for values in reader.cycles():
+        if not started:
+            if values.get("start") != "1":
+                continue
+            started = True
+        if values.get("done") == "1":
+            break
+
+        output.write(format_cycle_header(cycle) + "\n")
+        thread_count = values["thread_count"]
+        for core in range(config.num_cores):
+            if not _resolved(thread_count) or int(thread_count, 2) <= core * config.threads_per_block:
+                continue
+            output.write(format_core_header(core) + "\n")
+
+            prefix = f"cores[{core}].core_instance"
+            enabled = values[f"{prefix}.thread_count"]
+            for thread in range(config.threads_per_block):
+                if not _resolved(enabled) or thread >= int(enabled, 2):
+                    continue
+                grid_dim_x = int(values["grid_dim_x"], 2) or 256
+                block = int(values[f"{prefix}.block_id_y"], 2) * grid_dim_x + int(values[f"{prefix}.block_id"], 2)
+                idx = block * config.threads_per_block + thread
+                if thread_id is not None and thread_id != idx:
+                    continue
+
+                thread_prefix = f"{prefix}.threads[{thread}]"
+                registers = [
+                    values[f"{thread_prefix}.register_instance.registers[{i}]"]
+                    for i in reversed(range(NUM_REGISTERS))
+                ]
+                lines = format_thread(
+                    idx,
+                    values[f"{prefix}.current_pc"],
+                    values[f"{prefix}.instruction"],
+                    values[f"{prefix}.core_state"],
+                    values[f"{prefix}.fetcher_state"],
+                    values[f"{thread_prefix}.lsu_instance.lsu_state"],
+                    registers,
+                    values[f"{thread_prefix}.register_instance.rs"],
+                    values[f"{thread_prefix}.register_instance.rt"],
+                    values[f"{prefix}.decoded_reg_input_mux"],
+                    values[f"{thread_prefix}.alu_instance.alu_out"],
+                    values[f"{thread_prefix}.lsu_instance.lsu_out"],
+                    values[f"{prefix}.decoded_immediate"],
+                    values[f"{prefix}.active_mask"][-1 - thread],
+                )
+                output.write("\n".join(lines) + "\n")
+            output.write(f"Core Done: {values[f'{prefix}.done']}\n")
+
+        cycle += 1
+    return cycle
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Waveform dump helpers for the tiny-gpu testbench")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dump = commands.add_parser("dump", help="write the Verilog module that dumps the traced signals")
+    dump.add_argument("output")
+
+    formatter = commands.add_parser("format", help="turn a VCD dump into the per-cycle thread table")
+    formatter.add_argument("vcd")
+    formatter.add_argument("-o", "--output", help="output file (default: stdout)")
+    formatter.add_argument("--thread", type=int, help="only show this global thread index")
+
+    formatter.add_argument("--device", type=int, default=0, help="device to format on a multi_gpu build")
+
+    for command in (dump, formatter):
+        command.add_argument("--toplevel", default=DEFAULT_TOPLEVEL, help="top level of the build, e.g. multi_gpu")
+        command.add_argument(
+            "-P", "--param", type=parse_parameter, action="append", default=[], help="parameter override of the build"
+        )
+
+    args = parser.parse_args(argv)
+    config, parameters = build_config(args.toplevel, dict(args.param))
+    roots = gpu_instances(args.toplevel, parameters)
+
+    if args.command == "dump":
+        with open(args.output, "w") as f:
+            f.write(dump_module(config, roots))
+        return
+    if not 0 <= args.device < len(roots):
+        parser.error(f"--device must be below {len(roots)}")
+
+    with open(args.vcd) as stream:
+        output = open(args.output, "w") if args.output else sys.stdout
+        try:
+            cycles = format_vcd(stream, output, config, args.thread, roots[args.device])
+        finally:
+            if args.output:
+                output.close()
+    print(f"Formatted {cycles} cycles", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,33 @@
 import cocotb
 from cocotb.triggers import RisingEdge
-from cocotb.clock import Clock
 from .helpers.memory import Memory
 from .helpers.setup import setup
+from .helpers.perf import read_perf_counters
+from .helpers.assembler import assemble
 
 from PIL import Image
 import numpy as np
 import os
 
 
-# ---------------- MINI ASSEMBLER ----------------
-
-def R(x):
-    return int(x[1:])
-
-
-def assemble(asm):
-    code = []
-    for line in asm.splitlines():
-        line = line.split(";")[0].strip()
-        if not line:
-            continue
-
-        p = line.replace(",", "").split()
-        op = p[0]
-
-        if op == "CONST":
-            code.append(0b1001000000000000 | (R(p[1]) << 8) | int(p[2][1:]))
-        elif op == "ADD":
-            code.append(0b0011000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-        elif op == "MUL":
-            code.append(0b0101000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-        elif op == "DIV":
-            code.append(0b0110000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-        elif op == "LDR":
-            code.append(0b0111000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4))
-        elif op == "STR":
-            code.append(0b1000000000000000 | (R(p[1]) << 4) | R(p[2]))
-        elif op == "RET":
-            code.append(0b1111000000000000)
-        else:
-            raise ValueError("Unknown opcode: " + op)
-
-    return code
-
-
-# ---------------- GRAYSCALE KERNEL ----------------
-# gray = (R>>2) + (G>>1) + (B>>3)
+# ---------------- INVERT KERNEL (2D GRID) ----------------
+# One launch covers the whole 16x16 image: each grid row of blocks is one image row
+# x = blockIdx.x * blockDim + threadIdx, y = blockIdx.y
+# out[y][x] = 255 - in[y][x] (in place)
 
 ASM = """
-MUL R0, R13, R14
-ADD R0, R0, R15
-
-CONST R1, #0
-CONST R2, #768
-
-ADD R3, R0, R0
-ADD R3, R3, R0
-ADD R3, R3, R1
+S2R R0, %blockIdy
+CONST R1, #16
+MUL R0, R0, R1      ; y * width
 
-LDR R4, R3
-CONST R7, #1
-ADD R3, R3, R7
-LDR R5, R3
-ADD R3, R3, R7
-LDR R6, R3
+MUL R2, R13, R14
+ADD R2, R2, R15     ; x
+ADD R0, R0, R2      ; addr = y * width + x
 
-ADD R5, R5, R5      ; 2*G
-ADD R4, R4, R5      ; R + 2*G
-ADD R4, R4, R6      ; R + 2*G + B
-
-CONST R7, #4
-DIV R4, R4, R7      ; >> 2
-ADD R7, R2, R0
-STR R7, R4
+LDR R3, R0
+CONST R4, #255
+SUB R3, R4, R3
+STR R0, R3
 
 RET
 """
@@ -82,11 +36,7 @@ RET
 # ---------------- TEST ----------------
 
 @cocotb.test()
-async def test_grayscale_16x16(dut):
-
-    # Clock
-    clock = Clock(dut.clk, 25, units="us")
-    cocotb.start_soon(clock.start())
+async def test_grid_16x16(dut):
 
     # Memories
     program_memory = Memory(dut, 8, 16, 1, "program")
@@ -94,88 +44,53 @@ async def test_grayscale_16x16(dut):
 
     program = assemble(ASM)
 
-    # Load image
+    # Load image (one byte per pixel fills the 256-row data memory exactly)
     here = os.path.dirname(__file__)
-    img = Image.open(os.path.join(here, "input.jpeg")).resize((16, 16))
-    rgb = np.array(img).astype(np.uint8).flatten().tolist()
-
-    # -------------------------------------------------
-    # PRE-ALLOCATE DATA MEMORY (CRITICAL FIX)
-    # -------------------------------------------------
-    DATA_MEM_SIZE = 1024
-    data = rgb + [0] * (DATA_MEM_SIZE - len(rgb))
+    img = Image.open(os.path.join(here, "input.jpeg")).convert("L").resize((16, 16))
+    pixels = np.array(img).astype(np.uint8).flatten().tolist()
 
-    THREADS = 16
-    BLOCKS = 16
+    WIDTH = 16
+    HEIGHT = 16
+    THREADS_PER_BLOCK = int(dut.THREADS_PER_BLOCK.value)
+    GRID_DIM_X = WIDTH // THREADS_PER_BLOCK
 
-    # Setup ONCE
+    # Single launch: 256 threads laid out as a GRID_DIM_X x HEIGHT grid of blocks
     await setup(
         dut,
         program_memory,
         program,
         data_memory,
-        data,
-        threads=THREADS,
-        block_idx=0,
+        pixels,
+        threads=WIDTH * HEIGHT,
+        grid_dim_x=GRID_DIM_X,
     )
 
-    # ---- FORCE MEMORY LIST TO FULL SIZE ----
-    if len(data_memory.memory) < DATA_MEM_SIZE:
-        data_memory.memory.extend([0] * (DATA_MEM_SIZE - len(data_memory.memory)))
-
-    # Ensure start is low
-    dut.start.value = 0
-    await RisingEdge(dut.clk)
-    await RisingEdge(dut.clk)
-
-    # Run blocks
-    for block in range(BLOCKS):
-
-        # write blockIdx
-        dut.device_control_write_enable.value = 1
-        dut.device_control_data.value = block
-        await RisingEdge(dut.clk)
-        dut.device_control_write_enable.value = 0
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
         await RisingEdge(dut.clk)
+        cycles += 1
+        if cycles > 50000:
+            raise RuntimeError("Timeout: kernel did not finish")
 
-        # start pulse
-        dut.start.value = 1
-        await RisingEdge(dut.clk)
-        dut.start.value = 0
+    print(f"Completed in {cycles} cycles")
+    for i, counters in enumerate(read_perf_counters(dut)):
+        print(f"Core {i}: {counters['perf_blocks_retired']} blocks, {counters['perf_handoff_cycles']} handoff cycles")
 
-        # wait for done
-        cycles = 0
-        while dut.done.value != 1:
-            data_memory.run()
-            program_memory.run()
-            await RisingEdge(dut.clk)
-            cycles += 1
-            if cycles > 5000:
-                raise RuntimeError("Timeout in block " + str(block))
-
-        print(f"Block {block} finished")
-
-        await RisingEdge(dut.clk)
-        await RisingEdge(dut.clk)
-    
     # -------------------------------------------------
-    # READ BACK RESULT (NOW SAFE)
+    # READ BACK RESULT
     # -------------------------------------------------
-    gray = np.array(data_memory.memory[768:768+256], dtype=np.uint8)
-    print("Gray buffer length:", len(gray))
+    inverted = data_memory.view(0, (HEIGHT, WIDTH))
 
-    Image.fromarray(gray.reshape(16, 16), mode="L").save("output.png")
+    Image.fromarray(inverted, mode="L").save("output.png")
     print("output.png written")
-# ---- DEBUG: DUMP RAW GRAYSCALE VECTOR ----
-    gray = data_memory.memory[768:768+256]
-
-    print("RAW GRAYSCALE VECTOR (first 64 values):")
-    for i in range(0, 64, 8):
-        print(gray[i:i+8])
-
-    # also save full vector to file
-    with open("gray_vector.txt", "w") as f:
-        for i, v in enumerate(gray):
-            f.write(f"{i}: {v}\n")
 
-    print("gray_vector.txt written")
\ No newline at end of file
+    expected = (255 - np.array(pixels, dtype=np.uint8)).reshape(HEIGHT, WIDTH)
+    mismatches = np.argwhere(inverted != expected)
+    if len(mismatches):
+        y, x = mismatches[0]
+        raise AssertionError(
+            f"Result mismatch at {len(mismatches)} pixels, first at (y={y}, x={x}): "
+            f"expected {expected[y, x]}, got {inverted[y, x]}"
+        )
@@ -0,0 +1,150 @@
+import os
+import shutil
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.assembler import assemble
+from .helpers.checker import DifferentialChecker
+from .helpers.checkpoint import Checkpointer, list_checkpoints, resume
+
+
+# ---------------- SCALE KERNEL ----------------
+# out[i] = 3 * in[i] + 1 over 64 threads (16 blocks)
+# Blocks only read the input and write their own outputs, so re-running a block after a resume is harmless
+
+ASM = """
+    MUL R0, R13, R14
+    ADD R0, R0, R15         ; i = blockIdx * blockDim + threadIdx
+    LDR R1, R0              ; x = in[i]
+    CONST R2, #3
+    MUL R1, R1, R2
+    CONST R2, #1
+    ADD R1, R1, R2          ; 3x + 1
+    CONST R3, #64
+    ADD R3, R3, R0
+    STR R3, R1              ; out[i]
+    RET
+"""
+
+THREADS = 64
+EVERY = 4
+DIRECTORY = os.path.join("build", "checkpoints", "test_checkpoint")
+PROGRAM_BASE = 32
+
+DATA = [(7 * i + 5) % 80 for i in range(THREADS)]
+EXPECTED = [(3 * x + 1) & 0xFF for x in DATA]
+
+
+def memories(dut):
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+    return program_memory, data_memory
+
+
+async def run_until_done(dut, program_memory, data_memory, *samplers):
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        for sampler in samplers:
+            sampler.sample(dut, data_memory)
+        await RisingEdge(dut.clk)
+        cycles += 1
+
+        if cycles > 20000:
+            raise RuntimeError("Timeout: possible infinite loop")
+    return cycles
+
+
+# ---------------- TESTS ----------------
+
+@cocotb.test()
+async def test_checkpoint_full_run(dut):
+    shutil.rmtree(DIRECTORY, ignore_errors=True)
+    program = assemble(ASM)
+    program_memory, data_memory = memories(dut)
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=program,
+        data_memory=data_memory,
+        data=DATA,
+        threads=THREADS,
+    )
+
+    checkpointer = Checkpointer(DIRECTORY, EVERY, program, THREADS, int(dut.THREADS_PER_BLOCK.value))
+    cycles = await run_until_done(dut, program_memory, data_memory, checkpointer)
+    logger.info(f"Completed in {cycles} cycles, {len(checkpointer.checkpoints)} checkpoints")
+
+    out = data_memory.view(64, THREADS).tolist()
+    assert out == EXPECTED, f"Result mismatch: expected {EXPECTED}, got {out}"
+    blocks = [checkpoint.block for checkpoint in checkpointer.checkpoints]
+    assert blocks and blocks[0] >= EVERY, f"Expected a checkpoint every {EVERY} blocks, got {blocks}"
+    assert blocks == sorted(set(blocks))
+    assert blocks == [checkpoint.block for checkpoint in list_checkpoints(DIRECTORY)]
+
+
+@cocotb.test()
+async def test_checkpoint_resume(dut):
+    # Resume from the middle checkpoint of the full run: only the remaining blocks run, and the output
+    # matches the full run
+    checkpoints = list_checkpoints(DIRECTORY)
+    assert checkpoints, "test_checkpoint_full_run must run first"
+    checkpoint = checkpoints[len(checkpoints) // 2]
+
+    program_memory, data_memory = memories(dut)
+    await resume(dut, program_memory, data_memory, checkpoint)
+
+    checker = DifferentialChecker(
+        checkpoint.program,
+        data_memory.memory.tolist(),
+        checkpoint.threads,
+        int(dut.THREADS_PER_BLOCK.value),
+        first_block=checkpoint.block,
+    )
+    cycles = await run_until_done(dut, program_memory, data_memory, checker)
+    logger.info(f"Resumed at block {checkpoint.block} (cycle {checkpoint.cycle}), completed in {cycles} more cycles")
+    checker.finish()
+
+    out = data_memory.view(64, THREADS).tolist()
+    assert out == EXPECTED, f"Result mismatch: expected {EXPECTED}, got {out}"
+    assert all(x + 256 * y >= checkpoint.block for x, y in checker.retired), "A skipped block ran again"
+
+
+@cocotb.test()
+async def test_checkpoint_resume_program_base(dut):
+    # Same kernel loaded behind PROGRAM_BASE rows of other code: the resumed launch must find it there
+    directory = DIRECTORY + "_program_base"
+    shutil.rmtree(directory, ignore_errors=True)
+    program = assemble(ASM)
+    program_memory, data_memory = memories(dut)
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=[0] * PROGRAM_BASE + program,
+        data_memory=data_memory,
+        data=DATA,
+        threads=THREADS,
+        program_base=PROGRAM_BASE,
+    )
+
+    checkpointer = Checkpointer(
+        directory, EVERY, program, THREADS, int(dut.THREADS_PER_BLOCK.value), program_base=PROGRAM_BASE
+    )
+    await run_until_done(dut, program_memory, data_memory, checkpointer)
+    assert checkpointer.checkpoints, f"Expected a checkpoint every {EVERY} blocks"
+    checkpoint = list_checkpoints(directory)[len(checkpointer.checkpoints) // 2]
+    assert checkpoint.program_base == PROGRAM_BASE
+
+    program_memory, data_memory = memories(dut)
+    await resume(dut, program_memory, data_memory, checkpoint)
+    assert program_memory.memory[PROGRAM_BASE:PROGRAM_BASE + len(program)].tolist() == list(program)
+    cycles = await run_until_done(dut, program_memory, data_memory)
+    logger.info(f"Resumed at block {checkpoint.block} with program base {PROGRAM_BASE}, completed in {cycles} more cycles")
+
+    out = data_memory.view(64, THREADS).tolist()
+    assert out == EXPECTED, f"Result mismatch: expected {EXPECTED}, got {out}"
@@ -0,0 +1,57 @@
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.perf import log_perf_counters, read_perf_counters
+from .helpers.assembler import assemble
+from .helpers.checker import DifferentialChecker
+from .helpers.kernels import RAGGED_LOOP_ASM, RAGGED_LOOP_EXPECTED, RAGGED_LOOP_LENGTHS, RAGGED_LOOP_OUTPUT
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_divergence(dut):
+    # The ragged loop (test/helpers/kernels.py)
+    program = assemble(RAGGED_LOOP_ASM)
+
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    lengths = RAGGED_LOOP_LENGTHS
+    threads = len(lengths)
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=program,
+        data_memory=data_memory,
+        data=lengths,
+        threads=threads,
+    )
+
+    checker = DifferentialChecker(program, lengths, threads, int(dut.THREADS_PER_BLOCK.value))
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        checker.sample(dut, data_memory)
+        await RisingEdge(dut.clk)
+        cycles += 1
+
+        if cycles > 10000:
+            raise RuntimeError("Timeout: possible infinite loop")
+
+    logger.info(f"Completed in {cycles} cycles")
+    log_perf_counters(dut)
+    checker.finish()
+
+    out = data_memory.view(RAGGED_LOOP_OUTPUT, threads).tolist()
+    print("FINAL RESULT:", out)
+
+    assert out == RAGGED_LOOP_EXPECTED, f"Result mismatch: expected {RAGGED_LOOP_EXPECTED}, got {out}"
+
+    counters = read_perf_counters(dut)
+    assert sum(core["perf_divergences"] for core in counters) > 0, "Expected the loop exits to diverge"
+    assert sum(core["perf_divergent_cycles"] for core in counters) > 0
@@ -0,0 +1,73 @@
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.dsl import kernel
+
+import numpy as np
+
+
+# ---------------- MATMUL IN THE KERNEL DSL ----------------
+# C (2x2) = A (2x4) x B (4x2), with A, B and C at %param0, %param1 and %param2
+
+M, K, N = 2, 4, 2
+
+
+@kernel
+def matmul(k):
+    i = k.block_idx * k.block_dim + k.thread_idx
+    row = i // N
+    col = i - row * N
+
+    a_base = k.param(0)
+    b_base = k.param(1)
+
+    acc = k.var(0)
+    for j in k.range(K):
+        acc += k.load(a_base + row * K + j) * k.load(b_base + j * N + col)
+
+    k.store(k.param(2) + i, acc)
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_dsl_matmul(dut):
+    logger.info(matmul.source)
+    program = matmul.assemble(optimize=True).code
+
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    A_BASE, B_BASE, C_BASE = 0, 8, 16
+    a = np.array([1, 2, 3, 4, 5, 6, 7, 8]).reshape(M, K)
+    b = np.array([2, 1, 0, 3, 1, 1, 4, 2]).reshape(K, N)
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=program,
+        data_memory=data_memory,
+        data=a.flatten().tolist() + b.flatten().tolist(),
+        threads=M * N,
+        params=[A_BASE, B_BASE, C_BASE],
+    )
+
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        await RisingEdge(dut.clk)
+        cycles += 1
+
+        if cycles > 10000:
+            raise RuntimeError("Timeout: possible infinite loop")
+
+    logger.info(f"Completed in {cycles} cycles ({matmul.registers_used} registers)")
+
+    c = data_memory.view(C_BASE, (M, N))
+    print("FINAL RESULT (C):", c.tolist())
+
+    expected = (a @ b) & 0xFF
+    assert np.array_equal(c, expected), f"Result mismatch: expected {expected.tolist()}, got {c.tolist()}"
@@ -4,79 +4,12 @@ from .helpers.setup import setup
 from .helpers.memory import Memory
 from .helpers.format import format_cycle
 from .helpers.logger import logger
+from .helpers.profiler import Profiler
+from .helpers.assembler import assemble_program
 
 LOGFILE = open("grayscale_run.log", "w")
 
 
-# ---------------- MINI ASSEMBLER ----------------
-
-def R(x):
-    return int(x[1:])   # "R7" -> 7
-
-
-def assemble(asm):
-    lines = []
-    for l in asm.splitlines():
-        l = l.split(";")[0].strip()
-        if l:
-            lines.append(l)
-
-    labels = {}
-    pc = 0
-
-    # First pass: collect labels
-    for l in lines:
-        if l.endswith(":"):
-            labels[l[:-1]] = pc
-        else:
-            pc += 1
-
-    code = []
-
-    # Second pass: encode instructions
-    for l in lines:
-        if l.endswith(":"):
-            continue
-
-        p = l.replace(",", "").split()
-        op = p[0]
-
-        if op == "CONST":
-            code.append(0b1001000000000000 | (R(p[1]) << 8) | int(p[2][1:]))
-
-        elif op == "ADD":
-            code.append(0b0011000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "SUB":
-            code.append(0b0100000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "MUL":
-            code.append(0b0101000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "DIV":
-            code.append(0b0110000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "LDR":
-            code.append(0b0111000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4))
-
-        elif op == "STR":
-            code.append(0b1000000000000000 | (R(p[1]) << 4) | R(p[2]))
-
-        elif op == "CMP":
-            code.append(0b0010000000000000 | (R(p[1]) << 4) | R(p[2]))
-
-        elif op == "BRn":
-            code.append(0b0001100000000000 | labels[p[1]])
-
-        elif op == "RET":
-            code.append(0b1111000000000000)
-
-        else:
-            raise ValueError(f"Unknown opcode {op}")
-
-    return code
-
-
 # ---------------- GRAYSCALE ASM (8 PIXELS) ----------------
 
 ASM = """
@@ -127,7 +60,8 @@ RET
 @cocotb.test()
 async def test_grayscale_8(dut):
 
-    program = assemble(ASM)
+    program = assemble_program(ASM)
+    profiler = Profiler(program)
 
     program_memory = Memory(
         dut=dut, addr_bits=8, data_bits=16, channels=1, name="program"
@@ -152,7 +86,7 @@ async def test_grayscale_8(dut):
     await setup(
         dut=dut,
         program_memory=program_memory,
-        program=program,
+        program=program.code,
         data_memory=data_memory,
         data=data,
         threads=8,
@@ -165,6 +99,7 @@ async def test_grayscale_8(dut):
 
         await cocotb.triggers.ReadOnly()
         format_cycle(dut, cycles)
+        profiler.sample(dut)
         logger.info(f"cycle {cycles}")
 
         await RisingEdge(dut.clk)
@@ -175,8 +110,9 @@ async def test_grayscale_8(dut):
 
     logger.info(f"Completed in {cycles} cycles")
     print(f"Completed in {cycles} cycles", file=LOGFILE)
+    profiler.log()
 
-    gray = [data_memory.memory[i + 24] for i in range(8)]
+    gray = data_memory.view(24, 8).tolist()
     print("FINAL RESULT (GRAY):", gray)
     logger.info(f"FINAL RESULT (GRAY): {gray}")
     print("FINAL RESULT (GRAY):", gray, file=LOGFILE)
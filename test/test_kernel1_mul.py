@@ -109,12 +109,12 @@ async def test_grayscale_fixed_point(dut):
     # Read back grayscale accumulator
     # --------------------------------------------------
     gray_base = len(rgb_flat)
-    gray_acc = data_memory.memory[gray_base:gray_base + num_pixels]
+    gray_acc = data_memory.view(gray_base, num_pixels)
 
     # --------------------------------------------------
     # Convert back to image (HOST SIDE)
     # --------------------------------------------------
-    gray = (np.array(gray_acc) // 1000).astype(np.uint8)
+    gray = (gray_acc // 1000).astype(np.uint8)
     gray_img = gray.reshape(height, width)
 
     Image.fromarray(gray_img, mode="L").save("grayscale_output.png")
@@ -4,6 +4,10 @@ from .helpers.setup import setup
 from .helpers.memory import Memory
 from .helpers.format import format_cycle
 from .helpers.logger import logger
+from .helpers.perf import log_perf_counters
+from .helpers.cost import ESTIMATE_TOLERANCE, estimate, log_estimate
+from .helpers.trace import TraceRecorder
+from .helpers.checker import DifferentialChecker
 
 
 # Write our own simple run log
@@ -50,6 +54,8 @@ async def test_matadd(dut):
 
     data_memory.display(24)
 
+    trace = TraceRecorder()
+    checker = DifferentialChecker(program, data, threads)
     cycles = 0
     while dut.done.value != 1:
         data_memory.run()
@@ -57,6 +63,8 @@ async def test_matadd(dut):
 
         await cocotb.triggers.ReadOnly()
         format_cycle(dut, cycles)
+        trace.sample(dut, cycles)
+        checker.sample(dut, data_memory)
 
         await RisingEdge(dut.clk)
         cycles += 1
@@ -64,11 +72,16 @@ async def test_matadd(dut):
     msg = f"Completed in {cycles} cycles"
     logger.info(msg)
     print(msg, file=LOGFILE)
+    log_perf_counters(dut)
+    checker.finish()
+    trace.export("matadd_trace.json")
+    error = log_estimate(estimate(program, threads, data=data), cycles)
+    assert abs(error) <= ESTIMATE_TOLERANCE, f"Cost estimate off by {error:+.1%} (tolerance {ESTIMATE_TOLERANCE:.0%})"
 
     data_memory.display(24)
 
     # ---- FINAL RESULT (Matrix C lives at offsets 16..23) ----
-    c_values = [data_memory.memory[i + 16] for i in range(8)]
+    c_values = data_memory.view(16, 8).tolist()
 
     print("FINAL RESULT (C):", c_values)
     logger.info(f"FINAL RESULT (C): {c_values}")
@@ -81,7 +94,7 @@ async def test_matadd(dut):
     # Assertions
     expected_results = [a + b for a, b in zip(data[0:8], data[8:16])]
     for i, expected in enumerate(expected_results):
-        result = data_memory.memory[i + 16]
+        result = c_values[i]
         assert result == expected, f"Result mismatch at index {i}: expected {expected}, got {result}"
 
     LOGFILE.close()
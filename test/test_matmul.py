@@ -70,7 +70,7 @@ async def test_matmul(dut):
     print(msg, file=LOGFILE)
 
     # ---- FINAL RESULT ----
-    c_values = [data_memory.memory[i + 16] for i in range(8)]
+    c_values = data_memory.view(16, 8).tolist()
 
     print("FINAL RESULT (C):", c_values)
     logger.info(f"FINAL RESULT (C): {c_values}")
@@ -4,157 +4,24 @@ from .helpers.setup import setup
 from .helpers.memory import Memory
 from .helpers.format import format_cycle
 from .helpers.logger import logger
+from .helpers.profiler import Profiler
+from .helpers.access import AccessAnalysis, save_accesses
+from .helpers.assembler import assemble_program
+from .helpers.cost import ESTIMATE_TOLERANCE, estimate, log_estimate
+from .helpers.kernels import MATMUL_ASM, MATMUL_DATA, MATMUL_OUTPUT, MATMUL_THREADS
 
 LOGFILE = open("matmul_run.log", "w")
 
 
-# ---------------- MINI ASSEMBLER ----------------
-
-def R(x):
-    return int(x[1:])   # "R7" -> 7
-
-
-def assemble(asm):
-    lines = []
-    for l in asm.splitlines():
-        l = l.split(";")[0].strip()   # strip comments
-        if l:
-            lines.append(l)
-
-    labels = {}
-    pc = 0
-
-    # First pass: labels
-    for l in lines:
-        if l.endswith(":"):
-            labels[l[:-1]] = pc
-        else:
-            pc += 1
-
-    code = []
-    pc = 0
-
-    # Second pass: encode
-    for l in lines:
-        if l.endswith(":"):
-            continue
-
-        p = l.replace(",", "").split()
-        op = p[0]
-
-        if op == "CONST":
-            code.append(0b1001000000000000 | (R(p[1]) << 8) | int(p[2][1:]))
-
-        elif op == "ADD":
-            code.append(0b0011000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "SUB":
-            code.append(0b0100000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "MUL":
-            code.append(0b0101000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "DIV":
-            code.append(0b0110000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4) | R(p[3]))
-
-        elif op == "LDR":
-            code.append(0b0111000000000000 | (R(p[1]) << 8) | (R(p[2]) << 4))
-
-        elif op == "STR":
-            code.append(0b1000000000000000 | (R(p[1]) << 4) | R(p[2]))
-
-        elif op == "CMP":
-            code.append(0b0010000000000000 | (R(p[1]) << 4) | R(p[2]))
-
-        elif op == "BRn":
-            code.append(0b0001100000000000 | labels[p[1]])
-
-        elif op == "RET":
-            code.append(0b1111000000000000)
-
-        else:
-            raise ValueError(f"Unknown opcode {op}")
-
-        pc += 1
-
-    return code
-
-
-
 # ---------------- FULL MATRIX MULTIPLY KERNEL ----------------
-ASM = """
-
-; ----------------------------------------
-; Compute global thread index
-; i = blockIdx * blockDim + threadIdx
-; ----------------------------------------
-MUL R0, R13, R14
-ADD R0, R0, R15
-
-; ----------------------------------------
-; Constants
-; ----------------------------------------
-CONST R1, #0      ; baseA
-CONST R2, #8      ; baseB
-CONST R3, #16     ; baseC
-
-CONST R4, #2      ; N (columns of C)
-CONST R5, #4      ; K (inner dimension)
-CONST R6, #1      ; increment
-
-; ----------------------------------------
-; row = i / N
-; col = i - row*N
-; ----------------------------------------
-DIV R7, R0, R4
-MUL R8, R7, R4
-SUB R8, R0, R8
-
-; ----------------------------------------
-; acc = 0, k = 0
-; ----------------------------------------
-CONST R9, #0      ; acc
-CONST R10, #0     ; k
-
-; ----------------------------------------
-; LOOP: for k in [0, K)
-; ----------------------------------------
-LOOP:
-    ; addrA = baseA + row*K + k
-    MUL R11, R7, R5
-    ADD R11, R11, R10
-    ADD R11, R11, R1
-    LDR R12, R11
-
-    ; addrB = baseB + k*N + col
-    MUL R11, R10, R4
-    ADD R11, R11, R8
-    ADD R11, R11, R2
-    LDR R11, R11
-
-    ; acc += A * B
-    MUL R12, R12, R11
-    ADD R9, R9, R12
-
-    ; k++
-    ADD R10, R10, R6
-    CMP R10, R5
-    BRn LOOP
-
-; ----------------------------------------
-; Store result: C[i] = acc
-; ----------------------------------------
-ADD R0, R0, R3
-STR R0, R9
-
-RET
-"""
+# MATMUL_ASM from test/helpers/kernels.py, assembled as written (test_optimizer runs it optimized too)
 
 
 @cocotb.test()
 async def test_matmul(dut):
 
-    program = assemble(ASM)
+    program = assemble_program(MATMUL_ASM)
+    profiler = Profiler(program)
 
     program_memory = Memory(
         dut=dut, addr_bits=8, data_bits=16, channels=1, name="program"
@@ -164,27 +31,18 @@ async def test_matmul(dut):
         dut=dut, addr_bits=8, data_bits=8, channels=4, name="data"
     )
 
-    data = [
-    # A (2x4)
-    10, 21, 31, 42,
-    5, 69, 7, 81,
-
-    # B (4x2)
-    1, 87,
-    6, 1,
-    15, 0,
-    81, 19,
-]
+    data = MATMUL_DATA
 
     await setup(
         dut=dut,
         program_memory=program_memory,
-        program=program,
+        program=program.code,
         data_memory=data_memory,
         data=data,
-        threads=4,
+        threads=MATMUL_THREADS,
     )
 
+    data_memory.record()
     cycles = 0
     while dut.done.value != 1:
         data_memory.run()
@@ -192,6 +50,7 @@ async def test_matmul(dut):
 
         await cocotb.triggers.ReadOnly()
         format_cycle(dut, cycles)
+        profiler.sample(dut)
         logger.info(f"cycle {cycles}")
 
         await RisingEdge(dut.clk)
@@ -202,8 +61,13 @@ async def test_matmul(dut):
 
     logger.info(f"Completed in {cycles} cycles")
     print(f"Completed in {cycles} cycles", file=LOGFILE)
+    profiler.log()
+    AccessAnalysis(data_memory.accesses, data_memory.occupancy).log()
+    save_accesses("matmul_accesses.json", data_memory.accesses, data_memory.occupancy)
+    error = log_estimate(estimate(program, MATMUL_THREADS, data=data), cycles, program)
+    assert abs(error) <= ESTIMATE_TOLERANCE, f"Cost estimate off by {error:+.1%} (tolerance {ESTIMATE_TOLERANCE:.0%})"
 
-    C = [data_memory.memory[i + 16] for i in range(4)]
+    C = data_memory.view(MATMUL_OUTPUT, MATMUL_THREADS).tolist()
     print("FINAL RESULT (C):", C)
     logger.info(f"FINAL RESULT (C): {C}")
     print("FINAL RESULT (C):", C, file=LOGFILE)
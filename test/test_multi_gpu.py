@@ -0,0 +1,53 @@
+import cocotb
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.assembler import assemble
+from .helpers.multi_device import MultiDeviceRuntime
+from .helpers.kernels import SCALE_ASM, SCALE_DATA, SCALE_EXPECTED, SCALE_OUTPUT, SCALE_THREADS
+
+
+# ---------------- SCALE KERNEL ----------------
+# out[i] = 3 * in[i] + 1 over 64 threads (16 blocks, test/helpers/kernels.py), sharded across the
+# devices of src/multi_gpu.sv
+# Build with `make test_multi_gpu` (separate memories) or `make test_multi_gpu PARAMS="SHARED_DATA_MEM=1"`
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_multi_gpu_scaling(dut):
+    program = assemble(SCALE_ASM)
+    devices = int(dut.NUM_DEVICES.value)
+    shared = int(dut.SHARED_DATA_MEM.value)
+    addr_bits = int(dut.DATA_MEM_ADDR_BITS.value)
+    channels = int(dut.DATA_MEM_NUM_CHANNELS.value)
+
+    program_memory = Memory(
+        dut=dut, addr_bits=8, data_bits=16, channels=devices * int(dut.PROGRAM_MEM_NUM_CHANNELS.value), name="program"
+    )
+    if shared:
+        data_memory = Memory(
+            dut=dut, addr_bits=addr_bits, data_bits=8, channels=int(dut.SHARED_DATA_MEM_NUM_CHANNELS.value), name="data"
+        )
+    else:
+        data_memory = Memory(
+            dut=dut, addr_bits=addr_bits + (devices - 1).bit_length(), data_bits=8, channels=devices * channels, name="data"
+        )
+    runtime = MultiDeviceRuntime(dut, program_memory, data_memory)
+
+    # Same launch on 1, 2, ... devices
+    cycles = {}
+    for count in range(1, devices + 1):
+        await runtime.launch(program, SCALE_DATA, SCALE_THREADS, devices=count)
+        cycles[count] = await runtime.run()
+        runtime.log_summary()
+
+        out = runtime.merge()[SCALE_OUTPUT:SCALE_OUTPUT + SCALE_THREADS].tolist()
+        assert out == SCALE_EXPECTED, f"Result mismatch on {count} devices: expected {SCALE_EXPECTED}, got {out}"
+
+    mode = "shared" if shared else "separate"
+    for count, total in cycles.items():
+        logger.info(f"{count} device(s), {mode} memory: {total} cycles ({cycles[1] / total:.2f}x)")
+    if not shared:
+        # Nothing is shared between devices, so more devices must finish sooner
+        assert all(cycles[count] < cycles[count - 1] for count in range(2, devices + 1)), cycles
@@ -0,0 +1,89 @@
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.assembler import assemble_program
+from .helpers.kernels import (
+    GRAYSCALE_ASM,
+    MATMUL_ASM,
+    MATMUL_DATA,
+    MATMUL_EXPECTED,
+    MATMUL_OUTPUT,
+    MATMUL_THREADS,
+)
+
+
+# ---------------- OPTIMIZER ----------------
+# Runs shared kernels twice on the RTL, as written and through the assembler's optimizer passes
+# (test/helpers/optimizer.py), and compares the outputs, instruction counts and cycles
+# > test_image and test_matmul_real keep running the hand-written kernels
+
+PIXELS = [
+    255, 0,   0,
+    0,   255, 0,
+    0,   0,   255,
+    255, 255, 255,
+    0,   0,   0,
+    128, 128, 128,
+    50,  100, 150,
+    10,  20,  30,
+]
+GRAY_BASE = 24
+GRAY_EXPECTED = [r // 4 + g // 2 + b // 8 for r, g, b in zip(PIXELS[::3], PIXELS[1::3], PIXELS[2::3])]
+
+
+async def run_kernel(dut, program, data, threads, output, size, params=()):
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=program.code,
+        data_memory=data_memory,
+        data=data,
+        threads=threads,
+        params=params,
+    )
+
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        await RisingEdge(dut.clk)
+        cycles += 1
+
+        if cycles > 20000:
+            raise RuntimeError("Timeout: possible infinite loop")
+
+    return cycles, data_memory.view(output, size).tolist()
+
+
+async def compare(dut, name, source, data, threads, output, expected, params=()):
+    original = assemble_program(source)
+    optimized = assemble_program(source, optimize=True, name=name)
+    cycles, out = await run_kernel(dut, original, data, threads, output, len(expected), params)
+    optimized_cycles, optimized_out = await run_kernel(dut, optimized, data, threads, output, len(expected), params)
+
+    logger.info(
+        f"{name}: {len(original)} -> {len(optimized)} instructions, {cycles} -> {optimized_cycles} cycles"
+    )
+    assert out == expected, f"{name} as written: expected {expected}, got {out}"
+    assert optimized_out == out, f"{name} optimized: expected {out}, got {optimized_out}"
+    assert len(optimized) <= len(original)
+    return original, optimized
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_optimizer(dut):
+    original, optimized = await compare(
+        dut, "matmul", MATMUL_ASM, MATMUL_DATA, MATMUL_THREADS, MATMUL_OUTPUT, MATMUL_EXPECTED
+    )
+    assert len(optimized) < len(original), "Expected the optimizer to shorten matmul"
+
+    await compare(
+        dut, "grayscale", GRAYSCALE_ASM, PIXELS, len(PIXELS) // 3, GRAY_BASE, GRAY_EXPECTED, params=(0, GRAY_BASE)
+    )
@@ -0,0 +1,143 @@
+import cocotb
+from .helpers.setup import reset
+from .helpers.memory import Memory
+from .helpers.command_queue import CommandQueue
+from .helpers.logger import logger
+from .helpers.assembler import assemble
+from .helpers.perf import log_perf_counters, read_perf_counters
+from .helpers.kernels import GRAYSCALE_ASM
+
+import numpy as np
+
+
+# ---------------- STAGE 1: GRAYSCALE ----------------
+# gray[i] = R/4 + G/2 + B/8, param0 = RGB base, param1 = gray base (GRAYSCALE_ASM in test/helpers/kernels.py)
+
+
+# ---------------- STAGE 2: 3-TAP BLUR ----------------
+# out[i] = g[i-1]/4 + g[i]/2 + g[i+1]/4, param0 = gray base (zero padded on both sides), param1 = out base
+
+BLUR_ASM = """
+MUL R0, R13, R14
+ADD R0, R0, R15     ; i
+
+S2R R1, %param0
+S2R R2, %param1
+
+ADD R3, R1, R0      ; &g[i]
+CONST R7, #1
+SUB R4, R3, R7
+LDR R4, R4          ; g[i-1]
+LDR R5, R3          ; g[i]
+ADD R6, R3, R7
+LDR R6, R6          ; g[i+1]
+
+CONST R7, #4
+DIV R4, R4, R7
+DIV R6, R6, R7
+CONST R7, #2
+DIV R5, R5, R7
+
+ADD R4, R4, R5
+ADD R4, R4, R6
+
+ADD R7, R2, R0
+STR R7, R4
+
+RET
+"""
+
+
+PIXELS = 8
+RGB_BASE = 0
+GRAY_BASE = 33   # gray[-1] and gray[PIXELS] stay zero as padding for the blur
+OUT_BASE = 48
+HOST_DELAY = 50  # Cycles the host waits between the two kernels in test_starved_dispatch
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_grayscale_then_blur(dut):
+    grayscale = assemble(GRAYSCALE_ASM)
+    blur = assemble(BLUR_ASM)
+
+    # Both kernels live in program memory at once, blur right after grayscale
+    GRAYSCALE_BASE = 0
+    BLUR_BASE = len(grayscale)
+
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    rgb = [
+        255, 0,   0,
+        0,   255, 0,
+        0,   0,   255,
+        255, 255, 255,
+        0,   0,   0,
+        128, 128, 128,
+        50,  100, 150,
+        10,  20,  30,
+    ]
+
+    await reset(dut)
+    program_memory.load(grayscale + blur)
+    data_memory.load(rgb)
+
+    # Enqueue both stages back-to-back: the blur is queued while grayscale is still running,
+    # and the GPU starts it as soon as the last grayscale block retires
+    queue = CommandQueue(dut, program_memory, data_memory)
+    stage1 = await queue.enqueue(PIXELS, program_base=GRAYSCALE_BASE, params=[RGB_BASE, GRAY_BASE])
+    stage2 = await queue.enqueue(PIXELS, program_base=BLUR_BASE, params=[GRAY_BASE, OUT_BASE])
+    await queue.wait()
+
+    for kernel in (stage1, stage2):
+        msg = f"Kernel {kernel.index} (base {kernel.program_base}) done at cycle {kernel.done_at}"
+        print(msg)
+        logger.info(msg)
+
+    # Reference
+    pixels = np.array(rgb).reshape(-1, 3)
+    gray = pixels[:, 0] // 4 + pixels[:, 1] // 2 + pixels[:, 2] // 8
+    padded = np.concatenate([[0], gray, [0]])
+    blurred = padded[:-2] // 4 + padded[1:-1] // 2 + padded[2:] // 4
+
+    gray_result = data_memory.view(GRAY_BASE, PIXELS).tolist()
+    out_result = data_memory.view(OUT_BASE, PIXELS).tolist()
+    print("FINAL RESULT (GRAY):", gray_result)
+    print("FINAL RESULT (BLUR):", out_result)
+
+    assert gray_result == gray.tolist(), f"Grayscale mismatch: expected {gray.tolist()}, got {gray_result}"
+    assert out_result == blurred.tolist(), f"Blur mismatch: expected {blurred.tolist()}, got {out_result}"
+    assert stage1.done_at < stage2.done_at
+
+
+@cocotb.test()
+async def test_starved_dispatch(dut):
+    # The host only queues the blur a while after grayscale is done, so every core sits in DONE with
+    # nothing staged, and the scheduler's handoff gap must count that wait
+    grayscale = assemble(GRAYSCALE_ASM)
+    blur = assemble(BLUR_ASM)
+
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    await reset(dut)
+    program_memory.load(grayscale + blur)
+    data_memory.load([(17 * i) % 256 for i in range(3 * PIXELS)])
+
+    queue = CommandQueue(dut, program_memory, data_memory)
+    await queue.enqueue(PIXELS, program_base=0, params=[RGB_BASE, GRAY_BASE])
+    await queue.wait()
+    for _ in range(HOST_DELAY):
+        await queue.tick()
+    await queue.enqueue(PIXELS, program_base=len(grayscale), params=[GRAY_BASE, OUT_BASE])
+    await queue.wait()
+
+    log_perf_counters(dut)
+    for i, counters in enumerate(read_perf_counters(dut)):
+        assert counters["perf_handoffs"] > 0, f"Core {i} never picked up a block from DONE"
+        assert counters["perf_handoff_cycles"] >= HOST_DELAY, (
+            f"Core {i} waited at least {HOST_DELAY} cycles for the blur, "
+            f"but its handoff gap is {counters['perf_handoff_cycles']}"
+        )
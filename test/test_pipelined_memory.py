@@ -0,0 +1,103 @@
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.assembler import assemble
+from .helpers.cost import HardwareConfig, estimate, log_estimate
+from .helpers.signals import read_value
+from .helpers.kernels import (
+    VECTOR_ADD_ASM,
+    VECTOR_ADD_DATA,
+    VECTOR_ADD_EXPECTED,
+    VECTOR_ADD_OUTPUT,
+    VECTOR_ADD_THREADS,
+)
+
+
+# ---------------- VECTOR ADD KERNEL ----------------
+# out[i] = a[i] + b[i] over 16 threads (test/helpers/kernels.py), on a DATA_MEM_MAX_OUTSTANDING > 1 build
+# (`make test_pipelined_memory` sets 4 requests in flight on a single data channel)
+
+LATENCY = 8
+
+
+def slow_even_rows(address: int) -> int:
+    # Even rows take much longer, so requests to odd rows overtake them
+    return 12 if address % 2 == 0 else 2
+
+
+async def run_add(dut, latency):
+    # Returns the cycle count, the data memory (with its recorded occupancy and reordered count), and
+    # the most requests any data channel had in flight at once (the controller's own outstanding count)
+    channels = int(dut.DATA_MEM_NUM_CHANNELS.value)
+    outstanding_bits = (int(dut.DATA_MEM_MAX_OUTSTANDING.value) - 1).bit_length() + 1
+    controller = dut.data_memory_controller
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(
+        dut=dut, addr_bits=8, data_bits=8, channels=channels, name="data", latency=latency, pipelined=True
+    )
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=assemble(VECTOR_ADD_ASM),
+        data_memory=data_memory,
+        data=VECTOR_ADD_DATA,
+        threads=VECTOR_ADD_THREADS,
+    )
+
+    data_memory.record()
+    cycles = 0
+    peak = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        await RisingEdge(dut.clk)
+        cycles += 1
+        for channel in range(channels):
+            peak = max(peak, read_value(controller.outstanding, channel, outstanding_bits) or 0)
+
+        if cycles > 20000:
+            raise RuntimeError("Timeout: possible infinite loop")
+
+    out = data_memory.view(VECTOR_ADD_OUTPUT, VECTOR_ADD_THREADS).tolist()
+    assert out == VECTOR_ADD_EXPECTED, f"Result mismatch: expected {VECTOR_ADD_EXPECTED}, got {out}"
+    return cycles, data_memory, peak
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_pipelined_memory(dut):
+    outstanding = int(dut.DATA_MEM_MAX_OUTSTANDING.value)
+    assert outstanding > 1, "Run on a DATA_MEM_MAX_OUTSTANDING > 1 build (make test_pipelined_memory)"
+    config = HardwareConfig(
+        num_cores=int(dut.NUM_CORES.value),
+        threads_per_block=int(dut.THREADS_PER_BLOCK.value),
+        data_mem_num_channels=int(dut.DATA_MEM_NUM_CHANNELS.value),
+        memory_latency=LATENCY,
+        data_mem_max_outstanding=outstanding,
+    )
+
+    # Fixed latency: requests overlap on the channel instead of queueing one at a time
+    cycles, data_memory, peak = await run_add(dut, LATENCY)
+    log_estimate(estimate(assemble(VECTOR_ADD_ASM), VECTOR_ADD_THREADS, config, VECTOR_ADD_DATA), cycles)
+    config.data_mem_max_outstanding = 1
+    blocking = estimate(assemble(VECTOR_ADD_ASM), VECTOR_ADD_THREADS, config, VECTOR_ADD_DATA).cycles
+    logger.info(
+        f"Latency {LATENCY}: {cycles} cycles with up to {peak} of {outstanding} requests in flight, "
+        f"{blocking} predicted blocking"
+    )
+    assert peak > 1, f"Expected requests to overlap on a channel, at most {peak} was in flight"
+
+    # The occupancy record sees the channel busy for as long as requests are in flight
+    busy = sum(1 for _, idle in data_memory.occupancy if idle < data_memory.channels)
+    logger.info(f"Channels busy in {busy} of {len(data_memory.occupancy)} recorded cycles")
+    assert busy >= LATENCY, f"Expected the occupancy record to see the channel busy, got {busy} busy cycles"
+
+    # Address-dependent latency: responses come back out of order and still reach the right LSU
+    cycles, data_memory, _ = await run_add(dut, slow_even_rows)
+    reordered = data_memory.reordered
+    logger.info(f"Address-dependent latency: {cycles} cycles, {reordered} responses out of order")
+    assert reordered > 0, "Expected fast requests to overtake slow ones"
@@ -0,0 +1,85 @@
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.perf import log_perf_counters, read_perf_counters
+from .helpers.assembler import assemble
+from .helpers.cost import HardwareConfig, estimate, log_estimate
+from .helpers.tune import Candidate
+from .helpers.kernels import RAGGED_LOOP_ASM, RAGGED_LOOP_EXPECTED, RAGGED_LOOP_LENGTHS, RAGGED_LOOP_OUTPUT
+
+
+# ---------------- PREFETCH BUFFER ----------------
+# Runs a straight-line kernel (grayscale, array-of-structs) and a looping one (the ragged loop from
+# test/helpers/kernels.py) on a PREFETCH_DEPTH > 0 build (`make test_prefetch` sets 2)
+# > Straight-line code should mostly hit the prefetch window and beat the fetch-on-demand estimate
+# > Every taken BRnzp back to the top of the loop flushes the window
+
+async def run_kernel(dut, program, data, threads, params=()):
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=program,
+        data_memory=data_memory,
+        data=data,
+        threads=threads,
+        params=params,
+    )
+
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        await RisingEdge(dut.clk)
+        cycles += 1
+
+        if cycles > 20000:
+            raise RuntimeError("Timeout: possible infinite loop")
+
+    log_perf_counters(dut)
+    counters = read_perf_counters(dut)
+    hits = sum(core["perf_prefetch_hits"] for core in counters)
+    flushes = sum(core["perf_prefetch_flushes"] for core in counters)
+    return cycles, hits, flushes, data_memory
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_prefetch(dut):
+    depth = int(dut.PREFETCH_DEPTH.value)
+    assert depth > 0, "Run on a PREFETCH_DEPTH > 0 build (make test_prefetch)"
+    config = HardwareConfig(
+        num_cores=int(dut.NUM_CORES.value),
+        threads_per_block=int(dut.THREADS_PER_BLOCK.value),
+        prefetch_depth=depth,
+    )
+
+    # Straight-line code
+    launch = Candidate("grayscale", "aos", 32, config).launch()
+    cycles, hits, flushes, data_memory = await run_kernel(
+        dut, launch.program.code, launch.data, launch.threads, launch.params
+    )
+    out = data_memory.view(launch.output, len(launch.expected)).tolist()
+    assert out == launch.expected, f"Result mismatch: expected {launch.expected}, got {out}"
+
+    log_estimate(estimate(launch.program, launch.threads, config, launch.data, params=launch.params), cycles, launch.program)
+    config.prefetch_depth = 0
+    on_demand = estimate(launch.program, launch.threads, config, launch.data, params=launch.params).cycles
+    config.prefetch_depth = depth
+    logger.info(f"Grayscale: {cycles} cycles with {hits} prefetch hits, {on_demand} predicted without prefetching")
+    assert hits > 0, "Expected straight-line code to hit the prefetch window"
+    assert cycles < on_demand, f"Prefetching took {cycles} cycles, fetching on demand is predicted at {on_demand}"
+
+    # Loop: taken branches flush the window
+    lengths = RAGGED_LOOP_LENGTHS
+    cycles, hits, flushes, data_memory = await run_kernel(dut, assemble(RAGGED_LOOP_ASM), lengths, len(lengths))
+    out = data_memory.view(RAGGED_LOOP_OUTPUT, len(lengths)).tolist()
+    assert out == RAGGED_LOOP_EXPECTED, f"Result mismatch: expected {RAGGED_LOOP_EXPECTED}, got {out}"
+
+    logger.info(f"Ragged loop: {cycles} cycles, {hits} prefetch hits, {flushes} flushes")
+    assert flushes > 0, "Expected the loop's taken branches to flush the prefetch window"
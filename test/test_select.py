@@ -0,0 +1,58 @@
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.perf import log_perf_counters, read_perf_counters
+from .helpers.assembler import assemble
+from .helpers.model import GpuModel
+from .helpers.kernels import CLAMP_ASM, CLAMP_OUTPUT
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_select_clamp(dut):
+    # The branch-free clamp (test/helpers/kernels.py)
+    program = assemble(CLAMP_ASM)
+
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    data = [5, 200, 100, 101, 0, 255, 99, 150]
+    threads = len(data)
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=program,
+        data_memory=data_memory,
+        data=data,
+        threads=threads,
+    )
+
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        await RisingEdge(dut.clk)
+        cycles += 1
+
+        if cycles > 10000:
+            raise RuntimeError("Timeout: possible infinite loop")
+
+    logger.info(f"Completed in {cycles} cycles")
+    log_perf_counters(dut)
+
+    out = data_memory.view(CLAMP_OUTPUT, threads).tolist()
+    print("FINAL RESULT:", out)
+
+    expected = [min(x, 100) for x in data]
+    assert out == expected, f"Result mismatch: expected {expected}, got {out}"
+
+    model = GpuModel(program, data, int(dut.THREADS_PER_BLOCK.value))
+    model.run(threads)
+    assert model.memory[CLAMP_OUTPUT:CLAMP_OUTPUT + threads].tolist() == expected
+
+    counters = read_perf_counters(dut)
+    assert all(core["perf_divergent_cycles"] == 0 for core in counters), "SEL shouldn't split the threads"
@@ -0,0 +1,84 @@
+import cocotb
+from .helpers.logger import logger
+from .helpers.assembler import assemble
+from .helpers.session import Job, Session
+from .helpers.kernels import (
+    CLAMP_ASM,
+    CLAMP_OUTPUT,
+    RAGGED_LOOP_ASM,
+    RAGGED_LOOP_LENGTHS,
+    RAGGED_LOOP_OUTPUT,
+    SCALE_ASM,
+    SCALE_DATA,
+    SCALE_EXPECTED,
+    SCALE_OUTPUT,
+    VECTOR_ADD_ASM,
+    VECTOR_ADD_DATA,
+    VECTOR_ADD_EXPECTED,
+    VECTOR_ADD_OUTPUT,
+)
+
+
+# ---------------- REGRESSION SESSION ----------------
+# Kernels shared with the other test modules (test/helpers/kernels.py), run back to back on one
+# elaborated gpu (`make test_session`)
+# > Jobs without expected values are checked against the functional model
+# > The spinning job never finishes; it must time out without breaking the jobs after it
+
+SPIN_ASM = """
+    CMP R0, R0              ; sets z, so the branch below is always taken
+LOOP:
+    BRnzp LOOP
+"""
+
+CLAMP_DATA = [0, 50, 100, 101, 150, 255, 99, 7]
+
+
+def regression_jobs():
+    return [
+        Job("scale", assemble(SCALE_ASM), SCALE_DATA, len(SCALE_EXPECTED), output=SCALE_OUTPUT, expected=SCALE_EXPECTED),
+        Job(
+            "vector_add",
+            assemble(VECTOR_ADD_ASM),
+            VECTOR_ADD_DATA,
+            len(VECTOR_ADD_EXPECTED),
+            output=VECTOR_ADD_OUTPUT,
+            expected=VECTOR_ADD_EXPECTED,
+        ),
+        Job(
+            "ragged_loop",
+            assemble(RAGGED_LOOP_ASM),
+            RAGGED_LOOP_LENGTHS,
+            len(RAGGED_LOOP_LENGTHS),
+            output=RAGGED_LOOP_OUTPUT,
+            size=len(RAGGED_LOOP_LENGTHS),
+        ),
+        Job("clamp", assemble(CLAMP_ASM), CLAMP_DATA, len(CLAMP_DATA), output=CLAMP_OUTPUT, size=len(CLAMP_DATA)),
+        Job("spin", assemble(SPIN_ASM), [], 4, expected=[], timeout=500),
+        Job("clamp_after_spin", assemble(CLAMP_ASM), CLAMP_DATA, len(CLAMP_DATA)),
+    ]
+
+
+# ---------------- TEST ----------------
+
+@cocotb.test()
+async def test_session(dut):
+    session = Session(dut)
+    results = await session.run(regression_jobs())
+    session.log_summary()
+
+    spin = next(result for result in results if result.name == "spin")
+    assert not spin.passed and "Timeout" in spin.error, f"Expected the spinning job to time out, got {spin}"
+    failed = [result for result in results if not result.passed and result is not spin]
+    assert not failed, f"Jobs failed: {failed}"
+
+
+@cocotb.test()
+async def test_session_second_test(dut):
+    # A later test in the same process gets a fresh clock and the same elaborated gpu
+    session = Session(dut)
+    result = await session.run_job(
+        Job("clamp", assemble(CLAMP_ASM), CLAMP_DATA, len(CLAMP_DATA), output=CLAMP_OUTPUT, size=len(CLAMP_DATA))
+    )
+    logger.info(f"Second test: {result}")
+    assert result.passed, result.error
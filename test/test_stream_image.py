@@ -0,0 +1,42 @@
+import cocotb
+from PIL import Image
+import numpy as np
+import os
+
+from .helpers.setup import reset
+from .helpers.memory import Memory
+from .helpers.stream import TiledImagePipeline
+from .helpers.assembler import assemble
+from .helpers.kernels import GRAYSCALE_ASM
+
+
+# Odd sizes on purpose, so tiles don't line up with whole blocks and get padded
+WIDTH = 30
+HEIGHT = 18
+DIRECTORY = os.path.join("build", "stream_image")
+
+
+@cocotb.test()
+async def test_stream_grayscale(dut):
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+
+    here = os.path.dirname(__file__)
+    img = Image.open(os.path.join(here, "input.jpeg")).convert("RGB").resize((WIDTH, HEIGHT))
+    image = np.array(img, dtype=np.uint8)
+
+    await reset(dut)
+
+    # The pipeline logs its own throughput; the output memmap and a preview go under build/
+    os.makedirs(DIRECTORY, exist_ok=True)
+    output = os.path.join(DIRECTORY, "output.npy")
+    pipeline = TiledImagePipeline(dut, program_memory, data_memory, assemble(GRAYSCALE_ASM))
+    await pipeline.run(image, output)
+
+    gray = np.load(output, mmap_mode="r")
+    Image.fromarray(np.array(gray), mode="L").save(os.path.join(DIRECTORY, "output.png"))
+
+    pixels = image.astype(np.int32)
+    expected = pixels[..., 0] // 4 + pixels[..., 1] // 2 + pixels[..., 2] // 8
+    mismatches = np.argwhere(gray != expected)
+    assert len(mismatches) == 0, f"Result mismatch at pixel {tuple(mismatches[0])}"
@@ -0,0 +1,69 @@
+import json
+import os
+import cocotb
+from cocotb.triggers import RisingEdge
+from .helpers.setup import setup
+from .helpers.memory import Memory
+from .helpers.logger import logger
+from .helpers.cost import HardwareConfig, estimate, log_estimate
+from .helpers.tune import Candidate
+
+
+# ---------------- TUNER CONFIRMATION RUN ----------------
+# Runs one auto-tuner candidate (test/helpers/tune.py) on whatever build it was started on
+# > TINY_GPU_TUNE_CANDIDATE holds the candidate as JSON; without it, the grayscale AoS kernel runs on
+#   this build's parameters
+# > The measured cycle count is written to TINY_GPU_TUNE_RESULT when set
+
+@cocotb.test()
+async def test_tune_candidate(dut):
+    config = HardwareConfig(
+        num_cores=int(dut.NUM_CORES.value),
+        threads_per_block=int(dut.THREADS_PER_BLOCK.value),
+        data_mem_num_channels=int(dut.DATA_MEM_NUM_CHANNELS.value),
+        program_mem_num_channels=int(dut.PROGRAM_MEM_NUM_CHANNELS.value),
+    )
+    if "TINY_GPU_TUNE_CANDIDATE" in os.environ:
+        candidate = Candidate.from_json(json.loads(os.environ["TINY_GPU_TUNE_CANDIDATE"]))
+        build = Candidate(candidate.kernel, candidate.layout, candidate.size, config)
+        assert candidate.parameters == build.parameters, (
+            f"Candidate {candidate.parameters} doesn't match this build ({build.parameters})"
+        )
+    else:
+        candidate = Candidate("grayscale", "aos", 32, config)
+    launch = candidate.launch()
+
+    program_memory = Memory(
+        dut=dut, addr_bits=8, data_bits=16, channels=config.program_mem_num_channels, name="program"
+    )
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=config.data_mem_num_channels, name="data")
+
+    await setup(
+        dut=dut,
+        program_memory=program_memory,
+        program=launch.program.code,
+        data_memory=data_memory,
+        data=launch.data,
+        threads=launch.threads,
+        params=launch.params,
+    )
+
+    cycles = 0
+    while dut.done.value != 1:
+        data_memory.run()
+        program_memory.run()
+        await RisingEdge(dut.clk)
+        cycles += 1
+
+        if cycles > 20000:
+            raise RuntimeError("Timeout: possible infinite loop")
+
+    logger.info(f"{candidate}: completed in {cycles} cycles")
+    log_estimate(estimate(launch.program, launch.threads, config, launch.data, params=launch.params), cycles, launch.program)
+
+    out = data_memory.view(launch.output, len(launch.expected)).tolist()
+    assert out == launch.expected, f"Result mismatch: expected {launch.expected}, got {out}"
+
+    if "TINY_GPU_TUNE_RESULT" in os.environ:
+        with open(os.environ["TINY_GPU_TUNE_RESULT"], "w") as f:
+            json.dump({"cycles": cycles}, f)
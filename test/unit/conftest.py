@@ -0,0 +1,22 @@
+import pytest
+
+
+# Unit tests for the pure-Python helpers, run with `make unit` (no simulator needed)
+# > Helpers that bind simulator signals (like Memory) get a stand-in dut whose signals are plain
+#   objects with a value attribute, created on first access
+
+class FakeSignal:
+    def __init__(self):
+        self.value = 0
+
+
+class FakeDut:
+    def __getattr__(self, name):
+        signal = FakeSignal()
+        setattr(self, name, signal)
+        return signal
+
+
+@pytest.fixture
+def dut():
+    return FakeDut()
@@ -0,0 +1,30 @@
+import os
+from ..helpers import assembler
+from ..helpers.assembler import assemble_program, cache_key
+
+# Optimized binaries are cached per optimizer source, so changing a pass never serves a stale build
+
+SOURCE = """
+    CONST R1, #2
+    CONST R2, #0
+    MUL R3, R15, R1
+    STR R2, R3
+    RET
+"""
+
+
+def test_unoptimized_key_ignores_the_optimizer(monkeypatch):
+    key = cache_key(SOURCE)
+    monkeypatch.setattr(assembler, "optimizer_hash", lambda: "changed")
+    assert cache_key(SOURCE) == key
+
+
+def test_optimizer_change_misses_the_cache(tmp_path, monkeypatch):
+    assemble_program(SOURCE, cache_dir=str(tmp_path), optimize=True)
+    cached = os.listdir(tmp_path)
+    assert cached == [cache_key(SOURCE, optimize=True) + ".json"]
+
+    monkeypatch.setattr(assembler, "optimizer_hash", lambda: "changed")
+    assert cache_key(SOURCE, optimize=True) + ".json" not in cached
+    assemble_program(SOURCE, cache_dir=str(tmp_path), optimize=True)
+    assert len(os.listdir(tmp_path)) == 2
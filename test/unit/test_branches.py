@@ -0,0 +1,55 @@
+from ..helpers.assembler import assemble
+from ..helpers.model import GpuModel
+
+# BR (= BRnzp) only jumps once a CMP has set a flag; the flags start every block at 000
+
+
+def run(source, threads=1):
+    model = GpuModel(assemble(source, cache=False), [])
+    model.run(threads)
+    return model.memory[0]
+
+
+def test_branch_before_any_cmp_falls_through():
+    assert run("""
+        CONST R0, #1
+        BR SKIP
+        CONST R0, #2
+    SKIP:
+        CONST R1, #0
+        STR R1, R0
+        RET
+    """) == 2
+
+
+def test_branch_after_cmp_with_itself_is_taken():
+    assert run("""
+        CONST R0, #1
+        CMP R0, R0
+        BR SKIP
+        CONST R0, #2
+    SKIP:
+        CONST R1, #0
+        STR R1, R0
+        RET
+    """) == 1
+
+
+def test_cmp_is_unsigned_and_never_sets_p():
+    # 1 vs 200 differs (n), but p never fires in either order
+    assert run("""
+        CONST R0, #1
+        CONST R1, #200
+        CONST R2, #0
+        CMP R1, R0
+        BRp WRONG
+        CMP R0, R1
+        BRp WRONG
+        BRn DONE
+    WRONG:
+        CONST R2, #9
+    DONE:
+        CONST R3, #0
+        STR R3, R2
+        RET
+    """) == 0
@@ -0,0 +1,21 @@
+from ..helpers.cost import config_from_dut
+
+
+def test_config_follows_the_build_parameters(dut):
+    for name, value in {
+        "NUM_CORES": 4,
+        "THREADS_PER_BLOCK": 8,
+        "DATA_MEM_NUM_CHANNELS": 1,
+        "PROGRAM_MEM_NUM_CHANNELS": 2,
+        "DATA_MEM_BANKED": 1,
+        "DATA_MEM_MAX_OUTSTANDING": 4,
+        "PREFETCH_DEPTH": 2,
+    }.items():
+        getattr(dut, name).value = value
+
+    config = config_from_dut(dut, memory_latency=3)
+    assert (config.num_cores, config.threads_per_block) == (4, 8)
+    assert (config.data_mem_num_channels, config.program_mem_num_channels) == (1, 2)
+    assert config.data_mem_banked and config.data_mem_max_outstanding == 4
+    assert (config.prefetch_depth, config.memory_latency) == (2, 3)
+
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from ..helpers.memory import Memory
+
+
+def data_memory(dut, **kwargs):
+    return Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data", **kwargs)
+
+
+def test_load_array_and_view(dut):
+    memory = data_memory(dut)
+    memory.load_array(16, np.arange(12, dtype=np.uint8))
+
+    assert memory.view(16, 12).tolist() == list(range(12))
+    assert memory.view(16, (3, 4)).tolist() == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11]]
+    assert memory.view(15, 1).tolist() == [0]
+
+
+def test_view_is_not_a_copy(dut):
+    memory = data_memory(dut)
+    memory.view(0, 4)[:] = [9, 8, 7, 6]
+    assert memory.memory[:4].tolist() == [9, 8, 7, 6]
+
+
+def test_wide_view_pairs_rows_little_endian(dut):
+    memory = data_memory(dut)
+    memory.load([0x34, 0x12, 0x78, 0x56])
+    assert memory.view(0, 2, dtype=np.uint16).tolist() == [0x1234, 0x5678]
+
+
+def test_out_of_range_access_raises(dut):
+    memory = data_memory(dut)
+    with pytest.raises(IndexError):
+        memory.load_array(250, np.zeros(8, dtype=np.uint8))
+    with pytest.raises(IndexError):
+        memory.view(250, 8)
+
+
+def test_load_drops_rows_past_the_end(dut):
+    memory = data_memory(dut)
+    memory.load(list(range(10)), offset=250)
+    assert memory.view(250, 6).tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_snapshot_round_trip(dut, tmp_path):
+    memory = data_memory(dut)
+    memory.load(list(range(256)))
+    path = str(tmp_path / "snapshot.npy")
+    memory.snapshot(path)
+
+    assert np.load(path).tolist() == list(range(256))
+    restored = data_memory(dut, path=path)
+    assert restored.view(0, 256).tolist() == list(range(256))
+
+
+def test_npy_backing_persists_writes(dut, tmp_path):
+    path = str(tmp_path / "image.npy")
+    memory = data_memory(dut, path=path)
+    memory.load([1, 2, 3], offset=100)
+    del memory
+
+    reopened = data_memory(dut, path=path)
+    assert reopened.view(100, 3).tolist() == [1, 2, 3]
+
+
+def test_npy_backing_of_the_wrong_size_is_replaced(dut, tmp_path):
+    path = str(tmp_path / "image.npy")
+    np.save(path, np.ones(16, dtype=np.uint8))
+    memory = data_memory(dut, path=path)
+    assert len(memory.memory) == 256
+    assert memory.view(0, 16).tolist() == [0] * 16
+
+
+def test_raw_file_backing_round_trip(dut, tmp_path):
+    path = str(tmp_path / "image.bin")
+    memory = data_memory(dut, path=path)
+    memory.load([5, 6, 7, 8], offset=4)
+    memory.memory.flush()
+    del memory
+
+    assert (tmp_path / "image.bin").read_bytes()[4:8] == bytes([5, 6, 7, 8])
+    reopened = data_memory(dut, path=path)
+    assert reopened.view(4, 4).tolist() == [5, 6, 7, 8]
+
+
+def test_wide_rows_use_a_wide_dtype(dut):
+    memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    memory.load([0xFFFF, 0x1234])
+    assert memory.dtype == np.uint16
+    assert memory.view(0, 2).tolist() == [0xFFFF, 0x1234]
+
+
+def test_clear_zeroes_in_memory_rows(dut):
+    memory = data_memory(dut)
+    memory.load([1, 2, 3])
+    memory.clear()
+    assert memory.view(0, 3).tolist() == [0, 0, 0]
+
+
+def test_clear_leaves_backing_files_alone_unless_asked(dut, tmp_path):
+    path = str(tmp_path / "data.npy")
+    memory = data_memory(dut, path=path)
+    memory.load([1, 2, 3])
+    memory.memory.flush()
+
+    with pytest.raises(ValueError):
+        memory.clear()
+    assert np.load(path)[:3].tolist() == [1, 2, 3]
+
+    memory.clear(files=True)
+    memory.memory.flush()
+    assert np.load(path)[:3].tolist() == [0, 0, 0]
@@ -0,0 +1,67 @@
+import pytest
+from ..helpers.assembler import assemble_program
+from ..helpers.model import GpuModel
+from ..helpers.kernels import (
+    GRAYSCALE_ASM,
+    MATMUL_ASM,
+    MATMUL_DATA,
+    MATMUL_EXPECTED,
+    MATMUL_OUTPUT,
+    MATMUL_THREADS,
+    RAGGED_LOOP_ASM,
+    RAGGED_LOOP_EXPECTED,
+    RAGGED_LOOP_LENGTHS,
+    RAGGED_LOOP_OUTPUT,
+    SCALE_ASM,
+    SCALE_DATA,
+    SCALE_EXPECTED,
+    SCALE_OUTPUT,
+    SCALE_THREADS,
+)
+
+# Every shared kernel computes the same result with and without the optimizer, in no more instructions
+
+PIXELS = [255, 0, 0, 0, 255, 0, 0, 0, 255, 255, 255, 255, 0, 0, 0, 128, 128, 128, 50, 100, 150, 10, 20, 30]
+GRAY_BASE = 24
+
+KERNELS = {
+    "matmul": (MATMUL_ASM, MATMUL_DATA, MATMUL_THREADS, MATMUL_OUTPUT, MATMUL_EXPECTED, ()),
+    "scale": (SCALE_ASM, SCALE_DATA, SCALE_THREADS, SCALE_OUTPUT, SCALE_EXPECTED, ()),
+    "ragged_loop": (
+        RAGGED_LOOP_ASM,
+        RAGGED_LOOP_LENGTHS,
+        len(RAGGED_LOOP_LENGTHS),
+        RAGGED_LOOP_OUTPUT,
+        RAGGED_LOOP_EXPECTED,
+        (),
+    ),
+    "grayscale": (
+        GRAYSCALE_ASM,
+        PIXELS,
+        len(PIXELS) // 3,
+        GRAY_BASE,
+        [r // 4 + g // 2 + b // 8 for r, g, b in zip(PIXELS[::3], PIXELS[1::3], PIXELS[2::3])],
+        (0, GRAY_BASE),
+    ),
+}
+
+
+def run(program, data, threads, output, size, params):
+    model = GpuModel(program.code, data, params=params)
+    model.run(threads)
+    return model.memory[output:output + size].tolist()
+
+
+@pytest.mark.parametrize("kernel", sorted(KERNELS))
+def test_optimized_kernel_matches_original(kernel):
+    source, data, threads, output, expected, params = KERNELS[kernel]
+    original = assemble_program(source, cache=False)
+    optimized = assemble_program(source, cache=False, optimize=True, name=kernel)
+    assert run(original, data, threads, output, len(expected), params) == expected
+    assert run(optimized, data, threads, output, len(expected), params) == expected
+    assert optimized.unoptimized_length == len(original)
+    assert len(optimized) <= len(original)
+
+
+def test_optimizer_shortens_matmul():
+    assert len(assemble_program(MATMUL_ASM, cache=False, optimize=True)) < len(assemble_program(MATMUL_ASM, cache=False))
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from ..helpers.memory import Memory, PagedStore
+
+
+def paged_memory(dut, page_size=16):
+    return Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data", paged=True, page_size=page_size)
+
+
+def test_pages_are_allocated_on_first_write():
+    store = PagedStore(256, np.uint8, page_size=16)
+    assert store[100] == 0 and store[0:64].tolist() == [0] * 64
+    assert store.pages == {}
+
+    store[40:50] = 7
+    assert sorted(store.pages) == [2, 3]
+    assert store.resident_bytes == 32
+    assert store[38:52].tolist() == [0, 0] + [7] * 10 + [0, 0]
+
+
+def test_page_size_must_be_a_power_of_two():
+    with pytest.raises(ValueError):
+        PagedStore(256, np.uint8, page_size=12)
+
+
+def test_dump_restore_round_trip(tmp_path):
+    store = PagedStore(256, np.uint8, page_size=16)
+    store[0:4] = [1, 2, 3, 4]
+    store[200] = 99
+    path = str(tmp_path / "pages.npz")
+    store.dump(path)
+
+    restored = PagedStore(256, np.uint8, page_size=16)
+    restored.restore(path)
+    assert sorted(restored.pages) == [0, 12]
+    assert restored[0:4].tolist() == [1, 2, 3, 4] and restored[200] == 99
+
+
+def test_incremental_dump_only_writes_dirty_pages(tmp_path):
+    store = PagedStore(256, np.uint8, page_size=16)
+    store[0] = 1
+    store[100] = 2
+    store.dump(str(tmp_path / "full.npz"))
+    assert store.dirty == set()
+
+    store[101] = 3
+    path = str(tmp_path / "delta.npz")
+    store.dump(path, incremental=True)
+    with np.load(path) as dump:
+        assert dump["pages"].tolist() == [6]
+        assert dump["data"][0][4:6].tolist() == [2, 3]
+
+
+def test_reads_dont_dirty_pages():
+    store = PagedStore(256, np.uint8, page_size=16)
+    store[0] = 1
+    store.dirty.clear()
+    _ = store[0], store[0:32]
+    assert store.dirty == set()
+
+
+def test_restore_rejects_another_page_size(tmp_path):
+    store = PagedStore(256, np.uint8, page_size=16)
+    store[0] = 1
+    path = str(tmp_path / "pages.npz")
+    store.dump(path)
+    with pytest.raises(ValueError):
+        PagedStore(256, np.uint8, page_size=32).restore(path)
+
+
+def test_snapshot_restores_into_a_fresh_memory(dut, tmp_path):
+    memory = paged_memory(dut)
+    assert memory.paged
+    memory.load([10, 20, 30], offset=64)
+    base = str(tmp_path / "base.npz")
+    memory.snapshot(base)
+
+    memory.load([40], offset=240)
+    delta = str(tmp_path / "delta.npz")
+    memory.snapshot(delta, incremental=True)
+
+    fresh = paged_memory(dut)
+    fresh.memory.restore(base)
+    fresh.memory.restore(delta)
+    assert fresh.view(64, 3).tolist() == [10, 20, 30]
+    assert fresh.view(240, 1).tolist() == [40]
+    assert sorted(fresh.memory.pages) == [4, 15]
+
+
+def test_large_memories_are_paged_by_default(dut):
+    memory = Memory(dut=dut, addr_bits=20, data_bits=8, channels=4, name="data")
+    assert memory.paged
+    assert memory.memory.resident_bytes == 0
@@ -0,0 +1,46 @@
+from ..helpers.assembler import Program, assemble_program
+from ..helpers.cost import InstructionCost
+from ..helpers.profiler import Profiler
+
+# Optimized kernels profile by the instructions the optimizer emitted, not by their source text
+
+SOURCE = """
+    CONST R1, #2
+    CONST R2, #0
+    MUL R3, R15, R1          ; threadIdx * 2 becomes ADD R3, R15, R15
+    STR R2, R3
+    RET
+"""
+
+
+def test_optimized_program_records_rewritten_instructions():
+    program = assemble_program(SOURCE, cache=False, optimize=True)
+    pc = next(pc for pc in range(len(program)) if program.lines[pc] == 4)
+    assert program.instruction_text(pc).startswith("ADD ")
+    assert program.rewritten == {pc}
+
+
+def test_unoptimized_program_shows_source_text():
+    program = assemble_program(SOURCE, cache=False)
+    assert program.instruction_text(2) == "MUL R3, R15, R1"
+    assert not program.rewritten
+
+
+def test_program_round_trips_rewritten_instructions():
+    program = assemble_program(SOURCE, cache=False, optimize=True)
+    restored = Program.from_json(program.to_json(), SOURCE)
+    assert restored.texts == program.texts and restored.rewritten == program.rewritten
+
+
+def test_report_marks_rewritten_lines():
+    program = assemble_program(SOURCE, cache=False, optimize=True)
+    profiler = Profiler(program)
+    for pc in range(len(program)):
+        profiler.instructions[pc] = InstructionCost(pc, program.code[pc] >> 12)
+        profiler.instructions[pc].issue = 1
+
+    report = "\n".join(profiler.report())
+    pc = next(iter(program.rewritten))
+    assert f"{program.lines[pc]}*  ADD " in report
+    assert "MUL" not in report
+    assert "rewritten by the optimizer" in report
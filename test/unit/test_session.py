@@ -0,0 +1,15 @@
+import pytest
+from ..helpers.memory import Memory
+from ..helpers.session import Session
+
+
+def test_session_refuses_file_backed_memory_without_opt_in(dut, tmp_path):
+    path = str(tmp_path / "data.npy")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data", path=path)
+    with pytest.raises(ValueError, match="clear_files"):
+        Session(dut, data_memory=data_memory)
+
+    for name, value in {"PROGRAM_MEM_ADDR_BITS": 8, "PROGRAM_MEM_DATA_BITS": 16, "PROGRAM_MEM_NUM_CHANNELS": 1}.items():
+        getattr(dut, name).value = value
+    session = Session(dut, data_memory=data_memory, clear_files=True)
+    assert session.data_memory is data_memory
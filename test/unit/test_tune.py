@@ -0,0 +1,37 @@
+import json
+import os
+import pytest
+from ..helpers.runner import resolve_parameters, source_hash
+from ..helpers.tune import prebuilt_configs, tune
+
+# --prebuilt only counts builds confirm() would reuse: same simulator and every other parameter at its default
+
+
+def cache_build(build_dir, name, overrides, simulator="icarus"):
+    directory = os.path.join(build_dir, name)
+    os.makedirs(directory)
+    verilog = os.path.join(build_dir, f"sv2v-{source_hash()[:16]}", "gpu.v")
+    with open(os.path.join(directory, "build.json"), "w") as f:
+        json.dump(
+            {"simulator": simulator, "toplevel": "gpu", "parameters": resolve_parameters(overrides), "verilog": verilog}, f
+        )
+
+
+def test_prebuilt_ignores_builds_with_other_overrides(tmp_path):
+    config = {"NUM_CORES": 2, "THREADS_PER_BLOCK": 4, "DATA_MEM_NUM_CHANNELS": 4}
+    cache_build(str(tmp_path), "banked", dict(config, DATA_MEM_BANKED=1))
+    cache_build(str(tmp_path), "prefetch", dict(config, PREFETCH_DEPTH=2))
+    cache_build(str(tmp_path), "verilator", config, simulator="verilator")
+    assert prebuilt_configs(str(tmp_path)) == [
+        resolve_parameters(dict(config, DATA_MEM_BANKED=1)),
+        resolve_parameters(dict(config, PREFETCH_DEPTH=2)),
+    ]
+    with pytest.raises(RuntimeError, match="No cached build"):
+        tune("grayscale", prebuilt=True, build_dir=str(tmp_path))
+
+
+def test_prebuilt_keeps_default_builds(tmp_path):
+    config = {"NUM_CORES": 2, "THREADS_PER_BLOCK": 4, "DATA_MEM_NUM_CHANNELS": 4}
+    cache_build(str(tmp_path), "default", config)
+    ranked = tune("grayscale", prebuilt=True, build_dir=str(tmp_path))
+    assert ranked and all(candidate.parameters == config for candidate in ranked)
@@ -0,0 +1,23 @@
+from ..helpers.waves import build_config, dump_module, gpu_instances
+
+
+def dumped(module):
+    return [line.split("(0, ", 1)[1].rstrip(");") for line in module.splitlines() if "$dumpvars" in line]
+
+
+def test_dump_follows_parameter_overrides():
+    config, parameters = build_config("gpu", {"NUM_CORES": 4, "DATA_MEM_NUM_CHANNELS": 1})
+    assert (config.num_cores, config.data_mem_num_channels) == (4, 1)
+    signals = dumped(dump_module(config, gpu_instances("gpu", parameters)))
+    assert "gpu.cores[3].core_instance.core_state" in signals
+    assert "gpu.data_memory_controller.controller_state[0]" in signals
+    assert "gpu.data_memory_controller.controller_state[1]" not in signals
+
+
+def test_multi_gpu_dumps_every_device():
+    config, parameters = build_config("multi_gpu", {"NUM_DEVICES": 3})
+    roots = gpu_instances("multi_gpu", parameters)
+    assert roots == [f"multi_gpu.devices[{device}].gpu_instance" for device in range(3)]
+    signals = dumped(dump_module(config, roots))
+    assert all(not signal.startswith("gpu.") for signal in signals)
+    assert "multi_gpu.devices[2].gpu_instance.cores[1].core_instance.current_pc" in signals